@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio client for BaseX (Python 3.6+), the non-blocking counterpart of
+BaseXClient: AsyncSession, AsyncQuery and ``async for`` over query
+results, with the same protocol semantics (0x00 terminators, 0xff
+escapes, raw=True for undecoded bytes).
+
+BaseXClient stays importable on Python 2; this module is separate so
+that it can use async/await. One process can drive many connections
+concurrently without one thread per session:
+
+    async def count(db):
+        async with await AsyncSession.connect('localhost', 1984, 'admin', 'admin') as session:
+            await session.execute('open ' + db)
+            query = await session.query('//Persona')
+            async for typecode, item in query.iter():
+                ...
+            await query.close()
+
+A session is one connection: concurrent coroutines sharing it are
+serialized (a pending iter() holds the session until it is exhausted).
+
+Documentation: http://docs.basex.org/wiki/Server_Protocol
+"""
+
+import asyncio
+import hashlib
+
+from BaseXClient import DEFAULT_BUFFER_SIZE, input_bytes
+
+# ---------------------------------
+#
+
+
+class AsyncStreamWrapper(object):
+    """buffered reader/writer over an asyncio stream pair."""
+
+    def __init__(self, reader, writer,
+                 receive_bytes_encoding='utf-8',
+                 send_bytes_encoding='utf-8',
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+
+        self.receive_bytes_encoding = receive_bytes_encoding
+        self.send_bytes_encoding = send_bytes_encoding
+        self.buffer_size = buffer_size
+
+        self.terminator = b'\x00'
+        self.escape = b'\xff'
+        self.__reader = reader
+        self.__writer = writer
+        self.__buf = b''
+        self.__bpos = 0
+
+    async def __fill_buffer(self):
+        """cache next bytes"""
+        if self.__bpos >= len(self.__buf):
+            self.__buf = await self.__reader.read(self.buffer_size)
+            self.__bpos = 0
+            if not self.__buf:
+                raise IOError('Connection closed by server.')
+
+    async def recv_single_byte(self):
+        """recv a single byte from previously fetched buffer."""
+        await self.__fill_buffer()
+        result_byte = self.__buf[self.__bpos]
+        self.__bpos += 1
+        return result_byte
+
+    async def recv_until_terminator(self, raw=False):
+        """recv a nul-terminated whole string, honouring 0xff escapes."""
+        result_bytes = bytearray()
+        while True:
+            await self.__fill_buffer()
+            start = self.__bpos
+            end = self.__buf.find(self.terminator, start)
+            esc = self.__buf.find(self.escape, start, len(self.__buf) if end < 0 else end)
+            if esc >= 0:
+                result_bytes += self.__buf[start:esc]
+                self.__bpos = esc + 1
+                await self.__fill_buffer()
+                result_bytes.append(self.__buf[self.__bpos])
+                self.__bpos += 1
+            elif end >= 0:
+                result_bytes += self.__buf[start:end]
+                self.__bpos = end + 1
+                break
+            else:
+                result_bytes += self.__buf[start:]
+                self.__bpos = len(self.__buf)
+        if raw:
+            return bytes(result_bytes)
+        return result_bytes.decode(self.receive_bytes_encoding)
+
+    async def sendall(self, data):
+        """write and drain; str is encoded with send_bytes_encoding."""
+        if not isinstance(data, (bytearray, bytes)):
+            data = data.encode(self.send_bytes_encoding)
+        self.__writer.write(data)
+        await self.__writer.drain()
+
+    async def close(self):
+        self.__writer.close()
+        if hasattr(self.__writer, 'wait_closed'):
+            try:
+                await self.__writer.wait_closed()
+            except (IOError, OSError):
+                pass
+
+
+# ---------------------------------
+#
+class AsyncSession(object):
+    """class AsyncSession.
+
+    create it with ``await AsyncSession.connect(host, port, user, password)``.
+    see http://docs.basex.org/wiki/Server_Protocol
+    """
+
+    def __init__(self, wrapper):
+        """internal: use AsyncSession.connect()"""
+        self.__info = None
+        self.__swrapper = wrapper
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, host, port, user, password,
+                      receive_bytes_encoding='utf-8',
+                      send_bytes_encoding='utf-8',
+                      buffer_size=DEFAULT_BUFFER_SIZE):
+        """Open a connection, authenticate and return the session."""
+        reader, writer = await asyncio.open_connection(host, port)
+        session = cls(AsyncStreamWrapper(reader, writer,
+                                         receive_bytes_encoding=receive_bytes_encoding,
+                                         send_bytes_encoding=send_bytes_encoding,
+                                         buffer_size=buffer_size))
+        try:
+            await session.__login(user, password)
+        except BaseException:
+            await session.__swrapper.close()
+            raise
+        return session
+
+    async def __login(self, user, password):
+        # receive timestamp
+        response = (await self.recv_c_str()).split(':')
+
+        # send username and hashed password/timestamp
+        hfun = hashlib.md5()
+
+        if len(response) > 1:
+            code = "%s:%s:%s" % (user, response[0], password)
+            nonce = response[1]
+        else:
+            code = password
+            nonce = response[0]
+
+        hfun.update(hashlib.md5(code.encode('us-ascii')).hexdigest().encode('us-ascii'))
+        hfun.update(nonce.encode('us-ascii'))
+        await self.send(user + chr(0) + hfun.hexdigest())
+
+        # evaluate success flag
+        if not await self.server_response_success():
+            raise IOError('Access Denied.')
+
+    async def execute(self, com, raw=False):
+        """Execute a command and return the result (bytes if raw is True)"""
+        async with self.lock:
+            await self.send(com)
+            result = await self.recv_c_str(raw)
+            self.__info = await self.recv_c_str()
+            if not await self.server_response_success():
+                raise IOError(self.__info)
+            return result
+
+    async def query(self, querytxt):
+        """Creates a new query instance (having id returned from server)."""
+        query = AsyncQuery(self)
+        await query.prepare(querytxt)
+        return query
+
+    async def create(self, name, content):
+        """Creates a new database with the specified input (may be empty).
+
+content may be a string, bytes, a file-like object or an iterable of
+strings/bytes, as in BaseXClient.Session.create: it is sent in chunks,
+escaping 0x00 and 0xff on the fly."""
+        await self.__send_input(8, name, content)
+
+    async def add(self, path, content):
+        """Adds a new resource to the opened database (content as in create)."""
+        await self.__send_input(9, path, content)
+
+    async def replace(self, path, content):
+        """Replaces a resource with the specified input (content as in create)."""
+        await self.__send_input(12, path, content)
+
+    async def store(self, path, content):
+        """Stores a binary resource in the opened database.
+
+content must be bytes or bytearray; 0x00 and 0xff are escaped here,
+as in BaseXClient.Session.store."""
+        if not isinstance(content, (bytearray, bytes)):
+            raise ValueError("Sorry, content must be bytearray or bytes, not " +
+                             str(type(content)))
+        await self.__send_input(13, path, content)
+
+    def info(self):
+        """Return process information"""
+        return self.__info
+
+    async def close(self):
+        """Close the session"""
+        async with self.lock:
+            try:
+                await self.send('exit')
+            finally:
+                await self.__swrapper.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def recv_c_str(self, raw=False):
+        """Retrieve a string (or raw bytes) from the stream"""
+        return await self.__swrapper.recv_until_terminator(raw)
+
+    async def send(self, value):
+        """Send the defined string"""
+        await self.__swrapper.sendall(value + chr(0))
+
+    async def __send_input(self, code, arg, content):
+        """internal. don't care."""
+        async with self.lock:
+            for data in input_bytes(code, arg, content, self.__swrapper.send_bytes_encoding):
+                await self.__swrapper.sendall(data)
+            self.__info = await self.recv_c_str()
+            if not await self.server_response_success():
+                raise IOError(self.info())
+
+    async def server_response_success(self):
+        """Return success check"""
+        return await self.__swrapper.recv_single_byte() == 0
+
+    async def iter_receive(self, raw=False):
+        """async iterator of (typecode, item) while the query returns items.
+
+The caller must hold the session lock."""
+        typecode = await self.__swrapper.recv_single_byte()
+        while typecode > 0:
+            string = await self.recv_c_str(raw)
+            yield (typecode, string)
+            typecode = await self.__swrapper.recv_single_byte()
+        if not await self.server_response_success():
+            raise IOError(await self.recv_c_str())
+
+# ---------------------------------
+#
+
+
+class AsyncQuery(object):
+    """class AsyncQuery.
+
+    create it with ``await session.query(querytxt)``.
+    see http://docs.basex.org/wiki/Server_Protocol
+    """
+
+    def __init__(self, session):
+        """internal: use AsyncSession.query()"""
+        self.__session = session
+        self.__id = None
+
+    async def prepare(self, querytxt):
+        """internal: register the query text on the server"""
+        self.__id = await self.__exc(chr(0), querytxt)
+
+    async def bind(self, name, value, datatype=''):
+        """Binds a value to a variable.
+An empty string can be specified as data type."""
+        await self.__exc(chr(3), self.__id + chr(0) + name + chr(0) + value + chr(0) + datatype)
+
+    async def context(self, value, datatype=''):
+        """Bind the context item"""
+        await self.__exc(chr(14), self.__id + chr(0) + value + chr(0) + datatype)
+
+    async def iter(self, raw=False):
+        """async iterator of (typecode, item) (items are bytes if raw is True).
+
+The session is held until the iteration ends. Closing the generator
+early (``await it.aclose()`` after a break) reads and discards the
+remaining items, so the session stays usable."""
+        async with self.__session.lock:
+            await self.__session.send(chr(4) + self.__id)
+            items = self.__session.iter_receive(raw)
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                # closed early: drain up to the end marker and status byte
+                async for _ in items:
+                    pass
+
+    async def execute(self, raw=False):
+        """Execute the query and return the result (bytes if raw is True)"""
+        return await self.__exc(chr(5), self.__id, raw)
+
+    async def info(self):
+        """Return query information"""
+        return await self.__exc(chr(6), self.__id)
+
+    async def options(self):
+        """Return serialization parameters"""
+        return await self.__exc(chr(7), self.__id)
+
+    async def updating(self):
+        """Returns true if the query may perform updates; false otherwise."""
+        return await self.__exc(chr(30), self.__id)
+
+    async def full(self):
+        """Returns all resulting items as strings, prefixed by XDM Meta Data."""
+        return await self.__exc(chr(31), self.__id)
+
+    async def close(self):
+        """Close the query"""
+        await self.__exc(chr(2), self.__id)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def __exc(self, cmd, arg, raw=False):
+        """internal. don't care."""
+        session = self.__session
+        async with session.lock:
+            await session.send(cmd + arg)
+            result = await session.recv_c_str(raw)
+            if not await session.server_response_success():
+                raise IOError(await session.recv_c_str())
+            return result
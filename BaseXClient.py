@@ -8,9 +8,10 @@ Requires Python 3.x or Python 2.x having some backports like bytearray.
 
 LIMITATIONS:
 
-* binary content would corrupt, maybe. (I didn't test it)
-* also, will fail to extract stored binary content, maybe.
-  (both my code, and original don't care escaped 0xff.)
+* binary content (store) is escaped like any other input; it must be
+  bytes or bytearray.
+* received strings honour the 0xff escape byte (an escaped 0x00 or 0xff
+  is data, not a terminator); pass raw=True to get undecoded bytes.
 
 Documentation: http://docs.basex.org/wiki/Clients
 
@@ -22,6 +23,53 @@ Documentation: http://docs.basex.org/wiki/Clients
 import hashlib
 import socket
 import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# default size of the receive buffer: large results arrive in few recv_into calls
+DEFAULT_BUFFER_SIZE = 0x40000
+
+# create/add/replace send their input in chunks of (at least) this size
+UPLOAD_CHUNK_SIZE = 0x40000
+
+
+def input_bytes(code, arg, content, encoding='utf-8'):
+    """the escaped wire form of an input command, in chunks.
+The header and the terminator travel with the first and last chunk, so
+a small input is a single write (no Nagle stall between pieces)."""
+    data = bytearray((chr(code) + arg + chr(0)).encode(encoding))
+    for chunk in input_chunks(content, encoding):
+        data += chunk.replace(b'\xff', b'\xff\xff').replace(b'\x00', b'\xff\x00')
+        if len(data) >= UPLOAD_CHUNK_SIZE:
+            yield data
+            data = bytearray()
+    data += b'\x00'
+    yield data
+
+
+def input_chunks(content, encoding='utf-8'):
+    """yield content (str, bytes, file-like object or iterable of
+strings/bytes) as encoded chunks of about UPLOAD_CHUNK_SIZE."""
+    if hasattr(content, 'encode'):
+        content = content.encode(encoding)
+    if isinstance(content, (bytes, bytearray)):
+        for start in range(0, len(content), UPLOAD_CHUNK_SIZE):
+            yield content[start:start + UPLOAD_CHUNK_SIZE]
+        return
+    if hasattr(content, 'read'):
+        reader = content
+        content = iter(lambda: reader.read(UPLOAD_CHUNK_SIZE), reader.read(0))
+    # small pieces (e.g. one per line) are coalesced into full chunks
+    pending = bytearray()
+    for piece in content:
+        pending += piece.encode(encoding) if hasattr(piece, 'encode') else piece
+        if len(pending) >= UPLOAD_CHUNK_SIZE:
+            yield bytes(pending)
+            del pending[:]
+    if pending:
+        yield bytes(pending)
+
 
 # ---------------------------------
 #
@@ -32,16 +80,20 @@ class SocketWrapper(object):
 
     def __init__(self, sock,
                  receive_bytes_encoding='utf-8',
-                 send_bytes_encoding='utf-8'):
+                 send_bytes_encoding='utf-8',
+                 buffer_size=DEFAULT_BUFFER_SIZE):
 
         self.receive_bytes_encoding = receive_bytes_encoding
         self.send_bytes_encoding = send_bytes_encoding
 
-        self.terminator = bytearray(chr(0), self.receive_bytes_encoding)
+        self.terminator = b'\x00'
+        self.escape = b'\xff'
         self.__s = sock
-        self.__buf = bytearray(chr(0) * 0x1000, self.receive_bytes_encoding)
+        self.__buf = bytearray(buffer_size)
+        self.__view = memoryview(self.__buf)
         self.__bpos = 0
         self.__bsize = 0
+        self.received = 0   # bytes read from the socket so far
 
     def clear_buffer(self):
         """reset buffer status for next invocation ``recv_until_terminator()``
@@ -54,6 +106,9 @@ or ``recv_single_byte()``."""
         if self.__bpos >= self.__bsize:
             self.__bsize = self.__s.recv_into(self.__buf)
             self.__bpos = 0
+            self.received += self.__bsize
+            if self.__bsize == 0:
+                raise IOError('Connection closed by server.')
 
     # Returns a single byte from the socket.
     def recv_single_byte(self):
@@ -64,20 +119,42 @@ or ``recv_single_byte()``."""
         return result_byte
 
     # Reads until terminator byte is found.
-    def recv_until_terminator(self):
-        """recv a nul(or specified as terminator_byte)-terminated whole string
-from previously fetched buffer."""
-        result_bytes = bytearray()
+    def recv_until_terminator(self, raw=False):
+        """recv a nul-terminated whole string from previously fetched buffer.
+
+0xff escapes the following byte (so an escaped 0x00 is data, not the
+terminator). The buffer is scanned through a memoryview; a string that
+fits in the buffer is copied once. With raw=True the undecoded bytes
+are returned."""
+        result_bytes = None
         while True:
             self.__fill_buffer()
-            pos = self.__buf.find(self.terminator, self.__bpos, self.__bsize)
-            if pos >= 0:
-                result_bytes.extend(self.__buf[self.__bpos:pos])
-                self.__bpos = pos + 1
+            start = self.__bpos
+            end = self.__buf.find(self.terminator, start, self.__bsize)
+            esc = self.__buf.find(self.escape, start, self.__bsize if end < 0 else end)
+            if esc >= 0:
+                # copy up to the escape byte, then the escaped byte verbatim
+                if result_bytes is None:
+                    result_bytes = bytearray()
+                result_bytes += self.__view[start:esc]
+                self.__bpos = esc + 1
+                self.__fill_buffer()
+                result_bytes += self.__view[self.__bpos:self.__bpos + 1]
+                self.__bpos += 1
+            elif end >= 0:
+                self.__bpos = end + 1
+                if result_bytes is None:
+                    result_bytes = bytes(self.__view[start:end])
+                else:
+                    result_bytes += self.__view[start:end]
                 break
             else:
-                result_bytes.extend(self.__buf[self.__bpos:self.__bsize])
+                if result_bytes is None:
+                    result_bytes = bytearray()
+                result_bytes += self.__view[start:self.__bsize]
                 self.__bpos = self.__bsize
+        if raw:
+            return bytes(result_bytes)
         return result_bytes.decode(self.receive_bytes_encoding)
 
     def sendall(self, data):
@@ -102,16 +179,21 @@ class Session(object):
 
     def __init__(self, host, port, user, password,
                  receive_bytes_encoding='utf-8',
-                 send_bytes_encoding='utf-8'):
-        """Create and return session with host, port, user name and password"""
+                 send_bytes_encoding='utf-8',
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        """Create and return session with host, port, user name and password.
+
+buffer_size sets the receive buffer of the underlying SocketWrapper."""
 
         self.__info = None
+        self.__prepared = {}
 
         # create server connection
         self.__swrapper = SocketWrapper(
             socket.socket(socket.AF_INET, socket.SOCK_STREAM),
             receive_bytes_encoding=receive_bytes_encoding,
-            send_bytes_encoding=send_bytes_encoding)
+            send_bytes_encoding=send_bytes_encoding,
+            buffer_size=buffer_size)
 
         self.__swrapper.connect((host, port))
 
@@ -136,13 +218,13 @@ class Session(object):
         if not self.server_response_success():
             raise IOError('Access Denied.')
 
-    def execute(self, com):
-        """Execute a command and return the result"""
+    def execute(self, com, raw=False):
+        """Execute a command and return the result (bytes if raw is True)"""
         # send command to server
         self.send(com)
 
         # receive result
-        result = self.receive()
+        result = self.receive(raw)
         self.__info = self.recv_c_str()
         if not self.server_response_success():
             raise IOError(self.__info)
@@ -152,97 +234,125 @@ class Session(object):
         """Creates a new query instance (having id returned from server)."""
         return Query(self, querytxt)
 
+    def prepared(self, querytxt):
+        """Return the query instance for querytxt, creating it on first use.
+
+Handles are cached by query text for the life of the session, so a
+query run many times is shipped to the server once; rebind its
+variables with bind() before each run if they change."""
+        query = self.__prepared.get(querytxt)
+        if query is None:
+            query = self.__prepared[querytxt] = Query(self, querytxt)
+        return query
+
+    def clear_prepared(self):
+        """Close and forget all cached query instances."""
+        queries, self.__prepared = self.__prepared, {}
+        for query in queries.values():
+            query.close()
+
     def create(self, name, content):
-        """Creates a new database with the specified input (may be empty)."""
+        """Creates a new database with the specified input (may be empty).
+
+content may be a string, bytes, a file-like object (text or binary) or
+an iterable of strings/bytes; it is streamed in chunks, escaping 0x00
+and 0xff on the fly, so a large input is never held in memory."""
         self.__send_input(8, name, content)
 
     def add(self, path, content):
-        """Adds a new resource to the opened database."""
+        """Adds a new resource to the opened database (content as in create)."""
         self.__send_input(9, path, content)
 
     def replace(self, path, content):
-        """Replaces a resource with the specified input."""
+        """Replaces a resource with the specified input (content as in create)."""
         self.__send_input(12, path, content)
 
     def store(self, path, content):
         """Stores a binary resource in the opened database.
 
-api won't escape 0x00, 0xff automatically, so you must do it
-yourself explicitly."""
-        # ------------------------------------------
-        # chr(13) + path + chr(0) + content + chr(0)
-        self.__send_binary_input(13, path, content)
-        #
-        # ------------------------------------------
+content must be bytes or bytearray; 0x00 and 0xff are escaped here and
+it is sent in chunks, as in create()."""
+        if not isinstance(content, (bytearray, bytes)):
+            raise ValueError("Sorry, content must be bytearray or bytes, not " +
+                             str(type(content)))
+        self.__send_input(13, path, content)
 
     def info(self):
         """Return process information"""
         return self.__info
 
+    def received_bytes(self):
+        """Return the number of bytes received on this session so far"""
+        return self.__swrapper.received
+
     def close(self):
-        """Close the session"""
+        """Close the session (the server drops its queries with it)"""
+        self.__prepared = {}
         self.send('exit')
         self.__swrapper.close()
 
-    def recv_c_str(self):
-        """Retrieve a string from the socket"""
-        return self.__swrapper.recv_until_terminator()
+    def recv_c_str(self, raw=False):
+        """Retrieve a string (or raw bytes) from the socket"""
+        return self.__swrapper.recv_until_terminator(raw)
 
     def send(self, value):
         """Send the defined string"""
         self.__swrapper.sendall(value + chr(0))
 
+    def send_batch(self, items):
+        """Send several requests without reading responses, in as few writes
+as possible. An item is a command string (sent nul-terminated) or a
+(code, arg, content) input command as in send_input()."""
+        encoding = self.__swrapper.send_bytes_encoding
+        data = bytearray()
+        for item in items:
+            pieces = self.__input_bytes(*item) if isinstance(item, tuple) else [(item + chr(0)).encode(encoding)]
+            for piece in pieces:
+                data += piece
+                if len(data) >= UPLOAD_CHUNK_SIZE:
+                    self.__swrapper.sendall(data)
+                    data = bytearray()
+        if data:
+            self.__swrapper.sendall(data)
+
+    def send_input(self, code, arg, content):
+        """Send an input command (8 create, 9 add, 12 replace) without
+reading its response; content is streamed as in create()."""
+        for data in self.__input_bytes(code, arg, content):
+            self.__swrapper.sendall(data)
+
+    def pipeline(self, max_batch=1000):
+        """Return a Pipeline that sends queued commands in batches."""
+        return Pipeline(self, max_batch)
+
     def __send_input(self, code, arg, content):
         """internal. don't care."""
-        self.__swrapper.sendall(chr(code) + arg + chr(0) + content + chr(0))
+        self.send_input(code, arg, content)
         self.__info = self.recv_c_str()
         if not self.server_response_success():
             raise IOError(self.info())
 
-    def __send_binary_input(self, code, path, content):
+    def __input_bytes(self, code, arg, content):
         """internal. don't care."""
-        # at this time, we can't use __send_input itself because of encoding
-        # problem. we have to build bytearray directly.
-        if not isinstance(content, (bytearray, bytes)):
-            raise ValueError("Sorry, content must be bytearray or bytes, not " +
-                             str(type(content)))
-
-        # ------------------------------------------
-        # chr(code) + path + chr(0) + content + chr(0)
-        data = bytearray([code])
-        try:
-            data.extend(path)
-        except:
-            data.extend(path.encode('utf-8'))
-        data.extend([0])
-        data.extend(content)
-        data.extend([0])
-        #
-        # ------------------------------------------
-        self.__swrapper.sendall(data)
-        self.__info = self.recv_c_str()
-        if not self.server_response_success():
-            raise IOError(self.info())
+        return input_bytes(code, arg, content, self.__swrapper.send_bytes_encoding)
 
     def server_response_success(self):
         """Return success check"""
         return self.__swrapper.recv_single_byte() == 0
 
-    def receive(self):
-        """Return received string"""
-        self.__swrapper.clear_buffer()
-        return self.recv_c_str()
+    def receive(self, raw=False):
+        """Return received string (bytes if raw is True)"""
+        return self.recv_c_str(raw)
 
-    def iter_receive(self):
+    def iter_receive(self, raw=False):
         """iter_receive() -> (typecode, item)
 
-iterate while the query returns items.
+iterate while the query returns items (items are bytes if raw is True).
 typecode list is in http://docs.basex.org/wiki/Server_Protocol:_Types
 """
-        self.__swrapper.clear_buffer()
         typecode = self.__swrapper.recv_single_byte()
         while typecode > 0:
-            string = self.recv_c_str()
+            string = self.recv_c_str(raw)
             yield (typecode, string)
             typecode = self.__swrapper.recv_single_byte()
         if not self.server_response_success():
@@ -263,6 +373,11 @@ class Query():
         self.__session = session
         self.__id = self.__exc(chr(0), querytxt)
 
+    @property
+    def id(self):
+        """id of the query on the server"""
+        return self.__id
+
     def bind(self, name, value, datatype=''):
         """Binds a value to a variable.
 An empty string can be specified as data type."""
@@ -272,14 +387,25 @@ An empty string can be specified as data type."""
         """Bind the context item"""
         self.__exc(chr(14), self.__id + chr(0) + value + chr(0) + datatype)
 
-    def iter(self):
-        """iterate while the query returns items"""
+    def iter(self, raw=False):
+        """iterate while the query returns items (bytes if raw is True).
+
+The query runs when iteration starts. Closing the iterator early (a
+break, or close()) reads and discards the remaining items, so the
+session stays usable."""
         self.__session.send(chr(4) + self.__id)
-        return self.__session.iter_receive()
+        items = self.__session.iter_receive(raw)
+        try:
+            for item in items:
+                yield item
+        finally:
+            # closed early: drain up to the end marker and status byte
+            for _ in items:
+                pass
 
-    def execute(self):
-        """Execute the query and return the result"""
-        return self.__exc(chr(5), self.__id)
+    def execute(self, raw=False):
+        """Execute the query and return the result (bytes if raw is True)"""
+        return self.__exc(chr(5), self.__id, raw)
 
     def info(self):
         """Return query information"""
@@ -301,12 +427,278 @@ An empty string can be specified as data type."""
         """Close the query"""
         self.__exc(chr(2), self.__id)
 
-    def __exc(self, cmd, arg):
+    def __exc(self, cmd, arg, raw=False):
         """internal. don't care."""
         # should we expose this?
         # (this makes sense only when mismatch between C/S is existing.)
         self.__session.send(cmd + arg)
-        result = self.__session.receive()
+        result = self.__session.receive(raw)
         if not self.__session.server_response_success():
             raise IOError(self.__session.recv_c_str())
         return result
+
+
+# ---------------------------------
+#
+
+
+class Pipeline(object):
+    """Batch of commands written before their responses are read.
+
+Each call queues a command and returns its position; run() writes the
+queued commands max_batch at a time and then reads the responses in
+order, so a batch costs one round trip instead of one per command.
+Every command gets its own outcome: run() returns a list holding each
+result (or info, for input commands), or the IOError the server
+reported for that command, which does not stop the rest of the batch.
+
+    with session.pipeline() as pipe:
+        for name, doc in documents:
+            pipe.add(name, doc)
+    failed = pipe.errors
+
+Responses pile up in the socket buffers until the batch is written, so
+pipeline commands with small results (add, bind, updates, counts) and
+fetch large results with the normal blocking calls."""
+
+    COMMAND, INPUT, QUERY = range(3)
+
+    def __init__(self, session, max_batch=1000):
+        self.__session = session
+        self.max_batch = max_batch
+        self.__queue = []
+        self.results = []
+        self.errors = []   # (position, IOError)
+
+    def __queue_op(self, kind, payload):
+        self.__queue.append((kind, payload))
+        return len(self.results) + len(self.__queue) - 1
+
+    def execute(self, com):
+        """Queue a command (as Session.execute)"""
+        return self.__queue_op(self.COMMAND, com)
+
+    def create(self, name, content):
+        """Queue the creation of a database (as Session.create)"""
+        return self.__queue_op(self.INPUT, (8, name, content))
+
+    def add(self, path, content):
+        """Queue the addition of a resource (as Session.add)"""
+        return self.__queue_op(self.INPUT, (9, path, content))
+
+    def replace(self, path, content):
+        """Queue the replacement of a resource (as Session.replace)"""
+        return self.__queue_op(self.INPUT, (12, path, content))
+
+    def bind(self, query, name, value, datatype=''):
+        """Queue Query.bind on a query created beforehand"""
+        return self.__queue_op(self.QUERY, chr(3) + query.id + chr(0) + name + chr(0) + value + chr(0) + datatype)
+
+    def context(self, query, value, datatype=''):
+        """Queue Query.context"""
+        return self.__queue_op(self.QUERY, chr(14) + query.id + chr(0) + value + chr(0) + datatype)
+
+    def execute_query(self, query):
+        """Queue Query.execute; the result is the serialized query result"""
+        return self.__queue_op(self.QUERY, chr(5) + query.id)
+
+    def close_query(self, query):
+        """Queue Query.close"""
+        return self.__queue_op(self.QUERY, chr(2) + query.id)
+
+    def run(self):
+        """Send the queued commands and return the outcomes of all
+commands run so far (results, or IOError instances)."""
+        queue, self.__queue = self.__queue, []
+        for start in range(0, len(queue), self.max_batch):
+            batch = queue[start:start + self.max_batch]
+            self.__session.send_batch([payload for _, payload in batch])
+            for kind, _ in batch:
+                self.__read(kind)
+        return self.results
+
+    def __read(self, kind):
+        session = self.__session
+        if kind == self.INPUT:
+            result = session.recv_c_str()
+            ok = session.server_response_success()
+            error = result
+        else:
+            result = session.recv_c_str()
+            info = session.recv_c_str() if kind == self.COMMAND else None
+            ok = session.server_response_success()
+            error = info if kind == self.COMMAND or ok else session.recv_c_str()
+        if not ok:
+            result = IOError(error)
+            self.errors.append((len(self.results), result))
+        self.results.append(result)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.run()
+        return False
+
+
+# ---------------------------------
+#
+
+
+class PoolTimeout(IOError):
+    """raised when no pooled session becomes free within the timeout."""
+
+
+class SessionPool(object):
+    """Thread-safe pool of authenticated sessions.
+
+Sessions are created up to max_size (min_size are opened eagerly) and
+handed out one thread at a time. The pool remembers which database each
+session has opened, so checking out with the same database does not send
+``open`` again. A session idle for more than health_interval seconds is
+checked with a trivial query before being returned; sessions that fail
+the check, or are released after an error, are closed and replaced.
+
+    pool = SessionPool('localhost', 1984, 'admin', 'admin', max_size=4)
+    with pool.session('dataset_100') as session:
+        session.execute('xquery count(//Persona)')
+    pool.close()
+"""
+
+    def __init__(self, host, port, user, password, min_size=0, max_size=8,
+                 timeout=30.0, health_interval=30.0, **session_kwargs):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('need 0 <= min_size <= max_size and max_size >= 1')
+        self.__connect_args = (host, port, user, password)
+        self.__session_kwargs = session_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_interval = health_interval
+
+        self.__cond = threading.Condition()
+        self.__idle = deque()    # (session, last use) ready for checkout
+        self.__database = {}     # id(session) -> database opened on it
+        self.__size = 0          # sessions open, idle or checked out
+        self.__closed = False
+
+        for _ in range(min_size):
+            self.__size += 1
+            self.__idle.append((self.__connect(), time.time()))
+
+    def __connect(self):
+        try:
+            return Session(*self.__connect_args, **self.__session_kwargs)
+        except Exception:
+            with self.__cond:
+                self.__size -= 1
+                self.__cond.notify()
+            raise
+
+    def size(self):
+        """Return (open sessions, idle sessions)"""
+        with self.__cond:
+            return self.__size, len(self.__idle)
+
+    def acquire(self, database=None, timeout=None):
+        """Check out a session, with ``database`` opened if given."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.time() + timeout
+        with self.__cond:
+            while True:
+                if self.__closed:
+                    raise IOError('Session pool is closed.')
+                if self.__idle:
+                    session, last_use = self.__take_idle(database)
+                    break
+                if self.__size < self.max_size:
+                    self.__size += 1
+                    session, last_use = None, None
+                    break
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout('No BaseX session free after %.1f s.' % timeout)
+                self.__cond.wait(remaining)
+
+        if session is None:
+            session = self.__connect()
+        elif time.time() - last_use > self.health_interval and not self.__healthy(session):
+            # keep the slot, replace the broken connection
+            self.__close_quietly(session)
+            session = self.__connect()
+        try:
+            if database is not None and self.__database.get(id(session)) != database:
+                session.execute('open ' + database)
+                self.__database[id(session)] = database
+        except Exception:
+            self.release(session, discard=True)
+            raise
+        return session
+
+    def __take_idle(self, database):
+        # prefer an idle session that already has the database open
+        if database is not None:
+            for i, (session, last_use) in enumerate(self.__idle):
+                if self.__database.get(id(session)) == database:
+                    del self.__idle[i]
+                    return session, last_use
+        return self.__idle.pop()
+
+    def __healthy(self, session):
+        try:
+            session.execute('xquery 1')
+            return True
+        except Exception:
+            return False
+
+    def __close_quietly(self, session):
+        self.__database.pop(id(session), None)
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def __discard(self, session):
+        self.__close_quietly(session)
+        with self.__cond:
+            self.__size -= 1
+            self.__cond.notify()
+
+    def release(self, session, discard=False):
+        """Give a session back; discard=True closes it (e.g. after an I/O error)."""
+        if discard or self.__closed:
+            self.__discard(session)
+            return
+        with self.__cond:
+            self.__idle.append((session, time.time()))
+            self.__cond.notify()
+
+    @contextmanager
+    def session(self, database=None, timeout=None):
+        """Context-managed checkout: the session goes back to the pool on
+exit, or is discarded if the block raised."""
+        session = self.acquire(database, timeout)
+        try:
+            yield session
+        except Exception:
+            self.release(session, discard=True)
+            raise
+        self.release(session)
+
+    def close(self):
+        """Close idle sessions; checked-out sessions are closed on release."""
+        with self.__cond:
+            self.__closed = True
+            idle = list(self.__idle)
+            self.__idle.clear()
+            self.__cond.notify_all()
+        for session, _ in idle:
+            self.__discard(session)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
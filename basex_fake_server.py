@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal in-process stand-in for a BaseX server, for exercising
+BaseXClient (sessions, SessionPool, queries, uploads) without a real
+server. It speaks the same wire protocol:
+
+* login: sends ``BaseX:<nonce>``, checks md5(md5(user:BaseX:password) + nonce)
+* commands: ``open <db>``, ``close``, ``xquery <q>``, ``info``, ``exit``;
+  ``set queryinfo`` is honoured, other ``set`` options, ``flush`` and
+  ``optimize`` are accepted and do nothing
+* query protocol: 0 (query), 2 (close), 3 (bind), 4 (iter), 5 (execute),
+  6 (info), 7 (options), 14 (context), 30 (updating), 31 (full)
+* input: 8 (create), 9 (add), 12 (replace), 13 (store)
+
+Queries are not evaluated: ``xquery <q>`` and Query.execute return the
+query text, Query.iter yields one item per line of it, and any query
+containing ``error(`` fails. As with a real server, Query.info() only
+reports the parsing/compiling/evaluating timings once the session has
+run ``set queryinfo true``. ``delay`` adds a fixed latency to every
+command, to simulate server work in load tests.
+
+    server = FakeServer(password='admin', databases=['dataset_100'])
+    server.start()
+    session = BaseXClient.Session('localhost', server.port, 'admin', 'admin')
+"""
+
+import hashlib
+import socket
+import socketserver
+import threading
+import time
+
+# type code sent before every item of Query.iter (clients only require > 0)
+ITEM_TYPE = 33
+
+# info of a query with QUERYINFO enabled; without it only the total is reported
+INFO = ("Query:\n{query}\n\nParsing: 0.05 ms\nCompiling: 0.10 ms\n"
+        "Evaluating: 0.20 ms\nPrinting: 0.05 ms\nTotal Time: 0.40 ms\n")
+INFO_SHORT = "Query executed in 0.40 ms.\n"
+
+
+class Reader(object):
+    """buffered reader of nul-terminated, 0xff-escaped strings."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = b''
+        self.pos = 0
+
+    def fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise EOFError
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def byte(self):
+        if self.pos >= len(self.buf):
+            self.fill()
+        self.pos += 1
+        return self.buf[self.pos - 1]
+
+    def unread(self):
+        self.pos -= 1
+
+    def string(self):
+        out = bytearray()
+        while True:
+            end = self.buf.find(b'\x00', self.pos)
+            esc = self.buf.find(b'\xff', self.pos, end if end >= 0 else len(self.buf))
+            if esc >= 0:
+                out += self.buf[self.pos:esc]
+                self.pos = esc + 1
+                out.append(self.byte())
+            elif end >= 0:
+                out += self.buf[self.pos:end]
+                self.pos = end + 1
+                return bytes(out)
+            else:
+                out += self.buf[self.pos:]
+                self.pos = len(self.buf)
+                self.fill()
+
+
+def escape(data):
+    return data.replace(b'\xff', b'\xff\xff').replace(b'\x00', b'\xff\x00')
+
+
+class Handler(socketserver.BaseRequestHandler):
+
+    def setup(self):
+        self.server.stats['connections'] += 1
+        # no Nagle delay on small responses: pipelined batches would wait for delayed ACKs
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = Reader(self.request)
+        self.database = None
+        self.queryinfo = False
+        self.queries = {}
+
+    def send(self, *parts):
+        self.request.sendall(b''.join(parts))
+
+    def text(self, value):
+        return escape(value.encode('utf-8')) + b'\x00'
+
+    def handle(self):
+        if not self.login():
+            return
+        self.server.stats['logins'] += 1
+        try:
+            while True:
+                first = self.reader.byte()
+                if self.server.delay:
+                    time.sleep(self.server.delay)
+                if first in (0, 2, 3, 4, 5, 6, 7, 14, 30, 31):
+                    self.query_command(first)
+                elif first in (8, 9, 12, 13):
+                    self.input_command(first)
+                else:
+                    self.reader.unread()
+                    command = self.reader.string().decode('utf-8')
+                    if command == 'exit':
+                        return
+                    self.command(command)
+        except EOFError:
+            return
+
+    def login(self):
+        nonce = str(id(self))
+        self.send(self.text('BaseX:' + nonce))
+        user = self.reader.string().decode('utf-8')
+        digest = self.reader.string().decode('ascii')
+        code = '%s:BaseX:%s' % (user, self.server.password)
+        inner = hashlib.md5(code.encode('us-ascii')).hexdigest()
+        ok = hashlib.md5((inner + nonce).encode('us-ascii')).hexdigest() == digest
+        self.send(b'\x00' if ok else b'\x01')
+        return ok
+
+    def command(self, command):
+        self.server.stats['commands'] += 1
+        name, _, arg = command.partition(' ')
+        if name == 'open':
+            if self.server.databases is not None and arg not in self.server.databases:
+                return self.send(b'\x00', self.text('Database \'%s\' was not found.' % arg), b'\x01')
+            self.database = arg
+            return self.send(b'\x00', self.text('Database \'%s\' was opened.' % arg), b'\x00')
+        if name == 'close':
+            self.database = None
+            return self.send(b'\x00', self.text(''), b'\x00')
+        if name == 'xquery':
+            if 'error(' in arg:
+                return self.send(b'\x00', self.text('Stopped at line 1: ' + arg), b'\x01')
+            return self.send(self.text(arg), self.text(self.info(arg)), b'\x00')
+        if name == 'set':
+            option, _, value = arg.partition(' ')
+            if option.lower() == 'queryinfo':
+                self.queryinfo = value.strip().lower() not in ('false', 'off')
+            return self.send(b'\x00', self.text(''), b'\x00')
+        if name in ('flush', 'optimize'):
+            return self.send(b'\x00', self.text(''), b'\x00')
+        if name == 'info':
+            return self.send(self.text('database: %s' % self.database), self.text(''), b'\x00')
+        self.send(b'\x00', self.text('Unknown command: ' + name), b'\x01')
+
+    def query_command(self, code):
+        self.server.stats['queries' if code == 0 else 'query_calls'] += 1
+        arg = self.reader.string().decode('utf-8')
+        if code == 0:
+            qid = str(len(self.queries) + 1)
+            self.queries[qid] = arg
+            return self.send(self.text(qid), b'\x00')
+        if code == 3 or code == 14:
+            qid = arg
+            for _ in range(3 if code == 3 else 2):
+                self.reader.string()
+            return self.send(b'\x00', b'\x00') if qid in self.queries else self.fail('Unknown query id.')
+        query = self.queries.get(arg)
+        if query is None:
+            return self.fail('Unknown query id.')
+        if code == 2:
+            del self.queries[arg]
+            return self.send(b'\x00', b'\x00')
+        if 'error(' in query and code in (4, 5, 31):
+            if code == 4:
+                return self.send(b'\x00', b'\x01', self.text('Stopped at line 1: ' + query))
+            return self.fail('Stopped at line 1: ' + query)
+        if code == 4:
+            items = b''.join(bytes([ITEM_TYPE]) + self.text(line) for line in query.splitlines() if line)
+            return self.send(items, b'\x00', b'\x00')
+        if code == 5 or code == 31:
+            return self.send(self.text(query), b'\x00')
+        if code == 6:
+            return self.send(self.text(self.info(query)), b'\x00')
+        if code == 7:
+            return self.send(self.text(''), b'\x00')
+        if code == 30:
+            return self.send(self.text('false'), b'\x00')
+
+    def input_command(self, code):
+        self.server.stats['inputs'] += 1
+        name = self.reader.string().decode('utf-8')
+        content = self.reader.string()
+        if code != 8 and self.database is None:
+            return self.send(self.text('No database opened.'), b'\x01')
+        if code == 8:
+            self.database = name
+        self.server.resources[(self.database, name if code != 8 else '')] = content
+        self.send(self.text('Resource(s) added in 0.1 ms.'), b'\x00')
+
+    def info(self, query):
+        return INFO.format(query=query) if self.queryinfo else INFO_SHORT
+
+    def fail(self, message):
+        self.send(b'\x00', b'\x01', self.text(message))
+
+
+class FakeServer(socketserver.ThreadingTCPServer):
+    """threaded fake BaseX server on localhost (port 0 = any free port)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, port=0, password='admin', databases=None, delay=0.0):
+        socketserver.ThreadingTCPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.password = password
+        self.databases = None if databases is None else set(databases)
+        self.delay = delay
+        self.resources = {}
+        self.stats = {'connections': 0, 'logins': 0, 'commands': 0, 'queries': 0,
+                      'query_calls': 0, 'inputs': 0}
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == '__main__':
+    import argparse
+    p = argparse.ArgumentParser(description='Fake BaseX server for client tests.')
+    p.add_argument('--port', type=int, default=1984)
+    p.add_argument('--password', default='admin')
+    p.add_argument('--delay', type=float, default=0.0, help='seconds of latency per command')
+    args = p.parse_args()
+    server = FakeServer(args.port, args.password, delay=args.delay)
+    print('fake BaseX server on port %d' % server.port)
+    server.serve_forever()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+import csv
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import compressione
+
+
+#caricamento batch in Neo4j: ogni CSV viene letto una sola volta e spedito a blocchi
+#con UNWIND $rows da più writer concorrenti che condividono il pool di connessioni del driver.
+#Sostituisce new_import.txt (un LOAD CSV + MERGE per label e per relazione).
+
+#configurazione Neo4j
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "12345678"
+NEO4J_DATABASE = "neo4j"
+
+BATCH   = 10_000  #righe per UNWIND
+WRITERS = 4       #transazioni concorrenti
+
+VINCOLI = [
+    "CREATE CONSTRAINT persona_pk IF NOT EXISTS FOR (p:Persona) REQUIRE p.matricola IS UNIQUE",
+    "CREATE CONSTRAINT documento_pk IF NOT EXISTS FOR (d:Documento) REQUIRE d.id_documento IS UNIQUE",
+    "CREATE CONSTRAINT banca_pk IF NOT EXISTS FOR (b:Banca) REQUIRE b.id_banca IS UNIQUE",
+    "CREATE CONSTRAINT fonte_pk IF NOT EXISTS FOR (f:Fonte) REQUIRE f.id_fonte IS UNIQUE",
+    "CREATE CONSTRAINT transazione_pk IF NOT EXISTS FOR (t:Transazione) REQUIRE t.id_transazione IS UNIQUE",
+]
+
+#fasi in ordine: prima i nodi che sono solo destinazione, poi persone e transazioni
+#che creano il proprio nodo e tutte le relazioni uscenti nello stesso passaggio
+FASI = [
+    ("banche", "banche.csv", """
+UNWIND $rows AS row
+MERGE (b:Banca {id_banca: row.`id_banca:ID`})
+SET b.nome = row.nome,
+    b.nazione = row.nazione,
+    b.max_deposito = toInteger(row.`max_deposito:INT`)
+"""),
+    ("fonti", "fonti.csv", """
+UNWIND $rows AS row
+MERGE (f:Fonte {id_fonte: row.`id_fonte:ID`})
+SET f.nome = row.nome,
+    f.nazione = row.nazione,
+    f.affidabilita = toFloat(row.`affidabilita:FLOAT`)
+"""),
+    ("documenti", "documenti.csv", """
+UNWIND $rows AS row
+MERGE (d:Documento {id_documento: row.`id_documento:ID`})
+SET d.nazione = row.nazione,
+    d.email = row.email,
+    d.scadenza = date(row.scadenza),
+    d.matricola = row.matricola,
+    d.num_telefono = row.num_telefono
+"""),
+    ("persone", "persone.csv", """
+UNWIND $rows AS row
+MERGE (p:Persona {matricola: row.`matricola:ID`})
+SET p.nome = row.nome,
+    p.cognome = row.cognome,
+    p.stipendio = toInteger(row.`stipendio:INT`),
+    p.id_banca = row.id_banca,
+    p.id_documento = row.id_documento,
+    p.id_fonte = row.id_fonte
+WITH p, row
+CALL { WITH p, row MATCH (d:Documento {id_documento: row.id_documento}) MERGE (p)-[:HA_DOCUMENTO]->(d) }
+CALL { WITH p, row MATCH (b:Banca {id_banca: row.id_banca}) MERGE (p)-[:HA_BANCA]->(b) }
+CALL { WITH p, row MATCH (f:Fonte {id_fonte: row.id_fonte}) MERGE (p)-[:HA_FONTE]->(f) }
+"""),
+    ("transazioni", "transazioni.csv", """
+UNWIND $rows AS row
+MERGE (t:Transazione {id_transazione: row.`id_transazione:ID`})
+SET t.importo = toInteger(row.`importo:INT`),
+    t.destinatario = row.destinatario,
+    t.data = date(row.`data:DATE`),
+    t.matricola = row.matricola,
+    t.id_banca_deriva = row.id_banca_deriva
+WITH t, row
+CALL { WITH t, row MATCH (p:Persona {matricola: row.matricola}) MERGE (p)-[:ESEGUE]->(t) }
+CALL { WITH t, row MATCH (b:Banca {id_banca: row.id_banca_deriva}) MERGE (b)-[:DERIVA]->(t) }
+"""),
+]
+
+#delta (subset.py --delta): una persona nuova può essere il mittente di transazioni caricate
+#in un livello precedente, quando lei ancora mancava. Le ESEGUE mancanti si recuperano dopo le fasi
+#(ogni volta che si caricano le persone), cercando le transazioni per mittente. L'indice serve solo
+#a questo recupero e si elimina subito dopo: il grafo misurato ha gli stessi indici di un caricamento completo
+INDICI_DELTA = [
+    "CREATE INDEX transazione_mittente IF NOT EXISTS FOR (t:Transazione) ON (t.matricola)",
+]
+RIMUOVI_INDICI_DELTA = [
+    "DROP INDEX transazione_mittente IF EXISTS",
+]
+FASE_DELTA = ("esegue_pendenti", "persone.csv", """
+UNWIND $rows AS row
+MATCH (p:Persona {matricola: row.`matricola:ID`})
+MATCH (t:Transazione {matricola: row.`matricola:ID`})
+MERGE (p)-[:ESEGUE]->(t)
+""")
+
+
+#sostituto del driver che registra le query invece di inviarle: permette di provare il loader senza server
+class DriverRegistrato:
+    def __init__(self):
+        self.chiamate = []  #(query, numero righe, nome thread)
+        self._lock = threading.Lock()
+
+    def verify_connectivity(self):
+        pass
+
+    def session(self, **kwargs):
+        return SessioneRegistrata(self)
+
+    def close(self):
+        pass
+
+class SessioneRegistrata:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        return self._registra(query, params)
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(self, *args, **kwargs) #la sessione fa anche da transazione
+
+    def _registra(self, query, params):
+        with self._driver._lock:
+            self._driver.chiamate.append((query, len(params.get("rows", ())), threading.current_thread().name))
+        return RisultatoRegistrato()
+
+class RisultatoRegistrato:
+    def consume(self):
+        return None
+
+
+def batch_csv(path: Path, dim: int):
+    with compressione.apri_csv(path) as f: #anche .csv.gz / .csv.zst
+        blocco = []
+        for row in csv.DictReader(f):
+            blocco.append(row)
+            if len(blocco) >= dim:
+                yield blocco
+                blocco = []
+        if blocco:
+            yield blocco
+
+def scrivi_batch(driver, database: str, query: str, rows: List[dict]) -> int:
+    #execute_write ripete da solo la transazione in caso di errori transitori (es. deadlock tra writer)
+    with driver.session(database=database) as session:
+        session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+    return len(rows)
+
+def carica_fase(driver, database: str, path: Path, query: str, dim_batch: int, writers: int) -> int:
+    righe = 0
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        in_volo = set()
+        for rows in batch_csv(path, dim_batch):
+            #al massimo 2 batch in attesa per writer: la memoria non dipende dalla dimensione del file
+            if len(in_volo) >= writers * 2:
+                fatti, in_volo = wait(in_volo, return_when=FIRST_COMPLETED)
+                righe += sum(f.result() for f in fatti)
+            in_volo.add(pool.submit(scrivi_batch, driver, database, query, rows))
+        righe += sum(f.result() for f in wait(in_volo).done)
+    return righe
+
+def carica(driver, input_dir: Path, database: str = NEO4J_DATABASE, dim_batch: int = BATCH,
+           writers: int = WRITERS, fasi: List[str] = None, delta: bool = False) -> Dict[str, tuple]:
+    scelte = [f for f in FASI if not fasi or f[0] in fasi]
+    #il recupero delle ESEGUE segue le persone anche con --fasi (che accetta solo i nomi di FASI)
+    recupero = delta and any(f[0] == "persone" for f in scelte)
+    with driver.session(database=database) as session:
+        for vincolo in VINCOLI + (INDICI_DELTA if recupero else []):
+            session.run(vincolo).consume()
+
+    statistiche = {}
+    print(f"{'Fase':<16} | {'Righe':>10} | {'Secondi':>8} | {'Righe/s':>10}")
+    print("-" * 54)
+    try:
+        for nome, file, query in scelte + ([FASE_DELTA] if recupero else []):
+            path = input_dir / file
+            if not compressione.esiste(path):
+                raise FileNotFoundError(f"Nella cartella '{input_dir}' manca: {file}")
+            start = time.perf_counter()
+            righe = carica_fase(driver, database, path, query, dim_batch, writers)
+            secondi = time.perf_counter() - start
+            velocita = righe / secondi if secondi > 0 else float("inf")
+            statistiche[nome] = (righe, secondi, velocita)
+            print(f"{nome:<16} | {righe:>10} | {secondi:8.2f} | {velocita:10.0f}")
+    finally:
+        if recupero:
+            with driver.session(database=database) as session:
+                for indice in RIMUOVI_INDICI_DELTA:
+                    session.run(indice).consume()
+    return statistiche
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Carica i CSV del dataset in Neo4j con batch UNWIND paralleli.")
+    p.add_argument("input_dir", type=Path, nargs="?", default=Path("."), help="Cartella con i CSV (default: corrente)")
+    p.add_argument("--delta", type=Path, nargs="+", default=[], metavar="DIR",
+                   help="Cartelle delta di subset.py --delta applicate in ordine dopo input_dir "
+                        "(es. subset_25 --delta delta_25_50 delta_50_75).")
+    p.add_argument("--batch", type=int, default=BATCH, help=f"Righe per transazione (default {BATCH}).")
+    p.add_argument("--writers", type=int, default=WRITERS, help=f"Transazioni concorrenti (default {WRITERS}).")
+    p.add_argument("--fasi", nargs="+", choices=[f[0] for f in FASI], help="Carica solo le fasi indicate.")
+    p.add_argument("--uri", default=NEO4J_URI)
+    p.add_argument("--user", default=NEO4J_USER)
+    p.add_argument("--password", default=NEO4J_PASSWORD)
+    p.add_argument("--database", default=NEO4J_DATABASE)
+    p.add_argument("--dry-run", action="store_true",
+                   help="Non si collega a Neo4j: registra le query con DriverRegistrato (misura lettura e batching).")
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if args.dry_run:
+        driver = DriverRegistrato()
+    else:
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password),
+                                      max_connection_pool_size=max(args.writers, 1) + 1)
+    try:
+        driver.verify_connectivity()
+        carica(driver, args.input_dir, args.database, args.batch, args.writers, args.fasi)
+        for delta_dir in args.delta:
+            print(f"Delta: {delta_dir}")
+            carica(driver, delta_dir, args.database, args.batch, args.writers, args.fasi, delta=True)
+        return 0
+    except FileNotFoundError as e:
+        print(f"File mancante: {e}")
+        return 3
+    except Exception as e:
+        print(f"Errore Neo4j: {e}")
+        return 1
+    finally:
+        driver.close()
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,215 @@
+#formato colonnare (Parquet) accanto ai CSV: colonne tipizzate, ID già normalizzati
+#(minuscoli, senza spazi) e codifica a dizionario sulle colonne ID.
+#I file si chiamano come i CSV (persone.parquet, ...) e hanno gli stessi nomi di colonna,
+#così subset.py e verify_subset.py ottengono DataFrame equivalenti senza rifare norm_series.
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError: #opzionale: serve solo per --parquet / i file .parquet
+    pa = pc = pq = None
+
+TABELLE = ["persone", "documenti", "banche", "fonti", "transazioni"]
+
+#metadato scritto da chi produce ID già normalizzati: chi legge salta la normalizzazione
+META_NORMALIZZATO = b"normalizzato"
+
+#tipo di ogni colonna (nomi come negli header CSV); None = stringa
+TIPI = {
+    "persone":     {"stipendio:INT": "int32"},
+    "documenti":   {"scadenza": "date32"},
+    "banche":      {"max_deposito:INT": "int32"},
+    "fonti":       {"affidabilita:FLOAT": "float64"},
+    "transazioni": {"importo:INT": "int32", "data:DATE": "date32"},
+}
+
+#colonne ID/chiave esterna: codifica a dizionario nel file Parquet
+COLONNE_ID = {
+    "persone":     ["matricola:ID", "id_banca", "id_documento", "id_fonte"],
+    "documenti":   ["id_documento:ID", "matricola"],
+    "banche":      ["id_banca:ID"],
+    "fonti":       ["id_fonte:ID"],
+    "transazioni": ["id_transazione:ID", "matricola", "destinatario", "id_banca_deriva"],
+}
+
+#chiavi esterne a bassa cardinalità lette come dizionario (categorie pandas) invece che come stringhe
+DIZIONARIO_IN_LETTURA = {
+    "persone":     ["id_banca", "id_fonte", ":LABEL"],
+    "documenti":   [":LABEL"],
+    "banche":      [":LABEL"],
+    "fonti":       [":LABEL"],
+    "transazioni": ["id_banca_deriva", ":LABEL"],
+}
+
+
+#modalità ID interi (--int-ids): le colonne ID restano numeri (p123 -> 123) e il prefisso
+#dell'entità si rimette solo quando si esporta in CSV/XML. Nei file Parquet il metadato
+#META_ID_INTERI indica che le colonne ID sono int32/int64 senza prefisso
+META_ID_INTERI = b"id_interi"
+
+#prefisso per colonna (header CSV e relazioni), per gruppo negli header neo4j-admin (es. :START_ID(Persona))
+PREFISSO_COLONNA = {
+    "matricola:ID": "p", "matricola": "p", "destinatario": "p",
+    "id_documento:ID": "d", "id_documento": "d",
+    "id_banca:ID": "b", "id_banca": "b", "id_banca_deriva": "b", "id_banca:START_ID": "b",
+    "id_fonte:ID": "f", "id_fonte": "f",
+    "id_transazione:ID": "t", "id_transazione:END_ID": "t",
+}
+PREFISSO_GRUPPO = {"Persona": "p", "Documento": "d", "Banca": "b", "Fonte": "f", "Transazione": "t"}
+GRUPPO = re.compile(r":(?:ID|START_ID|END_ID)\((\w+)\)$")
+
+
+def prefisso(colonna):
+    #None per le colonne che non sono ID
+    if colonna in PREFISSO_COLONNA:
+        return PREFISSO_COLONNA[colonna]
+    m = GRUPPO.search(colonna)
+    return PREFISSO_GRUPPO.get(m.group(1)) if m else None
+
+def tipo_id(massimo):
+    #int32 finché gli ID ci stanno, altrimenti int64
+    return "int32" if massimo < 2**31 else "int64"
+
+def interi_a_testo(pre, numeri):
+    #array numpy di interi -> lista di stringhe con prefisso; -1 = valore mancante ("")
+    if len(numeri) and numeri.min() < 0:
+        return [f"{pre}{i}" if i >= 0 else "" for i in numeri.tolist()]
+    return [f"{pre}{i}" for i in numeri.tolist()]
+
+def id_interi(df):
+    #colonne ID di un DataFrame normalizzato da stringhe ("p123") a int64 (123), in place
+    for c in df.columns:
+        pre = prefisso(c)
+        if pre is None or pd.api.types.is_integer_dtype(df[c]):
+            continue
+        s = df[c].astype(str)
+        numero = s.str.slice(len(pre))
+        vuoto = s == ""
+        validi = vuoto | (s.str.startswith(pre) & numero.str.isdigit())
+        if not validi.all():
+            raise ValueError(f"colonna {c}: ID non nel formato '{pre}<numero>' (es. {s[~validi].iloc[0]!r})")
+        df[c] = pd.to_numeric(numero.where(~vuoto, "-1")).astype(np.int64)
+    return df
+
+def id_testo(df):
+    #inverso di id_interi: è il confine di esportazione (CSV/XML), restituisce una copia
+    df = df.copy()
+    for c in df.columns:
+        pre = prefisso(c)
+        if pre is not None and pd.api.types.is_integer_dtype(df[c]):
+            df[c] = interi_a_testo(pre, df[c].to_numpy())
+    return df
+
+def ha_id_interi(df):
+    return any(prefisso(c) and pd.api.types.is_integer_dtype(df[c]) for c in df.columns)
+
+
+def richiedi_pyarrow():
+    if pa is None:
+        raise ImportError("per i file Parquet serve il pacchetto 'pyarrow' (pip install pyarrow)")
+
+def percorso(dirpath, tabella):
+    return os.path.join(os.fspath(dirpath), f"{tabella}.parquet")
+
+def esiste(dirpath, tabella):
+    return os.path.exists(percorso(dirpath, tabella))
+
+def tutte_presenti(dirpath):
+    return all(esiste(dirpath, t) for t in TABELLE)
+
+def tipo_arrow(nome):
+    return {"int32": pa.int32(), "int64": pa.int64(), "float64": pa.float64(),
+            "date32": pa.date32()}.get(nome, pa.string())
+
+def schema(tabella, header, tipo_ids=None):
+    #tipo_ids ("int32"/"int64"): colonne ID intere senza prefisso, None = stringhe "p123"
+    richiedi_pyarrow()
+    tipi = dict(TIPI.get(tabella, {}))
+    metadati = {META_NORMALIZZATO: b"1"}
+    if tipo_ids:
+        tipi.update({c: tipo_ids for c in header if prefisso(c)})
+        metadati[META_ID_INTERI] = b"1"
+    return pa.schema([pa.field(c, tipo_arrow(tipi.get(c))) for c in header], metadata=metadati)
+
+def colonna_arrow(valori, campo):
+    tipo, pre = campo.type, prefisso(campo.name)
+    numpy = getattr(valori, "dtype", None) is not None
+    if numpy and pre and valori.dtype.kind in "iu" and tipo == pa.string():
+        arr = pa.array(interi_a_testo(pre, valori)) #ID numerici della modalità veloce -> "p123"
+    elif numpy and valori.dtype.kind in "US":
+        arr = pa.array(valori) #array numpy di stringhe
+    else:
+        arr = pa.array(list(valori) if isinstance(valori, tuple) else valori)
+    if pre and pa.types.is_integer(tipo) and pa.types.is_string(arr.type):
+        arr = pc.utf8_slice_codeunits(arr, len(pre)) #"p123" (modalità classica) -> 123
+    return arr if arr.type == tipo else arr.cast(tipo) #es. "2024-01-31" -> date32
+
+
+class TabellaParquet:
+    #stessa interfaccia di TabellaCsv in genera.py: scrivi(colonne) a blocchi, un row group per blocco
+    def __init__(self, path, tabella, header, etichetta, suffisso="", tipo_ids=None):
+        self.base = path
+        self.path = self.percorso(suffisso)
+        self.tabella = tabella
+        self.etichetta = etichetta
+        self.schema = schema(tabella, header, tipo_ids)
+        self.righe = 0
+        self.apri()
+
+    def percorso(self, suffisso=""):
+        return self.base + suffisso
+
+    def apri(self):
+        self.w = pq.ParquetWriter(self.path, self.schema, compression="zstd",
+                                  use_dictionary=COLONNE_ID.get(self.tabella, []) + [":LABEL"])
+
+    def scrivi(self, colonne):
+        n = len(colonne[0]) if colonne else 0
+        if n == 0:
+            return
+        arrays = [colonna_arrow(c, f) for c, f in zip(colonne, self.schema)]
+        arrays.append(pa.array([self.etichetta] * n, type=pa.string()))
+        self.w.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.righe += n
+
+    def accoda_grezzo(self, parte):
+        #le parti Parquet non si concatenano a byte: si ricopiano i row group (senza riparsare testo)
+        #chiusa subito: su Windows il chiamante la cancella appena copiata
+        with pq.ParquetFile(parte) as f:
+            for i in range(f.num_row_groups):
+                self.w.write_table(f.read_row_group(i).replace_schema_metadata(self.schema.metadata))
+
+    def close(self):
+        self.w.close()
+
+
+def scrivi_df(df, path):
+    #scrive un DataFrame (es. un subset) in Parquet mantenendo il metadato di normalizzazione
+    richiedi_pyarrow()
+    tabella = pa.Table.from_pandas(df, preserve_index=False)
+    metadati = {**(tabella.schema.metadata or {}), META_NORMALIZZATO: b"1"}
+    if ha_id_interi(df):
+        metadati[META_ID_INTERI] = b"1"
+    tabella = tabella.replace_schema_metadata(metadati)
+    os.makedirs(os.path.dirname(os.fspath(path)) or ".", exist_ok=True)
+    pq.write_table(tabella, path, compression="zstd")
+
+def leggi_df(dirpath, tabella, colonne=None):
+    #proiezione: con colonne=[...] vengono lette solo quelle; restituisce (DataFrame, già_normalizzato)
+    richiedi_pyarrow()
+    path = percorso(dirpath, tabella)
+    sch = pq.read_schema(path)
+    if colonne is not None:
+        colonne = [c for c in colonne if c in sch.names]
+    #solo le colonne di testo diventano categorie: gli ID interi restano interi
+    dizionario = [c for c in DIZIONARIO_IN_LETTURA.get(tabella, [])
+                  if c in sch.names and (colonne is None or c in colonne) and pa.types.is_string(sch.field(c).type)]
+    t = pq.read_table(path, columns=colonne, read_dictionary=dizionario)
+    normalizzato = (t.schema.metadata or {}).get(META_NORMALIZZATO) == b"1"
+    return t.to_pandas(), normalizzato
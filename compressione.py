@@ -0,0 +1,79 @@
+#apertura trasparente di CSV/XML compressi (.gz, .zst) in streaming, usata da tutti gli script.
+#In scrittura la compressione si sceglie con --compress gz|zst; in lettura si riconosce dall'estensione,
+#e un file "persone.csv" viene cercato anche come "persone.csv.gz" / "persone.csv.zst".
+import os
+import gzip
+import codecs
+
+try:
+    import zstandard #opzionale: serve solo per i file .zst
+except ImportError:
+    zstandard = None
+
+ESTENSIONI = {"gz": ".gz", "zst": ".zst"}
+
+#livelli bassi: qui conta la velocità di scrittura più dell'ultimo punto di compressione
+LIVELLO_GZ  = 3
+LIVELLO_ZST = 3
+
+
+def con_estensione(path, compressione):
+    #"persone.csv" + "gz" -> "persone.csv.gz" (None = nessuna compressione)
+    return os.fspath(path) + ESTENSIONI[compressione] if compressione else os.fspath(path)
+
+def trova_file(path):
+    #restituisce la prima variante esistente tra path, path.gz, path.zst (altrimenti path invariato)
+    path = os.fspath(path)
+    for ext in ("",) + tuple(ESTENSIONI.values()):
+        if os.path.exists(path + ext):
+            return path + ext
+    return path
+
+def esiste(path):
+    return os.path.exists(trova_file(path))
+
+def compressione_di(path):
+    path = os.fspath(path)
+    for nome, ext in ESTENSIONI.items():
+        if path.endswith(ext):
+            return nome
+    return None
+
+def apri(path, modo="rt", encoding="utf-8", newline=""):
+    #modo come open(): "rt", "wt", "at" (testo) oppure "rb", "wb", "ab"
+    path = os.fspath(path)
+    testo = {"encoding": encoding, "newline": newline} if "b" not in modo else {}
+    compressione = compressione_di(path)
+    if compressione == "gz":
+        return gzip.open(path, modo, compresslevel=LIVELLO_GZ, **testo)
+    if compressione == "zst":
+        if zstandard is None:
+            raise ImportError("per i file .zst serve il pacchetto 'zstandard' (pip install zstandard)")
+        cctx = zstandard.ZstdCompressor(level=LIVELLO_ZST) if modo[0] in "wa" else None
+        return zstandard.open(path, modo, cctx=cctx, **testo)
+    return open(path, modo, **testo)
+
+def opzioni_pandas(compressione):
+    #argomento compression= per DataFrame.to_csv con gli stessi livelli usati qui
+    if compressione == "gz":
+        return {"method": "gzip", "compresslevel": LIVELLO_GZ}
+    if compressione == "zst":
+        return {"method": "zstd", "level": LIVELLO_ZST}
+    return None
+
+def utf8_valido(path):
+    #controlla tutto il file (a blocchi, decompresso in streaming): un byte CP1252 può stare anche in fondo
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with apri(path, "rb") as f:
+            for blocco in iter(lambda: f.read(1 << 20), b""):
+                decoder.decode(blocco)
+        decoder.decode(b"", final=True)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def apri_csv(path):
+    #UTF-8 se tutto il file lo è, altrimenti CP1252 come il fallback di pandas in read_csv_safe (anche se compresso)
+    path = trova_file(path)
+    return apri(path, "rt", encoding="utf-8" if utf8_valido(path) else "cp1252")
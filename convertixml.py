@@ -1,22 +1,26 @@
 
 import csv
 import os
+import argparse
+import itertools
+import time
 from xml.sax.saxutils import escape
 
+import compressione
+
 #Config 
 INPUT_DIR = "."                #cartella CSV
 OUTPUT_FILE = "graph.xml"      #XML risultante
 WRITE_RELATIONS = False        #True per aggiungere la sezione <Relazioni>
+COMPRESSIONE = None            #None | "gz" | "zst": graph.xml.gz / graph.xml.zst scritto in streaming
 
 #utility 
 def esc(v): return "" if v is None else escape(str(v))
 
 def open_csv(path):
     #prova ad aprire un CSV in UTF-8 e, se fallisce lo riapre in CP1252
-    try:
-        return open(path, encoding="utf-8", newline="") 
-    except UnicodeDecodeError:
-        return open(path, encoding="cp1252", newline="")
+    #accetta anche persone.csv.gz / persone.csv.zst al posto di persone.csv
+    return compressione.apri_csv(path)
 
 def write_open(f, tag):  f.write(f"<{tag}>\n") #per scrivere tag XML su un file già aperto in modalità testo
 def write_close(f, tag): f.write(f"</{tag}>\n")
@@ -50,112 +54,188 @@ def load_fonti(): #idem
                 }
     return seen
 
-def main():
-    banche = load_banche()
-    fonti  = load_fonti()
+#elementi XML per entità: ogni generatore produce il testo di un elemento alla volta, così lo
+#stesso codice scrive graph.xml oppure alimenta direttamente BaseX (--basex) senza file intermedio
+def persone_xml():
+    with open_csv(os.path.join(INPUT_DIR, "persone.csv")) as fin:
+        r = csv.DictReader(fin)
+        for row in r:
+            mid = row.get("matricola:ID")
+            if not mid: 
+                continue
+            fid = row.get("id_fonte") or row.get("id_fonte:ID")
+            yield (
+                '  <Persona '
+                f'matricola="{esc(mid)}" '
+                f'stipendio="{esc(row.get("stipendio:INT"))}">\n'
+                f'    <Nome>{esc(row.get("nome"))}</Nome>\n'
+                f'    <Cognome>{esc(row.get("cognome"))}</Cognome>\n'
+                f'    <BancaRef id="{esc(row.get("id_banca"))}"/>\n'
+                f'    <DocumentoRef id="{esc(row.get("id_documento"))}"/>\n'
+                f'    <FonteRef id="{esc(fid)}"/>\n'
+                "  </Persona>\n"
+            )
+
+def documenti_xml():
+    with open_csv(os.path.join(INPUT_DIR, "documenti.csv")) as fin:
+        r = csv.DictReader(fin)
+        for row in r:
+            did = row.get("id_documento:ID")
+            if not did: 
+                continue
+            yield (
+                '  <Documento '
+                f'id="{esc(did)}" '
+                f'nazione="{esc(row.get("nazione"))}" '
+                f'scadenza="{esc(row.get("scadenza"))}">\n'
+                f'    <Email>{esc(row.get("email"))}</Email>\n'
+                f'    <NumeroTelefono>{esc(row.get("num_telefono"))}</NumeroTelefono>\n'
+                f'    <PersonaRef matricola="{esc(row.get("matricola"))}"/>\n'
+                "  </Documento>\n"
+            )
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8", newline="") as fout:
+def banche_xml():
+    for b in load_banche().values():
+        yield (
+            '  <Banca '
+            f'id="{esc(b["id"])}" '
+            f'nazione="{esc(b.get("nazione"))}" '
+            f'max_deposito="{esc(b.get("max_deposito"))}">\n'
+            f'    <Nome>{esc(b.get("nome"))}</Nome>\n'
+            "  </Banca>\n"
+        )
+
+def fonti_xml():
+    for f in load_fonti().values():
+        yield (
+            '  <Fonte '
+            f'id="{esc(f["id"])}" '
+            f'nazione="{esc(f.get("nazione"))}" '
+            f'affidabilita="{esc(f.get("affidabilita"))}">\n'
+            f'    <Nome>{esc(f.get("nome"))}</Nome>\n'
+            "  </Fonte>\n"
+        )
+
+def transazioni_xml(): #con BancaDerivaRef
+    with open_csv(os.path.join(INPUT_DIR, "transazioni.csv")) as fin:
+        r = csv.DictReader(fin)
+        for row in r:
+            tid = row.get("id_transazione:ID")
+            if not tid:
+                continue
+            yield (
+                '  <Transazione '
+                f'id="{esc(tid)}" '
+                f'importo="{esc(row.get("importo:INT"))}" '
+                f'data="{esc(row.get("data:DATE"))}">\n'
+                f'    <MittenteRef matricola="{esc(row.get("matricola"))}"/>\n'
+                f'    <DestinatarioRef matricola="{esc(row.get("destinatario"))}"/>\n'
+                f'    <BancaDerivaRef id="{esc(row.get("id_banca_deriva"))}"/>\n' #banca di derivazione della transazione
+                "  </Transazione>\n"
+            )
+
+#sezioni di /Graph/Nodi nell'ordine di graph.xml
+SEZIONI = [
+    ("Persone", persone_xml),
+    ("Documenti", documenti_xml),
+    ("Banche", banche_xml),
+    ("Fonti", fonti_xml),
+    ("Transazioni", transazioni_xml),
+]
+
+
+def scrivi_file(output_file):
+    with compressione.apri(output_file, "wt", encoding="utf-8", newline="") as fout:
         #header
         fout.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         fout.write("<Graph>\n") #scrive l'inizio del file xml 
         write_open(fout, "Nodi") 
-
-        #Persone
-        write_open(fout, "Persone")
-        with open_csv(os.path.join(INPUT_DIR, "persone.csv")) as fin:
-            r = csv.DictReader(fin)
-            for row in r:
-                mid = row.get("matricola:ID")
-                if not mid: 
-                    continue
-                fout.write(
-                    '  <Persona '
-                    f'matricola="{esc(mid)}" '
-                    f'stipendio="{esc(row.get("stipendio:INT"))}">\n'
-                )
-                fout.write(f'    <Nome>{esc(row.get("nome"))}</Nome>\n')
-                fout.write(f'    <Cognome>{esc(row.get("cognome"))}</Cognome>\n')
-                fout.write(f'    <BancaRef id="{esc(row.get("id_banca"))}"/>\n')
-                fout.write(f'    <DocumentoRef id="{esc(row.get("id_documento"))}"/>\n')
-                fid = row.get("id_fonte") or row.get("id_fonte:ID")
-                fout.write(f'    <FonteRef id="{esc(fid)}"/>\n')
-                fout.write("  </Persona>\n")
-        write_close(fout, "Persone")
-
-        #Documenti
-        write_open(fout, "Documenti")
-        with open_csv(os.path.join(INPUT_DIR, "documenti.csv")) as fin:
-            r = csv.DictReader(fin)
-            for row in r:
-                did = row.get("id_documento:ID")
-                if not did: 
-                    continue
-                fout.write(
-                    '  <Documento '
-                    f'id="{esc(did)}" '
-                    f'nazione="{esc(row.get("nazione"))}" '
-                    f'scadenza="{esc(row.get("scadenza"))}">\n'
-                )
-                fout.write(f'    <Email>{esc(row.get("email"))}</Email>\n')
-                fout.write(f'    <NumeroTelefono>{esc(row.get("num_telefono"))}</NumeroTelefono>\n')
-                fout.write(f'    <PersonaRef matricola="{esc(row.get("matricola"))}"/>\n')
-                fout.write("  </Documento>\n")
-        write_close(fout, "Documenti")
-
-        #Banche
-        write_open(fout, "Banche")
-        for b in banche.values():
-            fout.write(
-                '  <Banca '
-                f'id="{esc(b["id"])}" '
-                f'nazione="{esc(b.get("nazione"))}" '
-                f'max_deposito="{esc(b.get("max_deposito"))}">\n'
-            )
-            fout.write(f'    <Nome>{esc(b.get("nome"))}</Nome>\n')
-            fout.write("  </Banca>\n")
-        write_close(fout, "Banche")
-
-        #Fonti
-        write_open(fout, "Fonti")
-        for f in fonti.values():
-            fout.write(
-                '  <Fonte '
-                f'id="{esc(f["id"])}" '
-                f'nazione="{esc(f.get("nazione"))}" '
-                f'affidabilita="{esc(f.get("affidabilita"))}">\n'
-            )
-            fout.write(f'    <Nome>{esc(f.get("nome"))}</Nome>\n')
-            fout.write("  </Fonte>\n")
-        write_close(fout, "Fonti")
-
-        #Transazioni (con BancaDerivaRef)
-        write_open(fout, "Transazioni")
-        with open_csv(os.path.join(INPUT_DIR, "transazioni.csv")) as fin:
-            r = csv.DictReader(fin)
-            for row in r:
-                tid = row.get("id_transazione:ID")
-                if not tid:
-                    continue
-                fout.write(
-                    '  <Transazione '
-                    f'id="{esc(tid)}" '
-                    f'importo="{esc(row.get("importo:INT"))}" '
-                    f'data="{esc(row.get("data:DATE"))}">\n'
-                )
-                fout.write(f'    <MittenteRef matricola="{esc(row.get("matricola"))}"/>\n')
-                fout.write(f'    <DestinatarioRef matricola="{esc(row.get("destinatario"))}"/>\n')
-                #banca di derivazione della transazione
-                fout.write(f'    <BancaDerivaRef id="{esc(row.get("id_banca_deriva"))}"/>\n')
-                fout.write("  </Transazione>\n")
-        write_close(fout, "Transazioni")
-
+        for sezione, elementi in SEZIONI:
+            write_open(fout, sezione)
+            fout.writelines(elementi())
+            write_close(fout, sezione)
         write_close(fout, "Nodi")
         
 
         #Footer
         fout.write("</Graph>\n")
 
-    print(f"Creato: {OUTPUT_FILE}")
+    print(f"Creato: {output_file}")
+
+
+#ingest diretto in BaseX: ogni sezione diventa tante risorse da PER_RISORSA elementi, ognuna
+#col percorso completo <Graph><Nodi><Sezione>...: le query su /Graph/Nodi/... leggono tutti i
+#documenti del database, come con un unico graph.xml
+PER_RISORSA = 50_000
+
+def documento(sezione, primo, elementi, n):
+    #testo di una risorsa, in streaming: primo elemento già letto + altri n-1 dal generatore
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<Graph>\n<Nodi>\n<{sezione}>\n'
+    yield primo
+    yield from itertools.islice(elementi, n - 1)
+    yield f"</{sezione}>\n</Nodi>\n</Graph>\n"
+
+def carica_basex(args):
+    import BaseXClient #solo per --basex
+    session = BaseXClient.Session(args.host, args.port, args.user, args.password)
+    try:
+        if args.append:
+            session.execute(f"open {args.basex}")
+        else:
+            session.create(args.basex, "")
+        #bulk di ADD: niente flush su disco dopo ogni risorsa, indici ricostruiti alla fine
+        session.execute("set autoflush false")
+        prefisso = os.path.basename(os.path.abspath(INPUT_DIR))
+        for sezione, generatore in SEZIONI:
+            start = time.perf_counter()
+            elementi = generatore()
+            risorse = 0
+            for primo in elementi:
+                risorse += 1
+                session.add(f"{prefisso}/{sezione}/{risorse:05d}.xml",
+                            documento(sezione, primo, elementi, args.per_risorsa))
+            print(f"{sezione:<12} {risorse:>5} risorse  {time.perf_counter() - start:8.2f} s")
+        start = time.perf_counter()
+        session.execute("flush")
+        session.execute("optimize")
+        print(f"{'optimize':<12} {'':>14}  {time.perf_counter() - start:8.2f} s")
+    finally:
+        session.close()
+    print(f"Caricato nel database {args.basex} ({args.host}:{args.port})")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Converte i CSV del dataset in un unico graph.xml per BaseX.")
+    p.add_argument("--compress", choices=sorted(compressione.ESTENSIONI),
+                   help="Scrive graph.xml compresso in streaming (graph.xml.gz / graph.xml.zst).")
+    p.add_argument("--input", default=INPUT_DIR, help="Cartella dei CSV (es. un subset o un delta_A_B di subset.py).")
+    p.add_argument("--output", default=OUTPUT_FILE,
+                   help="File XML da scrivere. Un delta diventa un secondo documento dello stesso database "
+                        "(ADD delta_25_50.xml): le query su /Graph/... leggono tutti i documenti.")
+    p.add_argument("--basex", metavar="DB",
+                   help="Invece di scrivere graph.xml, carica i CSV direttamente nel database BaseX DB "
+                        "(creato da zero) come risorse da --per-risorsa elementi.")
+    p.add_argument("--append", action="store_true",
+                   help="Con --basex: aggiunge le risorse a un database esistente (es. un delta) invece di ricrearlo.")
+    p.add_argument("--per-risorsa", type=int, default=PER_RISORSA, metavar="N",
+                   help=f"Elementi per risorsa con --basex (default: {PER_RISORSA}).")
+    p.add_argument("--host", default="localhost")
+    p.add_argument("--port", type=int, default=1984)
+    p.add_argument("--user", default="admin")
+    p.add_argument("--password", default="1234")
+    args = p.parse_args()
+    if args.per_risorsa < 1:
+        p.error("--per-risorsa deve essere almeno 1")
+    return args
+
+def main():
+    global INPUT_DIR, OUTPUT_FILE
+    args = parse_args()
+    INPUT_DIR, OUTPUT_FILE = args.input, args.output
+    if args.basex:
+        carica_basex(args)
+        return
+    scrivi_file(compressione.con_estensione(OUTPUT_FILE, args.compress or COMPRESSIONE))
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,19 @@
+import os
 import csv
 import random
-from faker import Faker
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 from collections import defaultdict
 
-fake = Faker('it_IT') #imposta la lingua italiana
-random.seed(42)
+import numpy as np
+
+import colonnare
+import compressione
+from vocabolari import NOMI, COGNOMI, SUFFISSI_AZIENDA, NAZIONI, DOMINI_EMAIL
+
+SEED = 42
 
 #target complessivo 500.000
 NUM_PERSONE = 100_000
@@ -16,194 +24,743 @@ NUM_FONTI   = 100_000
 #pattern sospetti: una quota delle persone riceve più transazioni in 1 giorno > max_deposito
 NUM_PATTERN_SOSPETTI = min(10_000, int(NUM_PERSONE * 0.1))  #10% in proporzione al numero persone
 
-#crea banche e fonti uniche 
-banche_ids = [f"b{i+1}" for i in range(NUM_BANCHE)] #crea stringa che inizia con b e aggiunge numeri
-fonti_ids  = [f"f{i+1}" for i in range(NUM_FONTI)] #idem con f
-
-#genera banche come dizionario 
-banche = {
-    bid: { #chiave esterna (l'ID della banca)
-        "id_banca": bid, #campo interno
-        "nome": fake.company() + " Bank",
-        "nazione": fake.country_code(),
-        "max_deposito": random.randint(1500, 10000)
+#dimensione pool di email/telefoni condivisi (da cui nascono i duplicati)
+POOL_CONTATTI = 2000
+
+#righe scritte per volta con writerows (limita le liste temporanee in memoria)
+BLOCCO_SCRITTURA = 100_000
+
+#righe generate per blocco in modalità veloce (~500 MB di picco con 200k)
+BLOCCO_RIGHE = 200_000
+
+#header dei CSV (stile neo4j-admin), l'ultima colonna è la label/tipo
+HEADER_PERSONE     = ['matricola:ID', 'nome', 'cognome', 'stipendio:INT', 'id_banca', 'id_documento', 'id_fonte', ':LABEL']
+HEADER_DOCUMENTI   = ['id_documento:ID', 'nazione', 'email', 'scadenza', 'matricola', 'num_telefono', ':LABEL']
+HEADER_BANCHE      = ['id_banca:ID', 'nome', 'nazione', 'max_deposito:INT', ':LABEL']
+HEADER_FONTI       = ['id_fonte:ID', 'nome', 'nazione', 'affidabilita:FLOAT', ':LABEL']
+HEADER_TRANSAZIONI = ['id_transazione:ID', 'matricola', 'importo:INT', 'destinatario', 'data:DATE', 'id_banca_deriva', ':LABEL']
+HEADER_DERIVA      = ['id_banca:START_ID', 'id_transazione:END_ID', ':TYPE']
+
+
+#modalità classica con Faker: una chiamata per riga, lenta ma con dati più vari
+def genera_classico():
+    from faker import Faker
+    fake = Faker('it_IT') #imposta la lingua italiana
+    random.seed(SEED)
+
+    #crea banche e fonti uniche
+    banche_ids = [f"b{i+1}" for i in range(NUM_BANCHE)] #crea stringa che inizia con b e aggiunge numeri
+    fonti_ids  = [f"f{i+1}" for i in range(NUM_FONTI)] #idem con f
+
+    #genera banche come dizionario
+    banche = {
+        bid: { #chiave esterna (l'ID della banca)
+            "id_banca": bid, #campo interno
+            "nome": fake.company() + " Bank",
+            "nazione": fake.country_code(),
+            "max_deposito": random.randint(1500, 10000)
+        }
+        for bid in banche_ids
     }
-    for bid in banche_ids
-}
-#genera fonti come dizionario 
-fonti = {
-    fid: {
-        "id_fonte": fid,
-        "nome": fake.company(),
-        "nazione": fake.country_code(),
-        "affidabilita": round(random.uniform(0.5, 1.0), 2)
+    #genera fonti come dizionario
+    fonti = {
+        fid: {
+            "id_fonte": fid,
+            "nome": fake.company(),
+            "nazione": fake.country_code(),
+            "affidabilita": round(random.uniform(0.5, 1.0), 2)
+        }
+        for fid in fonti_ids
     }
-    for fid in fonti_ids
-}
 
-#persone e documenti (1:1)
-persone = []      #[matricola, nome, cognome, stipendio, id_banca, id_documento, id_fonte]
-documenti = []    #[id_documento, nazione, email, scadenza, matricola, num_telefono]
-
-#per generare un pool di email/num telefono che poi avrà duplicati 
-emails_pool   = [fake.email() for _ in range(2000)]
-phones_pool   = [fake.phone_number() for _ in range(2000)]
-
-for i in range(1, NUM_PERSONE + 1):
-    matricola = f"p{i}"
-    id_doc = f"d{i}" 
-    id_banca = random.choice(banche_ids) #sceglie una banca a caso 
-    id_fonte = random.choice(fonti_ids) #sceglie fonte a caso 
-
-    persone.append([
-        matricola,
-        fake.first_name(),
-        fake.last_name(),
-        random.randint(1000, 5000),
-        id_banca,
-        id_doc,
-        id_fonte
-    ])
-
-    email = random.choice(emails_pool) if random.random() < 0.1 else fake.email()
-    phone = random.choice(phones_pool) if random.random() < 0.1 else fake.phone_number()
-    #per ogni persona/documento:
-    #con probabilità 10% prende un valore a caso dalla pool già esistente per fare un duplicato potenziale.
-    #con probabilità 90% genera una nuova email/telefono nuovo con fake.email() o fake.phone_number().
-
-    documenti.append([ #genera documenti 
-        id_doc,
-        fake.country_code(),
-        email,
-        (date.today() + timedelta(days=random.randint(365, 5*365))).isoformat(), #scadenza
-        matricola,
-        phone
-    ])
-
-#salva chi è legato a chi per agevolare le generazione di transazioni e evitare incomgruenze 
-#es. la banca del mittente non viene mai scelta a caso, ma letta da person_to_bank
-person_to_bank = {p[0]: p[4] for p in persone}                          # mittente -> id_banca
-banca_limits   = {bid: b["max_deposito"] for bid, b in banche.items()}  # id_banca -> massimale
-doc_by_matricola = {d[4]: d for d in documenti}                         # matricola -> documento
-
-#transazioni
-#transazioni: [id_trans, mittente_matricola, importo, destinatario_matricola, data_str, id_banca_deriva]
-transazioni = []
-
-def add_tx(mid, dest, imp, day):
-    id_banca_deriva = person_to_bank[mid] #recupera dal dizionario person_to_bank la banca associata al mittente
-    transazioni.append(
-        [f"t{len(transazioni)+1}", mid, imp, dest, day, id_banca_deriva])
-
-oggi = date.today()
-
-#pattern sospetti su destinatari (somma giornaliera > max_deposito della banca del destinatario)
-NUM_PATTERN_SOSPETTI = min(NUM_PATTERN_SOSPETTI, NUM_PERSONE) #assicura che non chieda mai più sospetti del numero totale di persone
-persone_dest_sospette = random.sample(persone, NUM_PATTERN_SOSPETTI) #random.sample(lista, k) estrae k elementi unici a caso da lista.
-#prende NUM_PATTERN_SOSPETTI persone diverse dalla lista persone.
-#il risultato è una lista di persone che saranno usate come destinatari sospetti (cioè riceveranno troppe transazioni rispetto al limite della loro banca).
-
-#mappa email/telefono -> liste di persone (per rendere mittenti plausibili)
-email_to_people = defaultdict(list)#con un defaultdict(list), se accedo a una chiave che non esiste Python crea automaticamente una nuova lista vuota [] per quella chiave.
-phone_to_people = defaultdict(list)#grazie al defaultdict(list), non deve controllare se la chiave esiste: può sempre fare .append(...) in sicurezza.
-for id_doc, _, email, _, matricola, phone in documenti:
-    email_to_people[email].append(matricola) #aggiunge la matricola alla lista di persone che usano quella email.
-    phone_to_people[phone].append(matricola) #idem. essendo defaultdict alla prima occorrenza di una chiave viene creata automaticamente una lista vuota, quindi .append(...) non genera errori
-
-for destinatario in persone_dest_sospette:
-    if len(transazioni) >= NUM_TRANS: #Se ha raggiunto o superato il target, break esce dal ciclo corrente e smette di aggiungere altre transazioni
-        break
-    dest_matr = destinatario[0]
-    dest_banca = destinatario[4]
-    max_dep_dest = banca_limits[dest_banca] #prende la matricola del destinatario, la sua banca, con quella banca cerca nel dizionario banca_limits il max_deposito da usare come soglia
-
-    day = (oggi - timedelta(days=random.randint(1, 60))).isoformat()
-
-    doc_dest = doc_by_matricola[dest_matr] #Recupera il documento della persona destinataria, usando la sua matricola come chiave nel dizionario di lookup.
-    email = doc_dest[2]
-    phone = doc_dest[5]
-
-    mittenti_pot = set(email_to_people[email]) | set(phone_to_people[phone]) #Prende tutte le matricole che condividono la stessa email oppure lo stesso telefono del destinatario e fa l’unione (|). L’uso dei set elimina eventuali duplicati in automatico.
-    mittenti_pot.discard(dest_matr) #Rimuove il destinatario dall’insieme (niente auto-transazioni)
-    if not mittenti_pot: #non dà errore se l’elemento non c’è (a differenza di remove)
-        continue
-
-    n_mitt = min(random.randint(2, 4), len(mittenti_pot)) #estrae un numero intero a caso tra 2 e 4. non supera mai il numero di candidati disponibili.
-    mittenti = random.sample(list(mittenti_pot), n_mitt) #sceglie n_mitt elementi distinti dall’insieme dei candidati
-
-    base = max(300, max_dep_dest // n_mitt + random.randint(200, 700))#basa le trasazioni sul massimale della banca del destinatario
-    for m in mittenti:
+    #persone e documenti (1:1)
+    persone = []      #[matricola, nome, cognome, stipendio, id_banca, id_documento, id_fonte]
+    documenti = []    #[id_documento, nazione, email, scadenza, matricola, num_telefono]
+
+    #per generare un pool di email/num telefono che poi avrà duplicati
+    emails_pool   = [fake.email() for _ in range(POOL_CONTATTI)]
+    phones_pool   = [fake.phone_number() for _ in range(POOL_CONTATTI)]
+
+    for i in range(1, NUM_PERSONE + 1):
+        matricola = f"p{i}"
+        id_doc = f"d{i}"
+        id_banca = random.choice(banche_ids) #sceglie una banca a caso
+        id_fonte = random.choice(fonti_ids) #sceglie fonte a caso
+
+        persone.append([
+            matricola,
+            fake.first_name(),
+            fake.last_name(),
+            random.randint(1000, 5000),
+            id_banca,
+            id_doc,
+            id_fonte
+        ])
+
+        email = random.choice(emails_pool) if random.random() < 0.1 else fake.email()
+        phone = random.choice(phones_pool) if random.random() < 0.1 else fake.phone_number()
+        #per ogni persona/documento:
+        #con probabilità 10% prende un valore a caso dalla pool già esistente per fare un duplicato potenziale.
+        #con probabilità 90% genera una nuova email/telefono nuovo con fake.email() o fake.phone_number().
+
+        documenti.append([ #genera documenti
+            id_doc,
+            fake.country_code(),
+            email,
+            (date.today() + timedelta(days=random.randint(365, 5*365))).isoformat(), #scadenza
+            matricola,
+            phone
+        ])
+
+    #salva chi è legato a chi per agevolare le generazione di transazioni e evitare incomgruenze
+    #es. la banca del mittente non viene mai scelta a caso, ma letta da person_to_bank
+    person_to_bank = {p[0]: p[4] for p in persone}                          # mittente -> id_banca
+    banca_limits   = {bid: b["max_deposito"] for bid, b in banche.items()}  # id_banca -> massimale
+    doc_by_matricola = {d[4]: d for d in documenti}                         # matricola -> documento
+
+    #transazioni
+    #transazioni: [id_trans, mittente_matricola, importo, destinatario_matricola, data_str, id_banca_deriva]
+    transazioni = []
+
+    def add_tx(mid, dest, imp, day):
+        id_banca_deriva = person_to_bank[mid] #recupera dal dizionario person_to_bank la banca associata al mittente
+        transazioni.append(
+            [f"t{len(transazioni)+1}", mid, imp, dest, day, id_banca_deriva])
+
+    oggi = date.today()
+
+    #pattern sospetti su destinatari (somma giornaliera > max_deposito della banca del destinatario)
+    num_sospetti = min(NUM_PATTERN_SOSPETTI, NUM_PERSONE) #assicura che non chieda mai più sospetti del numero totale di persone
+    persone_dest_sospette = random.sample(persone, num_sospetti) #random.sample(lista, k) estrae k elementi unici a caso da lista.
+    #prende num_sospetti persone diverse dalla lista persone.
+    #il risultato è una lista di persone che saranno usate come destinatari sospetti (cioè riceveranno troppe transazioni rispetto al limite della loro banca).
+
+    #mappa email/telefono -> liste di persone (per rendere mittenti plausibili)
+    email_to_people = defaultdict(list)#con un defaultdict(list), se accedo a una chiave che non esiste Python crea automaticamente una nuova lista vuota [] per quella chiave.
+    phone_to_people = defaultdict(list)#grazie al defaultdict(list), non deve controllare se la chiave esiste: può sempre fare .append(...) in sicurezza.
+    for id_doc, _, email, _, matricola, phone in documenti:
+        email_to_people[email].append(matricola) #aggiunge la matricola alla lista di persone che usano quella email.
+        phone_to_people[phone].append(matricola) #idem. essendo defaultdict alla prima occorrenza di una chiave viene creata automaticamente una lista vuota, quindi .append(...) non genera errori
+
+    for destinatario in persone_dest_sospette:
+        if len(transazioni) >= NUM_TRANS: #Se ha raggiunto o superato il target, break esce dal ciclo corrente e smette di aggiungere altre transazioni
+            break
+        dest_matr = destinatario[0]
+        dest_banca = destinatario[4]
+        max_dep_dest = banca_limits[dest_banca] #prende la matricola del destinatario, la sua banca, con quella banca cerca nel dizionario banca_limits il max_deposito da usare come soglia
+
+        day = (oggi - timedelta(days=random.randint(1, 60))).isoformat()
+
+        doc_dest = doc_by_matricola[dest_matr] #Recupera il documento della persona destinataria, usando la sua matricola come chiave nel dizionario di lookup.
+        email = doc_dest[2]
+        phone = doc_dest[5]
+
+        mittenti_pot = set(email_to_people[email]) | set(phone_to_people[phone]) #Prende tutte le matricole che condividono la stessa email oppure lo stesso telefono del destinatario e fa l’unione (|). L’uso dei set elimina eventuali duplicati in automatico.
+        mittenti_pot.discard(dest_matr) #Rimuove il destinatario dall’insieme (niente auto-transazioni)
+        if not mittenti_pot: #non dà errore se l’elemento non c’è (a differenza di remove)
+            continue
+
+        n_mitt = min(random.randint(2, 4), len(mittenti_pot)) #estrae un numero intero a caso tra 2 e 4. non supera mai il numero di candidati disponibili.
+        mittenti = random.sample(list(mittenti_pot), n_mitt) #sceglie n_mitt elementi distinti dall’insieme dei candidati
+
+        base = max(300, max_dep_dest // n_mitt + random.randint(200, 700))#basa le trasazioni sul massimale della banca del destinatario
+        for m in mittenti:
+            if len(transazioni) >= NUM_TRANS:
+                break
+            add_tx(m, dest_matr, base, day)
+
+    #transazioni normali distribuite. almeno una per persona
+    for p in persone:
         if len(transazioni) >= NUM_TRANS:
             break
-        add_tx(m, dest_matr, base, day)
-
-#transazioni normali distribuite. almeno una per persona
-for p in persone:
-    if len(transazioni) >= NUM_TRANS:
-        break
-    mittente = p[0]
-    dest = f"p{random.randint(1, NUM_PERSONE)}"
-    id_banca_mitt = p[4]
-    max_dep_mitt = banca_limits[id_banca_mitt]
-    imp = random.randint(10, min(3000, max_dep_mitt // 2))
-    day = (oggi - timedelta(days=random.randint(1, 730))).isoformat()
-    add_tx(mittente, dest, imp, day)
-
-#riempie se mancano transazioni
-while len(transazioni) < NUM_TRANS:
-    mitt = f"p{random.randint(1, NUM_PERSONE)}"
-    dest = f"p{random.randint(1, NUM_PERSONE)}"
-    id_b = person_to_bank[mitt]
-    imp = random.randint(10, min(3000, banca_limits[id_b] // 2))
-    day = (oggi - timedelta(days=random.randint(1, 730))).isoformat()
-    add_tx(mitt, dest, imp, day)
+        mittente = p[0]
+        dest = f"p{random.randint(1, NUM_PERSONE)}"
+        id_banca_mitt = p[4]
+        max_dep_mitt = banca_limits[id_banca_mitt]
+        imp = random.randint(10, min(3000, max_dep_mitt // 2))
+        day = (oggi - timedelta(days=random.randint(1, 730))).isoformat()
+        add_tx(mittente, dest, imp, day)
+
+    #riempie se mancano transazioni
+    while len(transazioni) < NUM_TRANS:
+        mitt = f"p{random.randint(1, NUM_PERSONE)}"
+        dest = f"p{random.randint(1, NUM_PERSONE)}"
+        id_b = person_to_bank[mitt]
+        imp = random.randint(10, min(3000, banca_limits[id_b] // 2))
+        day = (oggi - timedelta(days=random.randint(1, 730))).isoformat()
+        add_tx(mitt, dest, imp, day)
+
+    #da righe a colonne, nello stesso formato prodotto dalla modalità veloce
+    return {
+        "persone": list(zip(*persone)),
+        "documenti": list(zip(*documenti)),
+        "banche": [[b[k] for b in banche.values()] for k in ("id_banca", "nome", "nazione", "max_deposito")],
+        "fonti": [[ft[k] for ft in fonti.values()] for k in ("id_fonte", "nome", "nazione", "affidabilita")],
+        "transazioni": list(zip(*transazioni)),
+    }
+
+
+#modalità veloce: niente Faker, ogni colonna è un array numpy campionato dai vocabolari.
+#lavora a blocchi di righe scritti subito su disco: in memoria restano solo i massimali
+#delle banche, un campione limitato di persone per ogni contatto del pool e i destinatari sospetti.
+#Le colonne ID sono numeri (la persona p7 è 7): il prefisso lo aggiunge chi scrive il CSV
+def date_da_oggi(oggi, giorni):
+    return np.datetime_as_string(oggi + giorni, unit="D") #ISO YYYY-MM-DD come date.isoformat()
+
+def nomi_aziende(rng, n):
+    return np.char.add(COGNOMI[rng.integers(len(COGNOMI), size=n)],
+                       SUFFISSI_AZIENDA[rng.integers(len(SUFFISSI_AZIENDA), size=n)])
+
+def email_da_nomi(nomi, cognomi, domini, suffisso=None):
+    locale = np.char.add(np.char.add(np.char.lower(nomi), "."),
+                         np.char.lower(np.char.replace(cognomi, " ", "")))
+    if suffisso is not None:
+        locale = np.char.add(locale, suffisso.astype(str)) #il suffisso (indice persona) rende l'email unica
+    return np.char.add(np.char.add(locale, "@"), domini)
+
+def telefoni(rng, n):
+    return np.char.add("+39 3", np.char.zfill(rng.integers(0, 10**9, size=n).astype(str), 9))
+
+#ogni blocco ha il suo generatore, derivato da (seed, tabella, numero blocco)
+RNG_POOL, RNG_BANCHE, RNG_FONTI, RNG_PERSONE, RNG_SOSPETTI, RNG_TRANSAZIONI = range(6)
+
+def rng_blocco(tabella, blocco=0):
+    return np.random.default_rng([SEED, tabella, blocco])
+
+def mescola(x, sale):
+    #hash splitmix64 vettoriale: stessa persona -> stesso valore, senza tenere tabelle in memoria
+    z = np.asarray(x, dtype=np.uint64) + np.uint64(sale)
+    z = z * np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def banca_di(indici):
+    #banca della persona (indice 0-based) ricalcolata al volo: sostituisce person_to_bank
+    return (mescola(indici, SEED) % np.uint64(NUM_BANCHE)).astype(np.int64)
+
+def blocchi(n, dim):
+    return [(i, min(i + dim, n)) for i in range(0, n, dim)]
+
+def genera_pool():
+    rng = rng_blocco(RNG_POOL)
+    pool_email = email_da_nomi(NOMI[rng.integers(len(NOMI), size=POOL_CONTATTI)],
+                               COGNOMI[rng.integers(len(COGNOMI), size=POOL_CONTATTI)],
+                               DOMINI_EMAIL[rng.integers(len(DOMINI_EMAIL), size=POOL_CONTATTI)])
+    return pool_email, telefoni(rng, POOL_CONTATTI)
+
+def blocco_banche(blocco, inizio, fine):
+    rng = rng_blocco(RNG_BANCHE, blocco)
+    n = fine - inizio
+    return [
+        np.arange(inizio + 1, fine + 1),
+        np.char.add(nomi_aziende(rng, n), " Bank"),
+        NAZIONI[rng.integers(len(NAZIONI), size=n)],
+        rng.integers(1500, 10001, size=n), #max_deposito
+    ]
+
+def blocco_fonti(blocco, inizio, fine):
+    rng = rng_blocco(RNG_FONTI, blocco)
+    n = fine - inizio
+    return [
+        np.arange(inizio + 1, fine + 1),
+        nomi_aziende(rng, n),
+        NAZIONI[rng.integers(len(NAZIONI), size=n)],
+        np.round(rng.uniform(0.5, 1.0, size=n), 2),
+    ]
+
+def blocco_persone(blocco, inizio, fine, pool_email, pool_tel):
+    #persone e documenti (1:1), indici 0-based: la persona i ha matricola p{i+1}
+    rng = rng_blocco(RNG_PERSONE, blocco)
+    n = fine - inizio
+    numeri = np.arange(inizio + 1, fine + 1)
+    nomi = NOMI[rng.integers(len(NOMI), size=n)]
+    cognomi = COGNOMI[rng.integers(len(COGNOMI), size=n)]
+    persone = [
+        numeri, nomi, cognomi,
+        rng.integers(1000, 5001, size=n),
+        banca_di(numeri - 1) + 1,
+        numeri, #id_documento: d{i+1}
+        rng.integers(1, NUM_FONTI + 1, size=n),
+    ]
+
+    #pool di contatti condivisi: con probabilità 10% la persona pesca dal pool, altrimenti contatto unico
+    chiave_email = np.where(rng.random(n) < 0.1, rng.integers(POOL_CONTATTI, size=n), -1)
+    chiave_tel   = np.where(rng.random(n) < 0.1, rng.integers(POOL_CONTATTI, size=n), -1)
+    email = np.where(chiave_email >= 0, pool_email[np.maximum(chiave_email, 0)],
+                     email_da_nomi(nomi, cognomi, DOMINI_EMAIL[rng.integers(len(DOMINI_EMAIL), size=n)], numeri))
+    tel = np.where(chiave_tel >= 0, pool_tel[np.maximum(chiave_tel, 0)], telefoni(rng, n))
+    documenti = [
+        numeri,
+        NAZIONI[rng.integers(len(NAZIONI), size=n)],
+        email,
+        date_da_oggi(np.datetime64(date.today(), "D"), rng.integers(365, 5*365 + 1, size=n)), #scadenza
+        numeri,
+        tel,
+    ]
+    return persone, documenti, chiave_email, chiave_tel
+
+#persone per contatto del pool: ne teniamo al massimo CANDIDATI_PER_CONTATTO, scelte con
+#una priorità pseudo-casuale (le più basse vincono), così la memoria non cresce con NUM_PERSONE
+CANDIDATI_PER_CONTATTO = 16
+
+def candidati_vuoti():
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+def aggiorna_candidati(candidati, chiavi, indici):
+    sel = chiavi >= 0
+    k = np.concatenate([candidati[0], chiavi[sel]])
+    idx = np.concatenate([candidati[1], indici[sel]])
+    ordine = np.lexsort((mescola(idx, SEED + 1), k)) #per chiave, poi per priorità
+    k, idx = k[ordine], idx[ordine]
+    rango = np.arange(len(k)) - np.searchsorted(k, k, side="left") #posizione dentro il gruppo
+    tieni = rango < CANDIDATI_PER_CONTATTO
+    return k[tieni], idx[tieni]
+
+def membri(candidati, chiave):
+    k, idx = candidati
+    return idx[np.searchsorted(k, chiave, side="left"):np.searchsorted(k, chiave, side="right")]
+
+def scegli_sospetti():
+    #destinatari sospetti scelti subito, così mentre si generano le persone si annotano i loro contatti
+    num_sospetti = min(NUM_PATTERN_SOSPETTI, NUM_PERSONE)
+    return rng_blocco(RNG_SOSPETTI).choice(NUM_PERSONE, size=num_sospetti, replace=False)
+
+def annota_sospetti(dest_ordinati, contatti_dest, inizio, chiave_email, chiave_tel):
+    #copia email/telefono dei destinatari sospetti che cadono nel blocco [inizio, inizio+len)
+    lo = np.searchsorted(dest_ordinati, inizio)
+    hi = np.searchsorted(dest_ordinati, inizio + len(chiave_email))
+    locali = dest_ordinati[lo:hi] - inizio
+    contatti_dest[0][lo:hi] = chiave_email[locali]
+    contatti_dest[1][lo:hi] = chiave_tel[locali]
+
+def transazioni_sospette(dest_sospetti, dest_ordinati, contatti_dest, cand_email, cand_tel, max_deposito):
+    #pattern sospetti: solo chi condivide email/telefono del destinatario può essere mittente
+    rng = rng_blocco(RNG_SOSPETTI, 1)
+    s_mitt, s_dest, s_imp, s_giorni = [], [], [], []
+    for dest in dest_sospetti:
+        if len(s_mitt) >= NUM_TRANS:
+            break
+        pos = np.searchsorted(dest_ordinati, dest)
+        ke, kt = contatti_dest[0][pos], contatti_dest[1][pos]
+        candidati = []
+        if ke >= 0:
+            candidati.append(membri(cand_email, ke))
+        if kt >= 0:
+            candidati.append(membri(cand_tel, kt))
+        if not candidati:
+            continue #contatti unici: nessun mittente plausibile
+        mittenti_pot = np.setdiff1d(np.concatenate(candidati), [dest]) #unione senza duplicati e senza auto-transazioni
+        if len(mittenti_pot) == 0:
+            continue
+        n_mitt = min(int(rng.integers(2, 5)), len(mittenti_pot))
+        mittenti = rng.choice(mittenti_pot, size=n_mitt, replace=False)[:NUM_TRANS - len(s_mitt)]
+        base = max(300, int(max_deposito[banca_di([dest])[0]]) // n_mitt + int(rng.integers(200, 701)))
+        giorni = int(rng.integers(1, 61))
+        s_mitt.extend(mittenti.tolist())
+        s_dest.extend([int(dest)] * len(mittenti))
+        s_imp.extend([base] * len(mittenti))
+        s_giorni.extend([giorni] * len(mittenti))
+    return [np.array(c, dtype=np.int64) for c in (s_mitt, s_dest, s_imp, s_giorni)]
+
+def blocco_transazioni(blocco, inizio, fine, n_norm, max_deposito):
+    #transazioni normali: la posizione j < n_norm ha come mittente la persona j (almeno una per persona),
+    #le successive riempiono con mittenti casuali
+    rng = rng_blocco(RNG_TRANSAZIONI, blocco)
+    n = fine - inizio
+    pos = np.arange(inizio, fine)
+    mitt = np.where(pos < n_norm, pos, rng.integers(NUM_PERSONE, size=n))
+    dest = rng.integers(NUM_PERSONE, size=n)
+    limite = np.minimum(3000, max_deposito[banca_di(mitt)] // 2)
+    imp = rng.integers(10, limite + 1)
+    giorni = rng.integers(1, 731, size=n)
+    return mitt, dest, imp, giorni
+
+def colonne_transazioni(primo_id, mitt, dest, imp, giorni):
+    oggi = np.datetime64(date.today(), "D")
+    return [
+        np.arange(primo_id, primo_id + len(mitt)),
+        mitt + 1,
+        imp,
+        dest + 1,
+        date_da_oggi(oggi, -giorni),
+        banca_di(mitt) + 1, #banca di derivazione = banca del mittente
+    ]
+
+def numera(lista_blocchi):
+    return [(b, inizio, fine) for b, (inizio, fine) in enumerate(lista_blocchi)]
+
+def fase_anagrafica(tabelle, blocchi_banche, blocchi_fonti, blocchi_persone, dest_ordinati):
+    #banche, fonti, persone e documenti dei blocchi indicati (tutti, o quelli di uno shard).
+    #dei blocchi banche resta in memoria solo max_deposito, delle persone solo gli indici compatti
+    pezzi_deposito = []
+    for b, inizio, fine in blocchi_banche:
+        colonne = blocco_banche(b, inizio, fine)
+        pezzi_deposito.append((inizio, colonne[3]))
+        scrivi(tabelle, "banche", colonne)
+    for b, inizio, fine in blocchi_fonti:
+        scrivi(tabelle, "fonti", blocco_fonti(b, inizio, fine))
+
+    pool_email, pool_tel = genera_pool()
+    contatti_dest = (np.full(len(dest_ordinati), -1), np.full(len(dest_ordinati), -1))
+    cand_email, cand_tel = candidati_vuoti(), candidati_vuoti()
+    for b, inizio, fine in blocchi_persone:
+        persone, documenti, chiave_email, chiave_tel = blocco_persone(b, inizio, fine, pool_email, pool_tel)
+        scrivi(tabelle, "persone", persone)
+        scrivi(tabelle, "documenti", documenti)
+        indici = np.arange(inizio, fine)
+        cand_email = aggiorna_candidati(cand_email, chiave_email, indici)
+        cand_tel = aggiorna_candidati(cand_tel, chiave_tel, indici)
+        annota_sospetti(dest_ordinati, contatti_dest, inizio, chiave_email, chiave_tel)
+    return pezzi_deposito, cand_email, cand_tel, contatti_dest
+
+def fase_transazioni(tabelle, blocchi_tx, primo_id, n_norm, max_deposito):
+    #transazioni normali dei blocchi indicati; primo_id = numero della prima transazione non sospetta
+    for b, inizio, fine in blocchi_tx:
+        mitt, dest, imp, giorni = blocco_transazioni(b, inizio, fine, n_norm, max_deposito)
+        scrivi(tabelle, "transazioni", colonne_transazioni(primo_id + inizio, mitt, dest, imp, giorni))
+
+def unisci_deposito(pezzi_deposito):
+    max_deposito = np.empty(NUM_BANCHE, dtype=np.int64)
+    for inizio, valori in pezzi_deposito:
+        max_deposito[inizio:inizio + len(valori)] = valori
+    return max_deposito
+
+def scrivi_sospette(tabelle, dest_sospetti, dest_ordinati, contatti_dest, cand_email, cand_tel, max_deposito):
+    #le sospette occupano t1..tS, restituisce S
+    s_mitt, s_dest, s_imp, s_giorni = transazioni_sospette(
+        dest_sospetti, dest_ordinati, contatti_dest, cand_email, cand_tel, max_deposito)
+    scrivi(tabelle, "transazioni", colonne_transazioni(1, s_mitt, s_dest, s_imp, s_giorni))
+    return len(s_mitt)
+
+def genera_veloce(tabelle, dim_blocco):
+    dest_sospetti = scegli_sospetti()
+    dest_ordinati = np.sort(dest_sospetti)
+    pezzi_deposito, cand_email, cand_tel, contatti_dest = fase_anagrafica(
+        tabelle, numera(blocchi(NUM_BANCHE, dim_blocco)), numera(blocchi(NUM_FONTI, dim_blocco)),
+        numera(blocchi(NUM_PERSONE, dim_blocco)), dest_ordinati)
+    max_deposito = unisci_deposito(pezzi_deposito)
+
+    #transazioni: prima quelle sospette, poi le normali a blocchi
+    n_sospette = scrivi_sospette(tabelle, dest_sospetti, dest_ordinati, contatti_dest, cand_email, cand_tel, max_deposito)
+    n_casuali = NUM_TRANS - n_sospette
+    fase_transazioni(tabelle, numera(blocchi(n_casuali, dim_blocco)), n_sospette + 1,
+                     min(NUM_PERSONE, n_casuali), max_deposito)
+
+
+#modalità parallela: lo spazio degli ID viene diviso in shard contigui di blocchi, uno per processo.
+#ogni blocco ha il suo seed derivato da (seed, tabella, blocco), quindi l'output non dipende da
+#quale processo genera il blocco: stessi file della modalità seriale, a parità di seed e --blocco.
+#Fase 1: banche/fonti/persone/documenti in parallelo, poi merge dei piccoli indici (massimali, candidati per contatto).
+#Fase 2: transazioni sospette nel processo principale, transazioni normali in parallelo.
+def config_corrente():
+    return {"seed": SEED, "persone": NUM_PERSONE, "transazioni": NUM_TRANS,
+            "banche": NUM_BANCHE, "fonti": NUM_FONTI, "bulk": BULK_DIR, "compressione": COMPRESSIONE,
+            "parquet": PARQUET, "id_interi": ID_INTERI}
+
+def applica_config(config):
+    #nei worker (spawn su Windows) i globali vanno reimpostati
+    global SEED, BULK_DIR, COMPRESSIONE, PARQUET, ID_INTERI
+    SEED = config["seed"]
+    BULK_DIR = config["bulk"]
+    COMPRESSIONE = config["compressione"]
+    PARQUET = config["parquet"]
+    ID_INTERI = config.get("id_interi", False)
+    imposta_scala(config["persone"], config["transazioni"], config["banche"], config["fonti"])
+
+def dividi(lista_blocchi, n_shard):
+    passo, resto = divmod(len(lista_blocchi), n_shard)
+    parti, inizio = [], 0
+    for k in range(n_shard):
+        fine = inizio + passo + (1 if k < resto else 0)
+        parti.append(lista_blocchi[inizio:fine])
+        inizio = fine
+    return parti
+
+def worker_anagrafica(config, shard, blocchi_banche, blocchi_fonti, blocchi_persone, dest_ordinati):
+    applica_config(config)
+    tabelle = apri_tabelle(con_derivate(TABELLE_ANAGRAFICA), suffisso=f".part{shard}", intestazione=False)
+    try:
+        risultato = fase_anagrafica(tabelle, blocchi_banche, blocchi_fonti, blocchi_persone, dest_ordinati)
+    finally:
+        chiudi_tabelle(tabelle)
+    return risultato, {nome: t.righe for nome, t in tabelle.items()}
+
+def worker_transazioni(config, shard, blocchi_tx, primo_id, n_norm, max_deposito):
+    applica_config(config)
+    tabelle = apri_tabelle(con_derivate(TABELLE_TRANSAZIONI), suffisso=f".part{shard}", intestazione=False)
+    try:
+        fase_transazioni(tabelle, blocchi_tx, primo_id, n_norm, max_deposito)
+    finally:
+        chiudi_tabelle(tabelle)
+    return {nome: t.righe for nome, t in tabelle.items()}
+
+def accoda_parti(tabelle, n_shard, righe_per_shard):
+    #unisce i file .partK in coda ai CSV finali, nell'ordine degli shard, poi li cancella
+    for nome, t in tabelle.items():
+        for k in range(n_shard):
+            parte = t.percorso(f".part{k}")
+            if not os.path.exists(parte):
+                continue
+            t.accoda_grezzo(parte)
+            os.remove(parte)
+            t.righe += righe_per_shard[k].get(nome, 0)
+
+def genera_parallelo(tabelle, dim_blocco, n_shard):
+    config = config_corrente()
+    dest_sospetti = scegli_sospetti()
+    dest_ordinati = np.sort(dest_sospetti)
+    parti_banche  = dividi(numera(blocchi(NUM_BANCHE, dim_blocco)), n_shard)
+    parti_fonti   = dividi(numera(blocchi(NUM_FONTI, dim_blocco)), n_shard)
+    parti_persone = dividi(numera(blocchi(NUM_PERSONE, dim_blocco)), n_shard)
+
+    with ProcessPoolExecutor(max_workers=n_shard) as pool:
+        futuri = [pool.submit(worker_anagrafica, config, k, parti_banche[k], parti_fonti[k],
+                              parti_persone[k], dest_ordinati) for k in range(n_shard)]
+        risultati = [f.result() for f in futuri]
+
+        #merge degli indici compatti: stesso risultato della modalità seriale
+        pezzi_deposito = []
+        cand_email, cand_tel = candidati_vuoti(), candidati_vuoti()
+        contatti_dest = (np.full(len(dest_ordinati), -1), np.full(len(dest_ordinati), -1))
+        for (pezzi, c_email, c_tel, contatti), _ in risultati:
+            pezzi_deposito.extend(pezzi)
+            cand_email = aggiorna_candidati(cand_email, *c_email)
+            cand_tel = aggiorna_candidati(cand_tel, *c_tel)
+            contatti_dest = (np.maximum(contatti_dest[0], contatti[0]), np.maximum(contatti_dest[1], contatti[1]))
+        max_deposito = unisci_deposito(pezzi_deposito)
+        accoda_parti({n: tabelle[n] for n in con_derivate(TABELLE_ANAGRAFICA)},
+                     n_shard, [righe for _, righe in risultati])
+
+        n_sospette = scrivi_sospette(tabelle, dest_sospetti, dest_ordinati, contatti_dest, cand_email, cand_tel, max_deposito)
+        n_casuali = NUM_TRANS - n_sospette
+        parti_tx = dividi(numera(blocchi(n_casuali, dim_blocco)), n_shard)
+        futuri = [pool.submit(worker_transazioni, config, k, parti_tx[k], n_sospette + 1,
+                              min(NUM_PERSONE, n_casuali), max_deposito) for k in range(n_shard)]
+        righe_tx = [f.result() for f in futuri]
+    accoda_parti({n: tabelle[n] for n in con_derivate(TABELLE_TRANSAZIONI)}, n_shard, righe_tx)
+
 
 #scrittura CSV (UTF-8)
-with open("persone.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['matricola:ID', 'nome', 'cognome', 'stipendio:INT', 'id_banca', 'id_documento', 'id_fonte', ':LABEL'])
-    for r in persone:
-        w.writerow(r + ['Persona'])
-
-with open("documenti.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['id_documento:ID', 'nazione', 'email', 'scadenza', 'matricola', 'num_telefono', ':LABEL'])
-    for r in documenti:
-        w.writerow(r + ['Documento'])
-
-with open("banche.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['id_banca:ID', 'nome', 'nazione', 'max_deposito:INT', ':LABEL'])
-    for b in banche.values():
-        w.writerow([b["id_banca"], b["nome"], b["nazione"], b["max_deposito"], 'Banca'])
-
-with open("fonti.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['id_fonte:ID', 'nome', 'nazione', 'affidabilita:FLOAT', ':LABEL'])
-    for ft in fonti.values():
-        w.writerow([ft["id_fonte"], ft["nome"], ft["nazione"], ft["affidabilita"], 'Fonte'])
-
-
-with open("transazioni.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['id_transazione:ID', 'matricola', 'importo:INT', 'destinatario', 'data:DATE', 'id_banca_deriva', ':LABEL'])
-    for r in transazioni:
-        w.writerow(r + ['Transazione'])
-
-#CSV relazioni DERIVA per import relazionale
-#colonne in stile neo4j-admin
-with open("deriva.csv", "w", newline='', encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(['id_banca:START_ID', 'id_transazione:END_ID', ':TYPE'])
-    for tid, mid, imp, dest, day, bid in transazioni:
-        w.writerow([bid, tid, 'DERIVA'])
-#Per ogni transazione (tid, …, bid), scrive una riga: bid -> tid con tipo DERIVA.
-#Esempio: b7,t123,DERIVA = relazione (:Banca {id:'b7'})-[:DERIVA]->(:Transazione {id:'t123'}).
-print("CSV generati.")
-print("Conteggi righe:",
-      "persone", len(persone),
-      "documenti", len(documenti),
-      "banche", len(banche),
-      "fonti", len(fonti),
-      "transazioni", len(transazioni),
-      "totale", len(persone) + len(documenti) + len(banche) + len(fonti) + len(transazioni))
+class TabellaCsv:
+    #CSV aperto una volta sola e riempito a blocchi di colonne
+    #con compressione gz/zst il file viene compresso in streaming mentre si scrive
+    def __init__(self, path, header, etichetta, suffisso="", intestazione=True, compr=None):
+        self.base = path #percorso finale senza estensione di compressione
+        self.compr = compr #None | "gz" | "zst"
+        self.path = self.percorso(suffisso) #le parti degli shard hanno in più il suffisso .partK
+        self.etichetta = etichetta
+        self.prefissi = [colonnare.prefisso(c) for c in header[:-1]] #confine di esportazione degli ID interi
+        self.righe = 0
+        self.apri("wt")
+        if intestazione:
+            self.w.writerow(header)
+
+    def percorso(self, suffisso=""):
+        return compressione.con_estensione(self.base + suffisso, self.compr)
+
+    def apri(self, modo):
+        self.f = compressione.apri(self.path, modo)
+        self.w = csv.writer(self.f)
+
+    def accoda_grezzo(self, parte):
+        #accoda i byte di un altro file con la stessa compressione: membri gzip e frame zstd
+        #concatenati restano un file valido, quindi le parti non vanno ricompresse
+        self.f.close()
+        with open(self.path, "ab") as fout, open(parte, "rb") as fin:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+        self.apri("at")
+
+    def scrivi(self, colonne):
+        #colonne: sequenze parallele (liste, tuple o array numpy) nell'ordine dell'header
+        n = len(colonne[0]) if colonne else 0
+        for start in range(0, n, BLOCCO_SCRITTURA):
+            parti = [c[start:start + BLOCCO_SCRITTURA] for c in colonne]
+            parti = [self.testo(p, pre) for p, pre in zip(parti, self.prefissi)]
+            self.w.writerows(zip(*parti, [self.etichetta] * len(parti[0])))
+        self.righe += n
+
+    @staticmethod
+    def testo(parte, pre):
+        if not isinstance(parte, np.ndarray):
+            return parte
+        if pre and parte.dtype.kind in "iu":
+            return colonnare.interi_a_testo(pre, parte) #7 -> "p7"
+        return parte.tolist() #tipi python: scrittura più rapida
+
+    def close(self):
+        self.f.close()
+
+TABELLE = {
+    "persone":     ("persone.csv", HEADER_PERSONE, 'Persona'),
+    "documenti":   ("documenti.csv", HEADER_DOCUMENTI, 'Documento'),
+    "banche":      ("banche.csv", HEADER_BANCHE, 'Banca'),
+    "fonti":       ("fonti.csv", HEADER_FONTI, 'Fonte'),
+    "transazioni": ("transazioni.csv", HEADER_TRANSAZIONI, 'Transazione'),
+    #CSV relazioni DERIVA per import relazionale
+    #colonne in stile neo4j-admin
+    "deriva":      ("deriva.csv", HEADER_DERIVA, 'DERIVA'),
+}
+
+#file per neo4j-admin database import (--bulk-import DIR): un file nodi per label con header tipizzati
+#e gruppi di ID, un file per ogni tipo di relazione. Sostituiscono i passaggi LOAD CSV/MERGE di new_import.txt
+TABELLE_BULK = {
+    "bulk_persone":      ("persone.csv", ['matricola:ID(Persona)', 'nome', 'cognome', 'stipendio:INT', 'id_banca', 'id_documento', 'id_fonte', ':LABEL'], 'Persona'),
+    "bulk_documenti":    ("documenti.csv", ['id_documento:ID(Documento)', 'nazione', 'email', 'scadenza:DATE', 'matricola', 'num_telefono', ':LABEL'], 'Documento'),
+    "bulk_banche":       ("banche.csv", ['id_banca:ID(Banca)', 'nome', 'nazione', 'max_deposito:INT', ':LABEL'], 'Banca'),
+    "bulk_fonti":        ("fonti.csv", ['id_fonte:ID(Fonte)', 'nome', 'nazione', 'affidabilita:FLOAT', ':LABEL'], 'Fonte'),
+    "bulk_transazioni":  ("transazioni.csv", ['id_transazione:ID(Transazione)', 'matricola', 'importo:INT', 'destinatario', 'data:DATE', 'id_banca_deriva', ':LABEL'], 'Transazione'),
+    "bulk_ha_banca":     ("ha_banca.csv", [':START_ID(Persona)', ':END_ID(Banca)', ':TYPE'], 'HA_BANCA'),
+    "bulk_ha_documento": ("ha_documento.csv", [':START_ID(Persona)', ':END_ID(Documento)', ':TYPE'], 'HA_DOCUMENTO'),
+    "bulk_ha_fonte":     ("ha_fonte.csv", [':START_ID(Persona)', ':END_ID(Fonte)', ':TYPE'], 'HA_FONTE'),
+    "bulk_esegue":       ("esegue.csv", [':START_ID(Persona)', ':END_ID(Transazione)', ':TYPE'], 'ESEGUE'),
+    "bulk_deriva":       ("deriva.csv", [':START_ID(Banca)', ':END_ID(Transazione)', ':TYPE'], 'DERIVA'),
+}
+BULK_DIR = None #None = niente file per l'import offline
+
+COMPRESSIONE = None #None | "gz" | "zst"
+
+def compressione_bulk():
+    #neo4j-admin legge solo file gzip (o zip): con --compress zst i file bulk restano in gzip
+    return "gz" if COMPRESSIONE else None
+
+#tabelle scritte insieme a una principale: (nome, indici delle colonne da copiare, None = tutte)
+#copie Parquet delle tabelle principali (--parquet): tipizzate, ID già normalizzati, vedi colonnare.py
+PARQUET = False
+ID_INTERI = False #--int-ids: nei Parquet le colonne ID sono interi senza prefisso
+
+DERIVATE = {
+    "persone":     [("bulk_persone", None), ("bulk_ha_banca", (0, 4)), ("bulk_ha_documento", (0, 5)), ("bulk_ha_fonte", (0, 6)),
+                    ("pq_persone", None)],
+    "documenti":   [("bulk_documenti", None), ("pq_documenti", None)],
+    "banche":      [("bulk_banche", None), ("pq_banche", None)],
+    "fonti":       [("bulk_fonti", None), ("pq_fonti", None)],
+    #Per ogni transazione (tid, …, bid), scrive una riga: bid -> tid con tipo DERIVA.
+    #Esempio: b7,t123,DERIVA = relazione (:Banca {id:'b7'})-[:DERIVA]->(:Transazione {id:'t123'}).
+    "transazioni": [("deriva", (5, 0)), ("bulk_transazioni", None), ("bulk_esegue", (1, 0)), ("bulk_deriva", (5, 0)),
+                    ("pq_transazioni", None)],
+}
+TABELLE_ANAGRAFICA  = ("persone", "documenti", "banche", "fonti")
+TABELLE_TRANSAZIONI = ("transazioni",)
+
+def con_derivate(principali):
+    nomi = list(principali)
+    for p in principali:
+        nomi += [d for d, _ in DERIVATE.get(p, ()) if attiva(d)]
+    return nomi
+
+def attiva(nome):
+    if nome.startswith("bulk_"):
+        return bool(BULK_DIR)
+    if nome.startswith("pq_"):
+        return PARQUET
+    return True
+
+def apri_tabelle(nomi=None, suffisso="", intestazione=True):
+    tabelle = {}
+    for n in nomi or con_derivate(TABELLE_ANAGRAFICA + TABELLE_TRANSAZIONI):
+        if n in TABELLE:
+            tabelle[n] = TabellaCsv(*TABELLE[n], suffisso=suffisso, intestazione=intestazione,
+                                    compr=COMPRESSIONE)
+        elif n.startswith("pq_"):
+            file, header, etichetta = TABELLE[n[3:]]
+            tabelle[n] = colonnare.TabellaParquet(colonnare.percorso(".", n[3:]), n[3:], header, etichetta, suffisso=suffisso,
+                                                  tipo_ids=tipo_ids_parquet())
+        else:
+            file, header, etichetta = TABELLE_BULK[n]
+            tabelle[n] = TabellaCsv(os.path.join(BULK_DIR, file), header, etichetta, suffisso=suffisso,
+                                    intestazione=intestazione, compr=compressione_bulk())
+    return tabelle
+
+def tipo_ids_parquet():
+    if not ID_INTERI:
+        return None
+    return colonnare.tipo_id(max(NUM_PERSONE, NUM_TRANS, NUM_BANCHE, NUM_FONTI))
+
+def chiudi_tabelle(tabelle):
+    for t in tabelle.values():
+        t.close()
+
+def scrivi(tabelle, nome, colonne):
+    tabelle[nome].scrivi(colonne)
+    for derivata, indici in DERIVATE.get(nome, ()):
+        if derivata in tabelle:
+            tabelle[derivata].scrivi(colonne if indici is None else [colonne[i] for i in indici])
+
+def scrivi_classico(tabelle, dati):
+    for nome in TABELLE_ANAGRAFICA + TABELLE_TRANSAZIONI:
+        scrivi(tabelle, nome, dati[nome])
+
+def scrivi_comando_import():
+    #comando neo4j-admin pronto all'uso (da lanciare dentro BULK_DIR, a database fermo)
+    nodi = [compressione.con_estensione(TABELLE_BULK[n][0], compressione_bulk()) for n in ("bulk_persone", "bulk_documenti", "bulk_banche", "bulk_fonti", "bulk_transazioni")]
+    relazioni = [compressione.con_estensione(TABELLE_BULK[n][0], compressione_bulk()) for n in ("bulk_ha_banca", "bulk_ha_documento", "bulk_ha_fonte", "bulk_esegue", "bulk_deriva")]
+    argomenti = ["neo4j-admin database import full neo4j --overwrite-destination=true"]
+    argomenti += [f"--nodes={f}" for f in nodi] + [f"--relationships={f}" for f in relazioni]
+    with open(os.path.join(BULK_DIR, "comando_import.txt"), "w", encoding="utf-8") as f:
+        f.write(" \\\n  ".join(argomenti) + "\n")
+
+
+def imposta_scala(persone=None, transazioni=None, banche=None, fonti=None):
+    global NUM_PERSONE, NUM_TRANS, NUM_BANCHE, NUM_FONTI, NUM_PATTERN_SOSPETTI
+    NUM_PERSONE = persone or NUM_PERSONE
+    NUM_TRANS   = transazioni or NUM_TRANS
+    NUM_BANCHE  = banche or NUM_BANCHE
+    NUM_FONTI   = fonti or NUM_FONTI
+    NUM_PATTERN_SOSPETTI = min(10_000, int(NUM_PERSONE * 0.1))
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Genera i CSV del dataset (persone, documenti, banche, fonti, transazioni).")
+    p.add_argument("--fast", action="store_true",
+                   help="Modalità veloce senza Faker: vocabolari precostruiti e colonne numpy vettoriali, scritte a blocchi.")
+    p.add_argument("--blocco", type=int, default=BLOCCO_RIGHE,
+                   help="Righe per blocco in modalità veloce (memoria di picco ~ costante al crescere delle persone).")
+    p.add_argument("--shard", type=int, default=1,
+                   help="Processi paralleli per la modalità veloce (implica --fast). "
+                        "L'output è identico a quello seriale a parità di --seed e --blocco.")
+    p.add_argument("--bulk-import", metavar="DIR",
+                   help="Scrive anche i file per neo4j-admin database import (nodi tipizzati + tutte le relazioni) in DIR.")
+    p.add_argument("--compress", choices=sorted(compressione.ESTENSIONI),
+                   help="Scrive i CSV compressi in streaming (persone.csv.gz / persone.csv.zst).")
+    p.add_argument("--parquet", action="store_true",
+                   help="Scrive anche persone.parquet, ... (colonne tipizzate, ID normalizzati, codifica a dizionario).")
+    p.add_argument("--int-ids", action="store_true",
+                   help="Con --parquet: colonne ID intere (int32/int64, p123 -> 123) invece di stringhe; "
+                        "i CSV restano invariati.")
+    p.add_argument("--seed", type=int, default=SEED, help=f"Seed di generazione (default {SEED}).")
+    p.add_argument("--persone", type=int, help=f"Numero di persone (default {NUM_PERSONE}).")
+    p.add_argument("--transazioni", type=int, help=f"Numero di transazioni (default {NUM_TRANS}).")
+    p.add_argument("--banche", type=int, help=f"Numero di banche (default {NUM_BANCHE}).")
+    p.add_argument("--fonti", type=int, help=f"Numero di fonti (default {NUM_FONTI}).")
+    return p.parse_args()
+
+def main():
+    args = parse_args()
+    applica_config({"seed": args.seed, "persone": args.persone, "transazioni": args.transazioni,
+                    "banche": args.banche, "fonti": args.fonti, "bulk": args.bulk_import,
+                    "compressione": args.compress, "parquet": args.parquet, "id_interi": args.int_ids})
+    if BULK_DIR:
+        os.makedirs(BULK_DIR, exist_ok=True)
+        scrivi_comando_import()
+    tabelle = apri_tabelle()
+    try:
+        if args.shard > 1:
+            genera_parallelo(tabelle, args.blocco, args.shard)
+        elif args.fast:
+            genera_veloce(tabelle, args.blocco)
+        else:
+            scrivi_classico(tabelle, genera_classico())
+    finally:
+        chiudi_tabelle(tabelle)
+    conteggi = {nome: tabelle[nome].righe for nome in ("persone", "documenti", "banche", "fonti", "transazioni")}
+    print("CSV generati.")
+    print("Conteggi righe:",
+          "persone", conteggi["persone"],
+          "documenti", conteggi["documenti"],
+          "banche", conteggi["banche"],
+          "fonti", conteggi["fonti"],
+          "transazioni", conteggi["transazioni"],
+          "totale", sum(conteggi.values()))
+
+if __name__ == "__main__":
+    main()
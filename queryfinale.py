@@ -1,11 +1,20 @@
 
+import re
+import json
 import time
 import math
+import queue
+import random
+import argparse
+import threading
 import statistics
 from neo4j import GraphDatabase
 import BaseXClient
 import pandas as pd
 import os
+from pathlib import Path
+
+import statistiche
 
 #configurazione BaseX 
 HOST = "localhost"
@@ -19,23 +28,32 @@ NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "12345678"
 
-#output risultati 
-RESULTS_DIR = r"C:\Users\fabyp\OneDrive\Documents\Progetto DB2\risultati"
-RESULTS_FILE = os.path.join(RESULTS_DIR, "benchmark_risultati_100.xlsx")
+#output risultati (benchmark_risultati_<database>.xlsx), cambiabile con --output-dir
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "risultati")
+
+#campionamento (default della riga di comando)
+WARMUP = 1            #esecuzioni a freddo escluse dalle statistiche
+ITERAZIONI = 30       #misure per query
+MAX_ITERAZIONI = 1000 #tetto per --adattivo
+MAX_SECONDI = 60.0    #tempo massimo per query con --adattivo
 
 #query  
+#"params": nome -> (valore, tipo XQuery); in Cypher è $nome, in XQuery una variabile
+#external legata con bind() sulla query preparata
 
 QUERIES = [
   {
         "name": "Query 1",
+        "params": {"nazione": ("GE", "xs:string")},
         "cypher": """
-match (b:Banca{nazione:'GE'}) return b.nome;
+match (b:Banca{nazione:$nazione}) return b.nome;
 
 """,
         "xquery": r'''
 xquery version "3.1";
+declare variable $nazione as xs:string external;
 
-for $b in /Graph/Nodi/Banche/Banca[@nazione = 'GE']
+for $b in /Graph/Nodi/Banche/Banca[@nazione = $nazione]
 return <nome>{ $b/Nome/text() }</nome>
 
 
@@ -43,18 +61,21 @@ return <nome>{ $b/Nome/text() }</nome>
     },
   {
         "name": "Query 2",
+        "params": {"soglia": (0.6, "xs:decimal"), "iniziale": ("P", "xs:string")},
         "cypher": """
-match (f:Fonte) where f.affidabilita<=0.6 and f.nome starts with 'P'
+match (f:Fonte) where f.affidabilita<=$soglia and f.nome starts with $iniziale
     return f.nome
 
 """,
         "xquery": r'''
 xquery version "3.1";
+declare variable $soglia as xs:decimal external;
+declare variable $iniziale as xs:string external;
 
 for $f in /Graph/Nodi/Fonti/Fonte
 let $a := xs:decimal($f/@affidabilita)
 let $n := normalize-space($f/Nome)
-where $a le 0.6 and starts-with($n, 'P')
+where $a le $soglia and starts-with($n, $iniziale)
 return <nome>{ $n }</nome>
 
 
@@ -123,50 +144,99 @@ return
 ]
 
 
-#statistiche
-def confidence_interval_95(times):
-    n = len(times)        #conta elementi nella lsita 
-    if n < 2:
-        return 0.0  #evita eccezioni come /0
-    mean = statistics.mean(times) #media
-    stdev = statistics.stdev(times) #deviazioen standard
-    t = 2.045 if n == 30 else 1.96 
-    ci = t * (stdev / math.sqrt(n))
-    return ci
+#campionamento
+def campiona(esegui, opz):
+    #esegui() fa una misura e restituisce i ms. Prima opz.warmup esecuzioni escluse dalle
+    #statistiche, poi opz.iterazioni misure; con opz.adattivo (percentuale) si continua finché la
+    #semiampiezza del CI 95% scende sotto quella percentuale della media, entro
+    #opz.max_iterazioni misure e opz.max_secondi secondi
+    prime = [esegui() for _ in range(opz.warmup)]
+    times = []
+    inizio = time.perf_counter()
+    while True:
+        times.append(esegui())
+        if len(times) < opz.iterazioni:
+            continue
+        if not opz.adattivo or len(times) >= opz.max_iterazioni:
+            break
+        if time.perf_counter() - inizio >= opz.max_secondi:
+            break
+        ci = statistiche.intervallo_t(times)
+        if ci <= opz.adattivo / 100 * statistics.mean(times):
+            break
+    first = prime[0] if prime else float("nan") #prima esecuzione (a freddo)
+    return first, times
+
+#tempi lato server riportati da Query.info() (ms)
+INFO_TEMPI = re.compile(r"^(Parsing|Compiling|Evaluating|Printing|Total Time):\s*([\d.]+)\s*ms", re.M)
+
+def tempi_info(info):
+    return {k: float(v) for k, v in INFO_TEMPI.findall(info or "")}
+
+def media(valori):
+    return sum(valori) / len(valori) if valori else float("nan")
 
 #misurazioni
-def measure_basex(xquery):
-    times = []
+#ogni campione è scomposto in fasi, per vedere dove vanno i millisecondi:
+#BaseX: parsing, compilazione, valutazione e serializzazione lato server (Query.info()),
+#       il resto del tempo misurato è lato client (rete + decodifica), più i byte ricevuti
+#Neo4j: result_available_after (pianificazione + primo record) e result_consumed_after
+#       (resto dei record) dal summary; il resto è client. Con --fasi la stessa query si ripete
+#       con consume() (record scartati) per stimare quanto costa costruire i dizionari di .data()
+def measure_basex(xquery, params, opz):
+    #la query si prepara una volta (handle in cache per testo) e poi si esegue con iter():
+    #ogni risultato arriva in streaming e non si accumula in un'unica stringa
+    tempi_server, ricevuti, items = [], [], [0]
     try:
         session = BaseXClient.Session(HOST, PORT, USERNAME, PASSWORD) #connessione
-        session.execute(f"open {DATABASE}")
-        
-        
-        for i in range(31):  #1 esec + 30 misure
+        session.execute(f"open {opz.database}")
+        #senza QUERYINFO Query.info() non riporta i tempi di parsing/compilazione/valutazione
+        session.execute("set queryinfo true")
+
+        start = time.perf_counter()
+        query = session.prepared(xquery)
+        for nome, (valore, tipo) in (params or {}).items():
+            query.bind(f"${nome}", str(valore), tipo)
+        prepare_ms = (time.perf_counter() - start) * 1000.0
+
+        def esegui():
+            byte = session.received_bytes()
             start = time.perf_counter() #restituisce un timestamp 
-            session.execute(f"xquery {xquery}") #fa la query 
+            items[0] = sum(1 for _ in query.iter()) #consuma i risultati uno alla volta
             end = time.perf_counter() #timestamp fine 
-            times.append((end - start) * 1000.0) #converte il tempo trascorso in ms 
+            ricevuti.append(session.received_bytes() - byte)
+            tempi_server.append(tempi_info(query.info())) #fuori dal cronometro
+            return (end - start) * 1000.0 #converte il tempo trascorso in ms 
+
+        first, times = campiona(esegui, opz)
     except Exception as e:
-        try:
-            session.close() #chiude sessione in caso di errori 
-        except:
-            pass #se la sessione è già chiusa ignora eccezione
-        return float("nan"), float("nan"), float("nan"), f"Errore BaseX: {e}" #gestisce errori basex 
+        return float("nan"), [], f"Errore BaseX: {e}", {} #gestisce errori basex 
     finally:
         try:
             session.close() #chiude sessione
         except Exception:
-            pass
-    
-    first = times[0] #salva la prima esec
-    rest = times[1:] if len(times) > 1 else [times[0]] #salva le restanti 
-    avg = sum(rest) / len(rest) #media
-    ci = confidence_interval_95(rest)
-    return first, avg, ci, None #none se non ci sono errori 
-
-def measure_neo4j(cypher):
-    times = []
+            pass #se la sessione è già chiusa ignora eccezione
+
+    server = tempi_server[opz.warmup:]
+    def fase(nome):
+        return media([t.get(nome, float("nan")) for t in server])
+    fasi = {
+        "Prepara(ms)": prepare_ms,
+        "Parsing(ms)": fase("Parsing"),
+        "Compila(ms)": fase("Compiling"),
+        "Valuta(ms)": fase("Evaluating"),
+        "Serializza(ms)": fase("Printing"),
+        "Client(ms)": media([t - s.get("Total Time", float("nan")) for t, s in zip(times, server)]),
+        "Byte": media(ricevuti[opz.warmup:]),
+        "Risultati": items[0],
+    }
+    return first, times, None, fasi #none se non ci sono errori 
+
+def ms_summary(valore):
+    return float("nan") if valore is None else float(valore)
+
+def measure_neo4j(cypher, params, opz):
+    disponibile, consumato, righe, consume_ms = [], [], [0], []
     try:
         driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
         with driver.session() as session:
@@ -174,62 +244,589 @@ def measure_neo4j(cypher):
             driver.verify_connectivity()
             session.run("RETURN 1").consume()
 
-            #1 warm-up + 30 misure reali
-            for i in range(31):
+            def esegui():
                 start = time.perf_counter()
-                session.run(cypher).data()  #ogni riga della query diventa un dizionario
+                result = session.run(cypher, params)
+                records = result.data()  #ogni riga della query diventa un dizionario
                 end = time.perf_counter()
-                times.append((end - start) * 1000.0)
+                summary = result.consume() #già consumato: restituisce solo il summary
+                disponibile.append(ms_summary(summary.result_available_after))
+                consumato.append(ms_summary(summary.result_consumed_after))
+                righe[0] = len(records)
+                return (end - start) * 1000.0
+
+            first, times = campiona(esegui, opz)
+            if opz.fasi:
+                for _ in times: #stesse query, record scartati senza costruire dizionari
+                    start = time.perf_counter()
+                    session.run(cypher, params).consume()
+                    consume_ms.append((time.perf_counter() - start) * 1000.0)
     except Exception as e:
-        return float("nan"), float("nan"), float("nan"), f"Errore Neo4j: {e}"
+        return float("nan"), [], f"Errore Neo4j: {e}", {}
     finally:
         try:
             driver.close()
         except Exception:
             pass
 
-    first = times[0]
-    rest = times[1:] if len(times) > 1 else [times[0]]
-    avg = sum(rest) / len(rest)
-    ci = confidence_interval_95(rest)
-    return first, avg, ci, None
+    d, c = disponibile[opz.warmup:], consumato[opz.warmup:]
+    fasi = {
+        "Disponibile(ms)": media(d),
+        "Consumato(ms)": media(c),
+        "Client(ms)": media([t - a - b for t, a, b in zip(times, d, c)]),
+        "consume(ms)": media(consume_ms),
+        "Dizionari(ms)": media(times) - media(consume_ms) if consume_ms else float("nan"),
+        "Risultati": righe[0],
+    }
+    return first, times, None, fasi
+
+
+#report
+COLONNE = ["Query", "DBMS", "Prima(ms)", "N", "Media(ms)", "CI95(ms)", "p50(ms)", "p90(ms)", "p99(ms)",
+           "Max(ms)", "Outlier",
+           "Prepara(ms)", "Parsing(ms)", "Compila(ms)", "Valuta(ms)", "Serializza(ms)", "Byte",
+           "Disponibile(ms)", "Consumato(ms)", "consume(ms)", "Dizionari(ms)",
+           "Client(ms)", "Risultati", "Note"]
+
+def riga_risultato(nome, dbms, first, times, err, fasi):
+    riga = {"Query": nome, "DBMS": dbms, "Prima(ms)": first, **statistiche.riassunto(times), **fasi}
+    note = [err] if err else []
+    fuori = statistiche.outlier(times)
+    if fuori:
+        estremi = sorted(fuori, key=lambda x: abs(x - riga["p50(ms)"]), reverse=True)[:5] #i più lontani dalla mediana
+        note.append(f"{len(fuori)} outlier, es. (ms): " + ", ".join(f"{x:.2f}" for x in estremi))
+    riga["Note"] = "; ".join(note)
+    return riga
+
+def stampa_intestazione():
+    print(f"{'Query':<12} | {'DBMS':<6} | {'Prima':>9} | {'N':>5} | {'Media':>9} | {'CI 95%':>8} | "
+          f"{'p50':>9} | {'p90':>9} | {'p99':>9} | {'Max':>9} | {'Out':>3}")
+    print("-" * 118)
+
+def stampa_riga(r):
+    print(f"{r['Query']:<12} | {r['DBMS']:<6} | {r['Prima(ms)']:9.2f} | {r['N']:5d} | {r['Media(ms)']:9.2f} | "
+          f"{r['CI95(ms)']:8.2f} | {r['p50(ms)']:9.2f} | {r['p90(ms)']:9.2f} | {r['p99(ms)']:9.2f} | "
+          f"{r['Max(ms)']:9.2f} | {r['Outlier']:3d}")
+    if "Prepara(ms)" in r:
+        print(f"{'':<12} | {'':<6} | prepara {r['Prepara(ms)']:.2f}  parsing {r['Parsing(ms)']:.2f}"
+              f"  compila {r['Compila(ms)']:.2f}  valuta {r['Valuta(ms)']:.2f}  serializza {r['Serializza(ms)']:.2f}"
+              f"  client {r['Client(ms)']:.2f}  byte {r['Byte']:.0f}  risultati {r['Risultati']}")
+    if "Disponibile(ms)" in r:
+        print(f"{'':<12} | {'':<6} | disponibile {r['Disponibile(ms)']:.2f}  consumato {r['Consumato(ms)']:.2f}"
+              f"  client {r['Client(ms)']:.2f}  consume() {r['consume(ms)']:.2f}"
+              f"  dizionari {r['Dizionari(ms)']:.2f}  righe {r['Risultati']}")
+    if r["Note"]:
+        print(f"{'':<12} | {'':<6} | {r['Note']}")
+
+def esegui_suite(opz):
+    results = []
+    stampa_intestazione()
 
+    #PRIMA Neo4j per tutte le query
+    if opz.dbms in ("neo4j", "entrambi"):
+        for q in QUERIES:
+            params = {k: v for k, (v, _) in q.get("params", {}).items()}
+            r = riga_risultato(q["name"], "Neo4j", *measure_neo4j(q.get("cypher", "").strip(), params, opz))
+            stampa_riga(r)
+            results.append(r)
 
+    #POI BaseX per tutte le query
+    if opz.dbms in ("basex", "entrambi"):
+        for q in QUERIES:
+            r = riga_risultato(q["name"], "BaseX", *measure_basex(q.get("xquery", "").strip(), q.get("params"), opz))
+            stampa_riga(r)
+            results.append(r)
+    return results
+
+
+#carico concorrente (--carico): il mix di QUERIES eseguito da N worker (thread) per --durata
+#secondi. Ciclo chiuso: ogni worker lancia la query successiva appena finisce la precedente.
+#Ciclo aperto (--tasso): gli arrivi sono un processo di Poisson al tasso richiesto, indipendente
+#dalle risposte, e la latenza si misura dall'istante di arrivo (attesa in coda compresa), così un
+#server saturo non rallenta il generatore e la coda si vede nei percentili
+CARICO_WORKER = [1, 2, 4, 8]
+CARICO_DURATA = 30.0
+CARICO_FINESTRA = 5.0
+#un livello è "saturo" se raddoppiare i worker porta meno del 10% di throughput in più,
+#o se in ciclo aperto resta senza risposta più del 5% degli arrivi
+GUADAGNO_MINIMO = 0.10
+QUOTA_SERVITA = 0.95
+
+def esecutore_basex(opz, worker):
+    #una sessione per worker dal pool, query preparate e legate una volta per sessione
+    pool = BaseXClient.SessionPool(HOST, PORT, USERNAME, PASSWORD, max_size=worker)
+    def apri():
+        session = pool.acquire(opz.database)
+        preparate, fallita = {}, [False]
+        def esegui(q):
+            try:
+                query = preparate.get(q["name"])
+                if query is None:
+                    query = preparate[q["name"]] = session.prepared(q["xquery"].strip())
+                    for nome, (valore, tipo) in q.get("params", {}).items():
+                        query.bind(f"${nome}", str(valore), tipo)
+                return sum(1 for _ in query.iter())
+            except Exception:
+                fallita[0] = True
+                raise
+        #dopo un errore la sessione non torna nel pool: si chiude
+        return esegui, lambda: pool.release(session, discard=fallita[0])
+    return apri, pool.close
+
+def esecutore_neo4j(opz, worker):
+    #un driver condiviso (thread-safe), una sessione per worker
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                  max_connection_pool_size=max(worker, 100))
+    driver.verify_connectivity()
+    def apri():
+        session = driver.session()
+        def esegui(q):
+            params = {k: v for k, (v, _) in q.get("params", {}).items()}
+            return len(session.run(q["cypher"].strip(), params).data())
+        return esegui, session.close
+    return apri, driver.close
+
+ESECUTORI = {"Neo4j": esecutore_neo4j, "BaseX": esecutore_basex}
+
+def carico(dbms, opz, worker, tasso=None):
+    #restituisce (riga di riepilogo, righe per finestra di tempo)
+    apri, chiudi_tutto = ESECUTORI[dbms](opz, worker)
+    misure = [[] for _ in range(worker)] #per worker: (fine relativa s, latenza ms, query, ok)
+    arrivi = queue.Queue()
+    stato = {"inizio": 0.0, "fine": 0.0, "arrivi": 0}
+    errori = []
+
+    def avvia():
+        #la prova parte quando tutti i worker hanno la sessione: l'apertura non conta in --durata
+        stato["inizio"] = time.perf_counter()
+        stato["fine"] = stato["inizio"] + opz.durata
+    pronti = threading.Barrier(worker + 1, action=avvia)
+
+    def lavora(i):
+        try:
+            esegui, chiudi = apri()
+        except Exception as e:
+            errori.append(e)
+            pronti.abort() #sblocca gli altri worker e il thread principale
+            return
+        try:
+            try:
+                pronti.wait()
+            except threading.BrokenBarrierError:
+                return #un altro worker non ha aperto la sessione
+            k = i #ogni worker parte da una query diversa del mix
+            while True:
+                if tasso:
+                    try:
+                        arrivo, q = arrivi.get(timeout=max(stato["fine"] - time.perf_counter(), 0.001))
+                    except queue.Empty:
+                        break
+                    if time.perf_counter() >= stato["fine"]:
+                        break #arrivi rimasti in coda a fine prova: non servite
+                else:
+                    arrivo, q = time.perf_counter(), QUERIES[k % len(QUERIES)]
+                    k += 1
+                    if arrivo >= stato["fine"]:
+                        break
+                ok = True
+                try:
+                    esegui(q)
+                except Exception:
+                    ok = False
+                fine = time.perf_counter()
+                misure[i].append((fine - stato["inizio"], (fine - arrivo) * 1000.0, q["name"], ok))
+        finally:
+            chiudi()
+
+    threads = [threading.Thread(target=lavora, args=(i,), daemon=True) for i in range(worker)]
+    for t in threads:
+        t.start()
+    try:
+        pronti.wait()
+    except threading.BrokenBarrierError:
+        for t in threads:
+            t.join()
+        chiudi_tutto()
+        raise IOError(f"sessione non disponibile: {errori[0] if errori else 'worker interrotto'}")
+    if tasso:
+        #generatore degli arrivi (Poisson): non aspetta i worker, se sono indietro la coda cresce
+        rng = random.Random(0)
+        arrivo = stato["inizio"]
+        while True:
+            arrivo += rng.expovariate(tasso)
+            if arrivo >= stato["fine"]:
+                break
+            attesa = arrivo - time.perf_counter()
+            if attesa > 0:
+                time.sleep(attesa)
+            arrivi.put((arrivo, QUERIES[stato["arrivi"] % len(QUERIES)]))
+            stato["arrivi"] += 1
+    for t in threads:
+        t.join()
+    chiudi_tutto()
+
+    tutte = sorted(m for ms in misure for m in ms)
+    riuscite = [m for m in tutte if m[3]]
+    finestre = []
+    for j in range(math.ceil(opz.durata / opz.finestra)):
+        dentro = [m[1] for m in riuscite if j * opz.finestra <= m[0] < (j + 1) * opz.finestra]
+        r = statistiche.riassunto(dentro)
+        finestre.append({"DBMS": dbms, "Worker": worker, "Tasso(q/s)": tasso, "Da(s)": j * opz.finestra,
+                         "QPS": len(dentro) / min(opz.finestra, opz.durata - j * opz.finestra),
+                         **{k: r[k] for k in ("p50(ms)", "p90(ms)", "p99(ms)", "Max(ms)")}})
+    r = statistiche.riassunto([m[1] for m in riuscite])
+    riepilogo = {"DBMS": dbms, "Worker": worker, "Tasso(q/s)": tasso, "Durata(s)": opz.durata,
+                 "Completate": len(riuscite), "Errori": len(tutte) - len(riuscite),
+                 "QPS": len(riuscite) / opz.durata,
+                 **{k: r[k] for k in ("p50(ms)", "p90(ms)", "p99(ms)", "Max(ms)")},
+                 "Arrivi(q/s)": stato["arrivi"] / opz.durata if tasso else None,
+                 "Non servite": stato["arrivi"] - len(tutte) if tasso else 0,
+                 "Saturo": False}
+    return riepilogo, finestre
+
+def segna_saturazione(righe):
+    #righe di uno stesso dbms in ordine di worker (ciclo chiuso) o di tasso (ciclo aperto)
+    for prec, r in zip([None] + righe, righe):
+        if r["Tasso(q/s)"]:
+            arrivi = r["Arrivi(q/s)"] * r["Durata(s)"]
+            r["Saturo"] = r["Non servite"] > (1 - QUOTA_SERVITA) * arrivi
+        elif prec is not None:
+            r["Saturo"] = r["QPS"] < (1 + GUADAGNO_MINIMO) * prec["QPS"]
+    sature = [r for r in righe if r["Saturo"]]
+    return sature[0] if sature else None
+
+def esegui_carico(opz):
+    riepilogo, finestre = [], []
+    dbms_scelti = [d for d in ("Neo4j", "BaseX") if opz.dbms in (d.lower(), "entrambi")]
+    livelli = [(max(opz.worker), t) for t in opz.tasso] if opz.tasso else [(w, None) for w in opz.worker]
+    print(f"{'DBMS':<6} | {'Worker':>6} | {'Tasso':>7} | {'QPS':>8} | {'p50':>9} | {'p90':>9} | "
+          f"{'p99':>9} | {'Max':>9} | {'Errori':>6} | {'Non serv.':>9}")
+    print("-" * 100)
+    for dbms in dbms_scelti:
+        righe, errore = [], []
+        for worker, tasso in livelli:
+            try:
+                r, f = carico(dbms, opz, worker, tasso)
+            except Exception as e:
+                print(f"{dbms:<6} | {worker:6d} | errore: {e}")
+                errore.append({"DBMS": dbms, "Worker": worker, "Tasso(q/s)": tasso, "Errore": str(e)})
+                break
+            print(f"{dbms:<6} | {worker:6d} | {tasso or 0:7.1f} | {r['QPS']:8.1f} | {r['p50(ms)']:9.2f} | "
+                  f"{r['p90(ms)']:9.2f} | {r['p99(ms)']:9.2f} | {r['Max(ms)']:9.2f} | {r['Errori']:6d} | "
+                  f"{r['Non servite']:9d}")
+            righe.append(r)
+            finestre.extend(f)
+        saturo = segna_saturazione(righe)
+        if saturo:
+            livello = f"{saturo['Tasso(q/s)']:g} q/s richieste" if saturo["Tasso(q/s)"] else f"{saturo['Worker']} worker"
+            print(f"{dbms}: saturazione a {livello} (throughput {saturo['QPS']:.1f} q/s)")
+        elif righe:
+            print(f"{dbms}: nessuna saturazione fino a {righe[-1]['QPS']:.1f} q/s")
+        riepilogo.extend(righe + errore)
+    return riepilogo, finestre
+
+def salva_carico(riepilogo, finestre, path):
+    with pd.ExcelWriter(path) as xw:
+        pd.DataFrame(riepilogo).round(2).to_excel(xw, sheet_name="riepilogo", index=False)
+        pd.DataFrame(finestre).round(2).to_excel(xw, sheet_name="finestre", index=False)
+    print(f"\nRisultati salvati in {path}")
+
+
+#sweep di scala (--sweep): la suite completa su più livelli di dimensione (i database di subset.py
+#caricati in BaseX, es. dataset_25 dataset_50 dataset_75 dataset_100) e, per ogni query e dbms,
+#la pendenza della retta log(media) ~ log(dimensione): 1 = lineare, 2 = quadratica.
+#Neo4j tiene un solo grafo alla volta: con --neo4j-dirs si carica il primo livello (es. subset_25)
+#e poi i delta di subset.py --delta (delta_25_50, ...) prima di misurare il livello successivo
+TOLLERANZA_SCALA = 0.1 #pendenza oltre 1 + TOLLERANZA_SCALA = super-lineare
+
+def pendenza_loglog(xs, ys):
+    #minimi quadrati su (log x, log y): restituisce (pendenza, R^2)
+    punti = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(punti) < 2:
+        return float("nan"), float("nan")
+    mx = statistics.mean(p[0] for p in punti)
+    my = statistics.mean(p[1] for p in punti)
+    sxx = sum((x - mx) ** 2 for x, _ in punti)
+    sxy = sum((x - mx) * (y - my) for x, y in punti)
+    syy = sum((y - my) ** 2 for _, y in punti)
+    if sxx == 0:
+        return float("nan"), float("nan")
+    pendenza = sxy / sxx
+    return pendenza, (sxy * sxy / (sxx * syy) if syy else 1.0)
+
+def dimensioni_sweep(opz):
+    if opz.dimensioni:
+        return opz.dimensioni
+    dims = []
+    for db in opz.sweep:
+        m = re.search(r"(\d+(?:\.\d+)?)$", db)
+        if not m:
+            raise ValueError(f"dimensione non ricavabile dal nome '{db}': usa --dimensioni")
+        dims.append(float(m.group(1)))
+    return dims
+
+def carica_livello_neo4j(i, cartella):
+    import carica_neo4j #solo per --neo4j-dirs
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        print(f"Neo4j: {'delta' if i else 'carico'} {cartella}")
+        carica_neo4j.carica(driver, Path(cartella), delta=i > 0)
+    finally:
+        driver.close()
+
+def esegui_sweep(opz):
+    dims = dimensioni_sweep(opz)
+    misure = []
+    for i, (db, dim) in enumerate(zip(opz.sweep, dims)):
+        print(f"\n==== {db} (dimensione {dim:g}) ====")
+        if opz.neo4j_dirs:
+            carica_livello_neo4j(i, opz.neo4j_dirs[i])
+        livello = argparse.Namespace(**{**vars(opz), "database": db})
+        for r in esegui_suite(livello):
+            misure.append({"Database": db, "Dimensione": dim, **r})
+        if opz.piani:
+            salva_piani(livello)
+
+    scala = []
+    print(f"\n{'Query':<12} | {'DBMS':<6} | {'Pendenza':>8} | {'R^2':>5} | {'Media min-max (ms)':>22} |")
+    print("-" * 72)
+    for (nome, dbms) in dict.fromkeys((r["Query"], r["DBMS"]) for r in misure):
+        serie = [r for r in misure if r["Query"] == nome and r["DBMS"] == dbms]
+        pendenza, r2 = pendenza_loglog([r["Dimensione"] for r in serie], [r["Media(ms)"] for r in serie])
+        superlineare = pendenza > 1 + TOLLERANZA_SCALA
+        medie = [r["Media(ms)"] for r in serie]
+        scala.append({"Query": nome, "DBMS": dbms, "Pendenza": pendenza, "R2": r2,
+                      "Livelli": len(serie), "Super-lineare": superlineare})
+        print(f"{nome:<12} | {dbms:<6} | {pendenza:8.2f} | {r2:5.2f} | {min(medie):10.2f}-{max(medie):<11.2f} |"
+              f"{'  SUPER-LINEARE' if superlineare else ''}")
+    return misure, scala
+
+def salva_sweep(misure, scala, path):
+    with pd.ExcelWriter(path) as xw:
+        pd.DataFrame(misure, columns=["Database", "Dimensione"] + COLONNE).round(2).to_excel(
+            xw, sheet_name="misure", index=False)
+        pd.DataFrame(scala).round(3).to_excel(xw, sheet_name="scalabilita", index=False)
+    print(f"\nRisultati salvati in {path}")
+
+
+#piani di esecuzione (--piani): per ogni query il piano Cypher (EXPLAIN, e PROFILE con db hits e
+#righe per operatore) e, per BaseX, le note di compilazione di Query.info() (riscritture e indici
+#usati), la query ottimizzata e il piano XML. Si salvano in piani_<database>.json accanto ai tempi,
+#in forma stabile per poterli confrontare tra due esecuzioni (--confronta-piani)
+INFO_SEZIONE = re.compile(r"^([A-Z][A-Za-z ]+):\s*$")
+
+def nodo_piano(nodo):
+    #piano/profilo del driver Neo4j (dict annidati) -> struttura con nomi fissi
+    if not nodo:
+        return None
+    argomenti = nodo.get("args") or nodo.get("arguments") or {}
+    return {
+        "operatore": nodo.get("operatorType"),
+        "dettagli": argomenti.get("Details"),
+        "righe_stimate": argomenti.get("EstimatedRows"),
+        "db_hits": nodo.get("dbHits", argomenti.get("DbHits")),
+        "righe": nodo.get("rows", argomenti.get("Rows")),
+        "identificatori": sorted(nodo.get("identifiers") or []),
+        "figli": [nodo_piano(f) for f in nodo.get("children") or []],
+    }
 
-#Main
-if __name__ == "__main__":
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    results = []
+def operatori(nodo):
+    #operatori in preordine: basta confrontare queste liste per vedere se il piano è cambiato
+    if not nodo:
+        return []
+    return [nodo["operatore"]] + [o for f in nodo["figli"] for o in operatori(f)]
 
-    print(f"{'Query':<12} | {'DBMS':<6} | {'Prima (ms)':>10} | {'Media 30 (ms)':>12} | {'CI 95% (ms)':>12}")
-    print("-" * 85)
+def db_hits_totali(nodo):
+    if not nodo:
+        return None
+    return (nodo["db_hits"] or 0) + sum(db_hits_totali(f) or 0 for f in nodo["figli"])
 
-    #PRIMA Neo4j per tutte le query
-    for q in QUERIES:
-        first_n, avg_n, ci_n, err_n = measure_neo4j(q.get("cypher", "").strip())
-        print(f"{q['name']:<12} | {'Neo4j':<6} | {first_n:10.2f} | {avg_n:12.2f} | {ci_n:12.2f}")
-        results.append({
-            "Query": q["name"], "DBMS": "Neo4j",
-            "Prima(ms)": round(first_n, 2),
-            "Media30(ms)": round(avg_n, 2),
-            "CI95(ms)": round(ci_n, 2)
-        })
+def cattura_neo4j(cypher, params):
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session() as session:
+            explain = nodo_piano(session.run("EXPLAIN " + cypher, params).consume().plan)
+            profilo = nodo_piano(session.run("PROFILE " + cypher, params).consume().profile)
+    finally:
+        driver.close()
+    return {"operatori": operatori(explain), "explain": explain,
+            "db_hits": db_hits_totali(profilo), "profile": profilo}
+
+def sezioni_info(info):
+    #Query.info() con queryinfo/xmlplan attivi: sezioni "Titolo:" seguite dalle loro righe
+    sezioni, corrente = {}, None
+    for riga in (info or "").splitlines():
+        m = INFO_SEZIONE.match(riga)
+        if m:
+            corrente = m.group(1)
+            sezioni[corrente] = []
+        elif corrente and riga.strip():
+            sezioni[corrente].append(riga.rstrip())
+    return sezioni
+
+def cattura_basex(xquery, params, database):
+    session = BaseXClient.Session(HOST, PORT, USERNAME, PASSWORD)
+    try:
+        #xmlplan solo nella sessione di cattura: le misure non pagano la serializzazione del piano
+        session.execute("set queryinfo true")
+        session.execute("set xmlplan true")
+        session.execute(f"open {database}")
+        query = session.query(xquery)
+        for nome, (valore, tipo) in (params or {}).items():
+            query.bind(f"${nome}", str(valore), tipo)
+        risultati = sum(1 for _ in query.iter())
+        info = query.info()
+        query.close()
+    finally:
+        session.close()
+    sezioni = sezioni_info(info)
+    compilazione = [r.strip() for r in sezioni.get("Compiling", [])]
+    return {
+        "indici": [r for r in compilazione if "index" in r.lower()],
+        "compilazione": compilazione,
+        "query_ottimizzata": "\n".join(sezioni.get("Optimized Query", [])),
+        "piano_xml": "\n".join(sezioni.get("Query plan", sezioni.get("Query Plan", []))),
+        "tempi": tempi_info(info),
+        "risultati": risultati,
+    }
 
-    #POI BaseX per tutte le query
+def cattura_piani(opz):
+    piani = {"database": opz.database, "data": time.strftime("%Y-%m-%d %H:%M:%S"), "query": {}}
     for q in QUERIES:
-        first_b, avg_b, ci_b, err_b = measure_basex(q.get("xquery", "").strip())
-        print(f"{q['name']:<12} | {'BaseX':<6} | {first_b:10.2f} | {avg_b:12.2f} | {ci_b:12.2f}")
-        results.append({
-            "Query": q["name"], "DBMS": "BaseX",
-            "Prima(ms)": round(first_b, 2),
-            "Media30(ms)": round(avg_b, 2),
-            "CI95(ms)": round(ci_b, 2)
-        })
-
-    #salvataggio
-    df = pd.DataFrame(results, columns=["Query", "DBMS", "Prima(ms)", "Media30(ms)", "CI95(ms)", "Note"])
-    df.to_excel(RESULTS_FILE, index=False)
-    print(f"\nRisultati salvati in {RESULTS_FILE}")
+        voce = {}
+        if opz.dbms in ("neo4j", "entrambi"):
+            params = {k: v for k, (v, _) in q.get("params", {}).items()}
+            try:
+                voce["neo4j"] = cattura_neo4j(q.get("cypher", "").strip(), params)
+            except Exception as e:
+                voce["neo4j"] = {"errore": str(e)}
+        if opz.dbms in ("basex", "entrambi"):
+            try:
+                voce["basex"] = cattura_basex(q.get("xquery", "").strip(), q.get("params"), opz.database)
+            except Exception as e:
+                voce["basex"] = {"errore": str(e)}
+        piani["query"][q["name"]] = voce
+        n, b = voce.get("neo4j", {}), voce.get("basex", {})
+        hits = f"  (db hits {n['db_hits']})" if n.get("db_hits") is not None else ""
+        print(f"{q['name']:<12} | Neo4j: {' > '.join(n.get('operatori', [])) or n.get('errore', '-')}{hits}")
+        print(f"{'':<12} | BaseX: {'; '.join(b.get('indici', [])) or b.get('errore', 'nessun indice')}")
+    return piani
+
+def confronta_piani(vecchi, nuovi):
+    #differenze di piano tra due file: operatori Cypher e indici usati da BaseX
+    cambiati = 0
+    for nome, voce in nuovi["query"].items():
+        prima = vecchi.get("query", {}).get(nome, {})
+        for dbms, chiave in (("neo4j", "operatori"), ("basex", "indici")):
+            a, b = prima.get(dbms, {}).get(chiave), voce.get(dbms, {}).get(chiave)
+            if a is not None and b is not None and a != b:
+                cambiati += 1
+                print(f"{nome} {dbms}: {chiave} cambiati\n  prima: {a}\n  ora:   {b}")
+        hits_a, hits_b = prima.get("neo4j", {}).get("db_hits"), voce.get("neo4j", {}).get("db_hits")
+        if hits_a and hits_b and hits_b > 2 * hits_a:
+            cambiati += 1
+            print(f"{nome} neo4j: db hits {hits_a} -> {hits_b}")
+    print(f"piani cambiati: {cambiati}" if cambiati else "nessun piano cambiato")
+    return cambiati
+
+def salva_piani(opz):
+    print("\n---- Piani di esecuzione ----")
+    piani = cattura_piani(opz)
+    path = os.path.join(opz.output_dir, f"piani_{opz.database}.json")
+    if opz.confronta_piani:
+        with open(opz.confronta_piani, encoding="utf-8") as f:
+            confronta_piani(json.load(f), piani)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(piani, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Piani salvati in {path}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark delle QUERIES su Neo4j e BaseX.")
+    p.add_argument("--warmup", type=int, default=WARMUP, metavar="N",
+                   help=f"Esecuzioni di riscaldamento escluse dalle statistiche (default: {WARMUP}).")
+    p.add_argument("--iterazioni", type=int, default=ITERAZIONI, metavar="N",
+                   help=f"Misure per query (minimo, con --adattivo) (default: {ITERAZIONI}).")
+    p.add_argument("--adattivo", type=float, metavar="PCT",
+                   help="Continua a misurare finché la semiampiezza del CI 95%% è sotto PCT%% della media.")
+    p.add_argument("--max-iterazioni", type=int, default=MAX_ITERAZIONI, metavar="N",
+                   help=f"Tetto di misure per query con --adattivo (default: {MAX_ITERAZIONI}).")
+    p.add_argument("--max-secondi", type=float, default=MAX_SECONDI, metavar="S",
+                   help=f"Tempo massimo di misura per query con --adattivo (default: {MAX_SECONDI}).")
+    p.add_argument("--fasi", action="store_true",
+                   help="Neo4j: ripete ogni query anche con consume() per stimare il costo di .data() lato client.")
+    p.add_argument("--piani", action="store_true",
+                   help="Salva i piani (EXPLAIN/PROFILE di Neo4j, Query.info() di BaseX) in piani_<database>.json.")
+    p.add_argument("--confronta-piani", metavar="JSON",
+                   help="Con --piani: confronta i piani con quelli di un file salvato in precedenza.")
+    p.add_argument("--dbms", choices=["neo4j", "basex", "entrambi"], default="entrambi")
+    p.add_argument("--database", default=DATABASE, help=f"Database BaseX (default: {DATABASE}).")
+    p.add_argument("--output-dir", default=RESULTS_DIR, help=f"Cartella dei risultati (default: {RESULTS_DIR}).")
+    c = p.add_argument_group("carico concorrente")
+    c.add_argument("--carico", action="store_true", help="Misura il throughput del mix di QUERIES con più worker.")
+    c.add_argument("--worker", type=int, nargs="+", default=CARICO_WORKER, metavar="N",
+                   help=f"Livelli di concorrenza (ciclo chiuso) o thread disponibili (ciclo aperto: il massimo) "
+                        f"(default: {' '.join(map(str, CARICO_WORKER))}).")
+    c.add_argument("--tasso", type=float, nargs="+", metavar="QPS",
+                   help="Ciclo aperto: arrivi di Poisson a questi tassi (query/s) invece del ciclo chiuso.")
+    c.add_argument("--durata", type=float, default=CARICO_DURATA, metavar="S",
+                   help=f"Secondi per livello (default: {CARICO_DURATA:g}).")
+    c.add_argument("--finestra", type=float, default=CARICO_FINESTRA, metavar="S",
+                   help=f"Ampiezza delle finestre per QPS e percentili nel tempo (default: {CARICO_FINESTRA:g}).")
+    w = p.add_argument_group("sweep di scala")
+    w.add_argument("--sweep", nargs="+", metavar="DB",
+                   help="Database BaseX dei livelli, dal più piccolo (es. dataset_25 dataset_50 dataset_75 dataset_100).")
+    w.add_argument("--dimensioni", type=float, nargs="+", metavar="X",
+                   help="Dimensione di ogni livello (default: il numero finale del nome del database).")
+    w.add_argument("--neo4j-dirs", nargs="+", metavar="DIR",
+                   help="Per Neo4j: cartella del primo livello e poi i delta di subset.py, uno per livello "
+                        "(es. subset_25 delta_25_50 delta_50_75 delta_75_100), caricati in un database vuoto.")
+    args = p.parse_args(argv)
+    if args.sweep:
+        if args.dimensioni and len(args.dimensioni) != len(args.sweep):
+            p.error("--dimensioni deve avere un valore per ogni database di --sweep")
+        if args.dbms != "basex" and not args.neo4j_dirs:
+            p.error("con --sweep Neo4j va ricaricato a ogni livello: indica --neo4j-dirs oppure usa --dbms basex")
+        if args.neo4j_dirs and len(args.neo4j_dirs) != len(args.sweep):
+            p.error("--neo4j-dirs deve avere una cartella per ogni database di --sweep")
+        try:
+            args.dimensioni = dimensioni_sweep(args)
+        except ValueError as e:
+            p.error(str(e))
+    if args.warmup < 0 or args.iterazioni < 1:
+        p.error("servono --warmup >= 0 e --iterazioni >= 1")
+    if args.adattivo is not None and args.adattivo <= 0:
+        p.error("--adattivo deve essere una percentuale positiva")
+    if min(args.worker) < 1 or args.durata <= 0 or args.finestra <= 0 or (args.tasso and min(args.tasso) <= 0):
+        p.error("--worker, --durata, --finestra e --tasso devono essere positivi")
+    if args.confronta_piani and not args.piani:
+        p.error("--confronta-piani richiede --piani")
+    if args.piani and args.carico:
+        p.error("--piani vale per la suite e per --sweep, non per --carico")
+    return args
+
+def salva(results, path):
+    df = pd.DataFrame(results, columns=COLONNE).round(2)
+    df.to_excel(path, index=False)
+    print(f"\nRisultati salvati in {path}")
+
+
+#Main
+if __name__ == "__main__":
+    opz = parse_args()
+    os.makedirs(opz.output_dir, exist_ok=True)
+    if opz.sweep:
+        misure, scala = esegui_sweep(opz)
+        salva_sweep(misure, scala, os.path.join(opz.output_dir, f"sweep_{opz.sweep[0]}_{opz.sweep[-1]}.xlsx"))
+    elif opz.carico:
+        riepilogo, finestre = esegui_carico(opz)
+        salva_carico(riepilogo, finestre, os.path.join(opz.output_dir, f"carico_{opz.database}.xlsx"))
+    else:
+        results = esegui_suite(opz)
+        #salvataggio
+        salva(results, os.path.join(opz.output_dir, f"benchmark_risultati_{opz.database}.xlsx"))
+        if opz.piani:
+            salva_piani(opz)
 
 #Trovare banche in germania 
 #Trovare fonti con poca affidabilità che iniziano con p 
@@ -0,0 +1,147 @@
+#statistiche dei benchmark (queryfinale.py): istogramma a bucket logaritmici per i percentili,
+#intervallo di confidenza con la t di Student per qualsiasi n (senza scipy) e outlier di Tukey
+import math
+import statistics
+
+#larghezza relativa dei bucket: un percentile letto dall'istogramma sbaglia al più dell'1%
+PRECISIONE = 0.01
+
+
+class Istogramma:
+    #latenze in ms contate per bucket logaritmico: memoria costante qualunque sia il numero di
+    #campioni, e istogrammi di worker o finestre di tempo diversi si sommano con unisci()
+    def __init__(self, precisione=PRECISIONE):
+        self.precisione = precisione
+        self.base = math.log1p(precisione)
+        self.conteggi = {}
+        self.n = 0
+        self.somma = 0.0
+        self.minimo = math.inf
+        self.massimo = 0.0
+
+    def bucket(self, ms):
+        return math.floor(math.log(max(ms, 1e-6)) / self.base)
+
+    def aggiungi(self, ms):
+        b = self.bucket(ms)
+        self.conteggi[b] = self.conteggi.get(b, 0) + 1
+        self.n += 1
+        self.somma += ms
+        self.minimo = min(self.minimo, ms)
+        self.massimo = max(self.massimo, ms)
+
+    def unisci(self, altro):
+        for b, c in altro.conteggi.items():
+            self.conteggi[b] = self.conteggi.get(b, 0) + c
+        self.n += altro.n
+        self.somma += altro.somma
+        self.minimo = min(self.minimo, altro.minimo)
+        self.massimo = max(self.massimo, altro.massimo)
+        return self
+
+    def media(self):
+        return self.somma / self.n if self.n else math.nan
+
+    def percentile(self, p):
+        #p in [0, 100]: limite superiore del bucket che contiene il rango ceil(p% * n)
+        if not self.n:
+            return math.nan
+        rango = max(1, math.ceil(p / 100 * self.n))
+        cumulato = 0
+        for b in sorted(self.conteggi):
+            cumulato += self.conteggi[b]
+            if cumulato >= rango:
+                return min(max(math.exp((b + 1) * self.base), self.minimo), self.massimo)
+        return self.massimo
+
+
+def _frazione_continua_beta(a, b, x):
+    #frazione continua della beta incompleta (metodo di Lentz)
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return h
+
+def beta_regolarizzata(x, a, b):
+    #I_x(a, b)
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    lnfront = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(lnfront) * _frazione_continua_beta(a, b, x) / a
+    return 1.0 - math.exp(lnfront) * _frazione_continua_beta(b, a, 1.0 - x) / b
+
+def cdf_t(t, gradi):
+    coda = 0.5 * beta_regolarizzata(gradi / (gradi + t * t), gradi / 2.0, 0.5)
+    return 1.0 - coda if t >= 0 else coda
+
+def quantile_t(p, gradi):
+    #inversa della cdf per bisezione (es. quantile_t(0.975, 29) = 2.045)
+    if p == 0.5:
+        return 0.0
+    if p < 0.5:
+        return -quantile_t(1.0 - p, gradi)
+    basso, alto = 0.0, 1.0
+    while cdf_t(alto, gradi) < p:
+        alto *= 2.0
+    for _ in range(200):
+        mezzo = (basso + alto) / 2.0
+        if cdf_t(mezzo, gradi) < p:
+            basso = mezzo
+        else:
+            alto = mezzo
+        if alto - basso < 1e-12 * alto:
+            break
+    return (basso + alto) / 2.0
+
+def intervallo_t(campioni, confidenza=0.95):
+    #semiampiezza dell'intervallo di confidenza della media (t di Student, n-1 gradi di libertà)
+    n = len(campioni)
+    if n < 2:
+        return math.nan
+    t = quantile_t(0.5 + confidenza / 2.0, n - 1)
+    return t * statistics.stdev(campioni) / math.sqrt(n)
+
+
+def limiti_tukey(campioni, k=1.5):
+    #recinti di Tukey: fuori da [Q1 - k*IQR, Q3 + k*IQR] un campione è un outlier
+    if len(campioni) < 4:
+        return -math.inf, math.inf
+    q1, _, q3 = statistics.quantiles(campioni, n=4)
+    return q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+
+def outlier(campioni, k=1.5):
+    basso, alto = limiti_tukey(campioni, k)
+    return [x for x in campioni if x < basso or x > alto]
+
+
+def riassunto(campioni, confidenza=0.95):
+    #statistiche di una serie di tempi (ms) con le chiavi usate nei report
+    ist = Istogramma()
+    for x in campioni:
+        ist.aggiungi(x)
+    return {
+        "N": len(campioni),
+        "Media(ms)": ist.media(),
+        "CI95(ms)": intervallo_t(campioni, confidenza),
+        "p50(ms)": ist.percentile(50),
+        "p90(ms)": ist.percentile(90),
+        "p99(ms)": ist.percentile(99),
+        "Max(ms)": ist.massimo if ist.n else math.nan,
+        "Outlier": len(outlier(campioni)),
+    }
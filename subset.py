@@ -1,7 +1,12 @@
+import argparse
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from typing import Tuple
 
+import colonnare
+import compressione
+
 
 #la percentuale viene applicata solo alle persone, tutto il resto viene “portato dietro” in modo coerente
 
@@ -11,9 +16,14 @@ OUTPUT_ROOT = Path(".")  #dove creare subset_25/, subset_50/, subset_75/
 RANDOM_SEED = 42
 PERCENTS    = [0.25, 0.50, 0.75] #percentuali 
 MODE        = "any"         
+COMPRESSIONE = None         #None | "gz" | "zst" per i subset scritti
+FORMATO     = "auto"        #auto: legge i .parquet se ci sono tutti, altrimenti i CSV
+PARQUET     = False         #True per scrivere i subset anche in Parquet
+ID_INTERI   = False         #True: ID come interi (p123 -> 123), il prefisso torna solo nei CSV scritti
 
 #lettura dei csv 
 def read_csv_safe(path: Path) -> pd.DataFrame: #Definisce una funzione che prende in input un percorso di file (Path) e restituisce un DataFrame pandas
+    path = compressione.trova_file(path) #accetta anche persone.csv.gz / persone.csv.zst (pandas decomprime in streaming)
     try:
         return pd.read_csv(path, encoding="utf-8", dtype=str, keep_default_na=False) #se la lettura da errore riprova con un altrof ormato 
     except UnicodeDecodeError:
@@ -21,7 +31,10 @@ def read_csv_safe(path: Path) -> pd.DataFrame: #Definisce una funzione che prend
 
 def write_csv(df: pd.DataFrame, path: Path): #Definisce una funzione che salva un dataframe in CSV, creando prima le cartelle se mancano
     path.parent.mkdir(parents=True, exist_ok=True) #crea la cartella corrispondente a quel Path. se le cartelle superiori non esistono, le crea tutte
-    df.to_csv(path, index=False, encoding="utf-8") #non salva l'indice come colonna 
+    if colonnare.ha_id_interi(df):
+        df = colonnare.id_testo(df) #confine di esportazione: 123 -> "p123"
+    df.to_csv(compressione.con_estensione(path, COMPRESSIONE), index=False, encoding="utf-8", #non salva l'indice come colonna
+              compression=compressione.opzioni_pandas(COMPRESSIONE)) #.gz/.zst compressi in streaming da pandas
 
 #Normalizzazione
 def norm_series(s: pd.Series) -> pd.Series:
@@ -48,7 +61,24 @@ def normalize_all(dfp, dfd, dfb, dff, dft):
     return dfp, dfd, dfb, dff, dft
 
 #caricamento 
-def load_all(input_dir: Path):
+def usa_parquet(input_dir: Path, formato: str) -> bool:
+    return formato == "parquet" or (formato == "auto" and colonnare.tutte_presenti(input_dir))
+
+def load_all(input_dir: Path, formato: str = "auto"):
+    dfs = leggi_tabelle(input_dir, formato)
+    #ID interi: i filtri diventano operazioni su array numpy di interi invece che su set di stringhe
+    if ID_INTERI:
+        return tuple(colonnare.id_interi(df) for df in dfs)
+    return tuple(colonnare.id_testo(df) if colonnare.ha_id_interi(df) else df for df in dfs)
+
+def leggi_tabelle(input_dir: Path, formato: str):
+    if usa_parquet(input_dir, formato):
+        #Parquet tipizzato: se gli ID sono già normalizzati (scritti da genera.py) salta norm_series
+        letti = [colonnare.leggi_df(input_dir, t) for t in colonnare.TABELLE]
+        dfs = [df for df, _ in letti]
+        if all(norm for _, norm in letti):
+            return tuple(dfs)
+        return normalize_all(*dfs)
     df_persone     = read_csv_safe(input_dir / "persone.csv")
     df_documenti   = read_csv_safe(input_dir / "documenti.csv")
     df_banche      = read_csv_safe(input_dir / "banche.csv")
@@ -56,101 +86,121 @@ def load_all(input_dir: Path):
     df_transazioni = read_csv_safe(input_dir / "transazioni.csv")
     return normalize_all(df_persone, df_documenti, df_banche, df_fonti, df_transazioni)
 
-#filtro transazioni. filtra il DataFrame delle transazioni in base a un insieme di persone (people_ids) e a una modalità
-def transazioni_subset(df_t: pd.DataFrame, people_ids: set, mode: str) -> pd.DataFrame:
-    if mode == "any": #più completo, include tutte le transazioni in cui almeno una delle due persone (mittente o destinatario) è nel subset.
-        mask = df_t["matricola"].isin(people_ids) | df_t["destinatario"].isin(people_ids) #mittente OPPURE destinatario è in people_ids
-    elif mode == "both":
-        mask = df_t["matricola"].isin(people_ids) & df_t["destinatario"].isin(people_ids) #sia mittente sia destinatario sono in people_ids. riduce num trans
-    elif mode == "dest":
-        mask = df_t["destinatario"].isin(people_ids) #solo il destinatario è in people_ids
-    elif mode == "src":
-        mask = df_t["matricola"].isin(people_ids) #solo il mittente è in people_ids
-    else:
-        raise ValueError("MODE deve essere: any | both | dest | src")
-    return df_t[mask].copy() #restituisce un nuovo DataFrame
-
-#riorganizza colonne
-def reorder_like(df_sub: pd.DataFrame, df_full: pd.DataFrame) -> pd.DataFrame: #restituisce df nuovo riordinato prendendo in ingresso quello minore e quello più grande 
-    cols = [c for c in df_full.columns if c in df_sub.columns] #contiene le colonne di df_full che sono anche presenti in df_sub, rispettando l’ordine di df_full.
-    extra = [c for c in df_sub.columns if c not in cols] #contiene invece le colonne di df_sub che non sono state trovate in df_full, quindi quelle “in più” rispetto a df_full
-    return df_sub[cols + extra] #Se una colonna è in entrambi, viene messa nell’ordine di df_full
+#insiemi di ID: array numpy ordinato se gli ID sono interi, set di stringhe altrimenti
+def insieme(valori):
+    valori = np.asarray(valori)
+    if valori.dtype.kind in "iu":
+        return np.unique(valori[valori >= 0]) #-1 = ID mancante
+    return {x for x in valori if isinstance(x, str) and x != ""}
+
+def unione(a, b):
+    return np.union1d(a, b) if isinstance(a, np.ndarray) else a | b
 
+def appartiene(s: pd.Series, ids) -> pd.Series:
+    if isinstance(ids, np.ndarray):
+        return pd.Series(np.isin(s.to_numpy(), ids), index=s.index)
+    return s.isin(ids)
 
 def build_orders(dfp: pd.DataFrame, dfb: pd.DataFrame, dff: pd.DataFrame, dft: pd.DataFrame):
-    people_order = dfp["matricola:ID"].tolist() #prende la colonna matricola:ID dal DataFrame delle persone (dfp).
-#risulta in una pd.Series con tutti gli ID delle persone, nell’ordine in cui compaiono nel CSV.
-#.tolist() converte quella Series in una lista Python.
-    used_banks_full = set(dfp["id_banca"]) #prende dal DataFrame delle persone (dfp) la colonna id_banca, cioè la banca associata a ciascuna persona. Risultato: una pd.Series.
+    people_order = dfp["matricola:ID"].to_numpy() #prende la colonna matricola:ID dal DataFrame delle persone (dfp).
+#risulta in un array con tutti gli ID delle persone, nell’ordine in cui compaiono nel CSV.
+    used_banks_full = insieme(dfp["id_banca"]) #prende dal DataFrame delle persone (dfp) la colonna id_banca, cioè la banca associata a ciascuna persona. Risultato: una pd.Series.
 #set(...) converte quella serie in un insieme Python (set).
     if "id_banca_deriva" in dft.columns:
          #allora aggiorna l’insieme delle banche usate (used_banks_full)
     #aggiungendo tutti i valori presenti in "id_banca_deriva"
     #MA solo se sono stringhe e non vuote ("")
-        used_banks_full |= {x for x in dft["id_banca_deriva"] if isinstance(x, str) and x != ""}
+        used_banks_full = unione(used_banks_full, insieme(dft["id_banca_deriva"]))
         #Seleziona dal DataFrame delle banche (dfb) solo quelle NON presenti in used_banks_full
 #cioè le banche che non risultano usate né da persone né da transazioni.
 
-    dfb_orphans_full = dfb[~dfb["id_banca:ID"].isin(used_banks_full)]
-    #converte la colonna "id_banca:ID" delle banche orfane in una lista Python
-    orphan_banks_order = dfb_orphans_full["id_banca:ID"].tolist()
+    dfb_orphans_full = dfb[~appartiene(dfb["id_banca:ID"], used_banks_full)]
+    #prende la colonna "id_banca:ID" delle banche orfane, nell'ordine del file
+    orphan_banks_order = dfb_orphans_full["id_banca:ID"].to_numpy()
     #Crea un insieme con tutte le fonti (id_fonte) usate dalle persone
-    used_sources_full = set(dfp["id_fonte"])
+    used_sources_full = insieme(dfp["id_fonte"])
     #Seleziona dal DataFrame delle fonti (dff) solo quelle NON usate da nessuna persona
-    dff_orphans_full = dff[~dff["id_fonte:ID"].isin(used_sources_full)]
-    #Converte la colonna "id_fonte:ID" delle fonti orfane in una lista Python
-    orphan_sources_order = dff_orphans_full["id_fonte:ID"].tolist()
+    dff_orphans_full = dff[~appartiene(dff["id_fonte:ID"], used_sources_full)]
+    #prende la colonna "id_fonte:ID" delle fonti orfane, nell'ordine del file
+    orphan_sources_order = dff_orphans_full["id_fonte:ID"].to_numpy()
     return people_order, orphan_banks_order, orphan_sources_order
 
-#creazione subset
-def make_subset(
+#creazione subset in un solo passaggio: per ogni riga di ogni tabella si calcola il "rango",
+#cioè l'indice della prima frazione (in ordine crescente) in cui la riga compare; len(fractions) = in nessuna.
+#Le persone sono un prefisso di people_order, quindi i subset sono annidati e subset_XX = righe con rango <= j
+def rango_posizioni(n: int, fractions) -> np.ndarray:
+    #posizione i in un ordine di n elementi -> prima frazione f con round(n*f) > i
+    ks = np.array([int(round(n * f)) for f in fractions])
+    return np.searchsorted(ks, np.arange(n), side="right")
+
+def rango_di(chiavi, ids, ranghi: np.ndarray, assente: int) -> np.ndarray:
+    #rango della riga a cui punta ogni chiave (assente se la chiave non esiste tra gli ids)
+    if len(ids) == 0: #es. nessuna banca/fonte orfana
+        return np.full(len(chiavi), assente)
+    pos = pd.Index(np.asarray(ids)).get_indexer(np.asarray(chiavi))
+    return np.where(pos >= 0, ranghi[np.maximum(pos, 0)], assente)
+
+def rango_minimo(chiavi, ranghi: np.ndarray):
+    #per ogni chiave distinta il rango minimo delle righe che la usano: (chiavi, ranghi)
+    m = pd.Series(ranghi).groupby(np.asarray(chiavi), sort=False).min()
+    return m.index.to_numpy(), m.to_numpy()
+
+def rango_transazioni(r_mitt: np.ndarray, r_dest: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "any": #più completo, include tutte le transazioni in cui almeno una delle due persone (mittente o destinatario) è nel subset.
+        return np.minimum(r_mitt, r_dest)
+    if mode == "both": #sia mittente sia destinatario nel subset. riduce num trans
+        return np.maximum(r_mitt, r_dest)
+    if mode == "dest": #solo il destinatario
+        return r_dest
+    if mode == "src": #solo il mittente
+        return r_mitt
+    raise ValueError("MODE deve essere: any | both | dest | src")
+
+def rango_anagrafica(df: pd.DataFrame, col_id: str, usati, orphan_order, fractions) -> Tuple[pd.DataFrame, np.ndarray]:
+    #banche/fonti: rango minimo tra chi le usa, le orfane entrano come prefisso del loro ordine.
+    #Le usate vengono prima delle orfane, come nei subset costruiti con concat
+    assente = len(fractions)
+    orfane = appartiene(df[col_id], insieme(orphan_order)).to_numpy()
+    df = pd.concat([df[~orfane], df[orfane]], ignore_index=True)
+    ranghi = rango_di(df[col_id], usati[0], usati[1], assente)
+    ranghi = np.minimum(ranghi, rango_di(df[col_id], orphan_order, rango_posizioni(len(orphan_order), fractions), assente))
+    return df, ranghi
+
+def build_ranks(
     dfp: pd.DataFrame, dfd: pd.DataFrame, dfb: pd.DataFrame, dff: pd.DataFrame, dft: pd.DataFrame,
-    fraction: float, mode: str,
-    people_order, orphan_banks_order, orphan_sources_order
-) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    #PERSONE
-    k_people = int(round(len(dfp) * fraction)) #calcola quante persone mettere nel subset in base alla frazione richiesta.
-    people_ids = set(people_order[:k_people]) #lo converte in un set 
-    dfp_sub = dfp[dfp["matricola:ID"].isin(people_ids)].copy() #copia gli id delle persone nel subset 
-
-    #DOCUMENTI delle persone
-    dfd_sub = dfd[dfd["matricola"].isin(people_ids)].copy() #copia i documenti associati alle matricole 
-
-    #TRANSAZIONI 
-    dft_sub = transazioni_subset(dft, people_ids, mode)
-
-    #BANCHE usate da persone/transazion
-    bank_ids_people = set(dfp_sub["id_banca"]) #crea set con id delle banche 
-    bank_ids_tx = set(dft_sub["id_banca_deriva"]) if "id_banca_deriva" in dft_sub.columns else set()
-    bank_ids_all = bank_ids_people | {x for x in bank_ids_tx if isinstance(x, str) and x != ""} #bank_ids_all contiene gli ID banca da persone + da transazioni
-    dfb_sub = dfb[dfb["id_banca:ID"].isin(bank_ids_all)].copy() 
-
-    #+ ORfANE
-    k_banks = int(round(len(orphan_banks_order) * fraction)) #numero di banche orfane 
-    if k_banks > 0:
-        orphan_bank_ids = set(orphan_banks_order[:k_banks]) #crea set di banche orfane in base alla frazione
-        dfb_sub = (pd.concat([dfb_sub, dfb[dfb["id_banca:ID"].isin(orphan_bank_ids)]], ignore_index=True)
-                     .drop_duplicates(subset=["id_banca:ID"], keep="first")) #Aggiunge le banche orfane a dfb_sub e poi rimuove eventuali duplicati sull’ID banca
-
-    #FONTI referenziate dalle persone
-    fonte_ids = set(dfp_sub["id_fonte"])
-    dff_sub = dff[dff["id_fonte:ID"].isin(fonte_ids)].copy()
-
-    # + ORFANE
-    k_sources = int(round(len(orphan_sources_order) * fraction)) #numero di fonti del subset  
-    if k_sources > 0:
-        orphan_source_ids = set(orphan_sources_order[:k_sources])
-        dff_sub = (pd.concat([dff_sub, dff[dff["id_fonte:ID"].isin(orphan_source_ids)]], ignore_index=True)
-                     .drop_duplicates(subset=["id_fonte:ID"], keep="first"))
-
-    #riordino colonne come negli originali
-    dfp_sub  = reorder_like(dfp_sub, dfp)
-    dfd_sub  = reorder_like(dfd_sub, dfd)
-    dfb_sub  = reorder_like(dfb_sub, dfb)
-    dff_sub  = reorder_like(dff_sub, dff)
-    dft_sub  = reorder_like(dft_sub, dft)
-
-    return dfp_sub, dfd_sub, dfb_sub, dff_sub, dft_sub
+    fractions, mode: str, people_order, orphan_banks_order, orphan_sources_order
+):
+    #restituisce le tabelle (banche/fonti riordinate: usate e poi orfane) e il rango di ogni riga
+    assente = len(fractions)
+    #PERSONE e DOCUMENTI
+    r_persone = rango_di(dfp["matricola:ID"], people_order, rango_posizioni(len(people_order), fractions), assente)
+    r_documenti = rango_di(dfd["matricola"], dfp["matricola:ID"], r_persone, assente)
+    #TRANSAZIONI
+    r_transazioni = rango_transazioni(rango_di(dft["matricola"], dfp["matricola:ID"], r_persone, assente),
+                                      rango_di(dft["destinatario"], dfp["matricola:ID"], r_persone, assente), mode)
+    #BANCHE usate da persone/transazioni (+ orfane)
+    chiavi, ranghi = [dfp["id_banca"].to_numpy()], [r_persone]
+    if "id_banca_deriva" in dft.columns:
+        chiavi.append(dft["id_banca_deriva"].to_numpy())
+        ranghi.append(r_transazioni)
+    usate = rango_minimo(np.concatenate(chiavi), np.concatenate(ranghi))
+    dfb, r_banche = rango_anagrafica(dfb, "id_banca:ID", usate, orphan_banks_order, fractions)
+    #FONTI referenziate dalle persone (+ orfane)
+    usate = rango_minimo(dfp["id_fonte"].to_numpy(), r_persone)
+    dff, r_fonti = rango_anagrafica(dff, "id_fonte:ID", usate, orphan_sources_order, fractions)
+    return (dfp, dfd, dfb, dff, dft), (r_persone, r_documenti, r_banche, r_fonti, r_transazioni)
+
+def subset_at(tables, ranks, livello: int) -> Tuple[pd.DataFrame, ...]:
+    #subset della frazione di indice livello: semplice filtro sul rango
+    return tuple(df[r <= livello] for df, r in zip(tables, ranks))
+
+#delta tra livelli consecutivi: delta_25_50 contiene solo le righe che entrano nel 50%
+#(rango == livello). subset_25 + delta_25_50 + delta_50_75 + delta_75_100 = dataset completo,
+#così un database si fa crescere invece di reimportarlo:
+#  Neo4j: python carica_neo4j.py subset_25 --delta delta_25_50 delta_50_75 delta_75_100
+#  BaseX: python convertixml.py --input delta_25_50 --output delta_25_50.xml, poi ADD delta_25_50.xml sul database aperto
+def delta_at(tables, ranks, livello: int) -> Tuple[pd.DataFrame, ...]:
+    return tuple(df[r == livello] for df, r in zip(tables, ranks))
 
 
 #Salvataggio
@@ -161,28 +211,59 @@ def save_subset(out_dir: Path, dfs: Tuple[pd.DataFrame, ...]):
     write_csv(dfb, out_dir / "banche.csv")
     write_csv(dff, out_dir / "fonti.csv")
     write_csv(dft, out_dir / "transazioni.csv")
+    if PARQUET: #stesse colonne, già normalizzate: verify_subset li legge senza riparsare
+        for nome, df in zip(colonnare.TABELLE, dfs):
+            colonnare.scrivi_df(df, colonnare.percorso(out_dir, nome))
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Crea i subset annidati (default subset_25/50/75) a partire dai CSV completi.")
+    p.add_argument("--compress", choices=sorted(compressione.ESTENSIONI),
+                   help="Scrive i CSV dei subset compressi (.csv.gz / .csv.zst).")
+    p.add_argument("--formato", choices=["auto", "csv", "parquet"], default=FORMATO,
+                   help="Formato di input: auto usa i .parquet se presenti per tutte le tabelle.")
+    p.add_argument("--parquet", action="store_true", help="Scrive i subset anche in Parquet.")
+    p.add_argument("--int-ids", action="store_true",
+                   help="Lavora con ID interi (p123 -> 123): filtri su array numpy; i CSV scritti hanno gli ID testuali, "
+                        "i Parquet gli ID interi.")
+    p.add_argument("--percents", type=float, nargs="+", metavar="F",
+                   help="Frazioni dei subset (default 0.25 0.5 0.75); il costo quasi non dipende da quante sono, "
+                        "es. --percents $(seq 0.05 0.05 0.95).")
+    p.add_argument("--delta", action="store_true",
+                   help="Scrive anche delta_A_B/ con le sole righe aggiunte tra livelli consecutivi (fino al 100%%).")
+    return p.parse_args()
 
 #Main
 def main():
-    dfp, dfd, dfb, dff, dft = load_all(INPUT_DIR)
+    global COMPRESSIONE, PARQUET, ID_INTERI
+    args = parse_args()
+    COMPRESSIONE = args.compress or COMPRESSIONE
+    PARQUET = args.parquet or PARQUET
+    ID_INTERI = args.int_ids or ID_INTERI
+    dfp, dfd, dfb, dff, dft = load_all(INPUT_DIR, args.formato)
     people_order, orphan_banks_order, orphan_sources_order = build_orders(dfp, dfb, dff, dft)
+    fractions = sorted(args.percents or PERCENTS)
+    tables, ranks = build_ranks(dfp, dfd, dfb, dff, dft, fractions, MODE,
+                                people_order, orphan_banks_order, orphan_sources_order)
 
-    for frac in PERCENTS:
-        name = f"{int(frac*100)}"
+    for livello, frac in enumerate(fractions):
+        name = f"{frac*100:g}"
         out_dir = OUTPUT_ROOT / f"subset_{name}"
-
-        dfs = make_subset(
-            dfp, dfd, dfb, dff, dft,
-            fraction=frac, mode=MODE,
-            people_order=people_order,
-            orphan_banks_order=orphan_banks_order,
-            orphan_sources_order=orphan_sources_order
-        )
-
-       
+        dfs = subset_at(tables, ranks, livello)
         save_subset(out_dir, dfs)
         print(f"Subset {name}% salvato in {out_dir}")
         print(f"  persone: {len(dfs[0])}  documenti: {len(dfs[1])}  banche: {len(dfs[2])}  fonti: {len(dfs[3])}  transazioni: {len(dfs[4])}")
 
+    if args.delta:
+        #un delta per ogni coppia di livelli consecutivi, l'ultimo arriva al dataset completo (100)
+        names = [f"{frac*100:g}" for frac in fractions] + ["100"]
+        for livello in range(1, len(names)):
+            if names[livello] == names[livello - 1]:
+                continue #--percents ... 1.0: il completo coincide con l'ultimo subset
+            out_dir = OUTPUT_ROOT / f"delta_{names[livello - 1]}_{names[livello]}"
+            dfs = delta_at(tables, ranks, livello)
+            save_subset(out_dir, dfs)
+            print(f"Delta {names[livello - 1]}% -> {names[livello]}% salvato in {out_dir}")
+            print(f"  persone: {len(dfs[0])}  documenti: {len(dfs[1])}  banche: {len(dfs[2])}  fonti: {len(dfs[3])}  transazioni: {len(dfs[4])}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import re
+import sys
+import csv
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Set
+
+import compressione
+
+
+#tipi accettati da neo4j-admin database import (anche come array, es. int[])
+TIPI = {"int", "long", "float", "double", "boolean", "byte", "short", "char", "string",
+        "date", "localtime", "time", "localdatetime", "datetime", "duration", "point"}
+CAMPI_SPECIALI = {"ID", "START_ID", "END_ID", "LABEL", "TYPE", "IGNORE"}
+
+#nome:TIPO(gruppo) -> ("nome", "TIPO", "gruppo")
+CAMPO = re.compile(r"^(?P<nome>[^:]*)(?::(?P<tipo>[A-Za-z_]+(?:\[\])?)(?:\((?P<gruppo>[^)]*)\))?)?$")
+
+#controlli sui valori dei campi tipizzati
+def valido_int(v: str) -> bool:
+    try:
+        int(v)
+        return True
+    except ValueError:
+        return False
+
+def valido_float(v: str) -> bool:
+    try:
+        float(v)
+        return True
+    except ValueError:
+        return False
+
+def valido_date(v: str) -> bool:
+    try:
+        date.fromisoformat(v)
+        return True
+    except ValueError:
+        return False
+
+CONTROLLI = {"int": valido_int, "long": valido_int, "short": valido_int, "byte": valido_int,
+             "float": valido_float, "double": valido_float, "date": valido_date,
+             "boolean": lambda v: v.lower() in ("true", "false")}
+
+
+def parse_header(header: List[str], label: str) -> List[tuple]:
+    campi = []
+    for h in header:
+        m = CAMPO.match(h)
+        if not m:
+            raise AssertionError(f"[{label}] campo header non valido: {h!r}")
+        nome, tipo, gruppo = m.group("nome"), m.group("tipo"), m.group("gruppo")
+        if tipo and tipo not in CAMPI_SPECIALI and tipo.lower().rstrip("[]") not in TIPI:
+            raise AssertionError(f"[{label}] tipo sconosciuto nel campo {h!r}")
+        if gruppo is not None and tipo not in ("ID", "START_ID", "END_ID"):
+            raise AssertionError(f"[{label}] gruppo di ID ammesso solo su ID/START_ID/END_ID: {h!r}")
+        campi.append((nome, tipo, gruppo))
+    return campi
+
+def speciali(campi: List[tuple], tipo: str) -> List[int]:
+    return [i for i, (_, t, _) in enumerate(campi) if t == tipo]
+
+def leggi(path: Path):
+    with compressione.apri_csv(path) as f:
+        r = csv.reader(f)
+        header = next(r, None)
+        if header is None:
+            raise AssertionError(f"[{path.name}] file vuoto, manca l'header")
+        yield header
+        yield from r
+
+
+def controlla_valori(campi: List[tuple], riga: List[str], label: str, n: int):
+    if len(riga) != len(campi):
+        raise AssertionError(f"[{label}] riga {n}: {len(riga)} colonne invece di {len(campi)}")
+    for (nome, tipo, _), v in zip(campi, riga):
+        controllo = CONTROLLI.get((tipo or "").lower())
+        if v != "" and controllo and not controllo(v):
+            raise AssertionError(f"[{label}] riga {n}: valore {v!r} non valido per {nome}:{tipo}")
+
+def verifica_nodi(path: Path, campi: List[tuple], id_per_gruppo: Dict[str, Set[str]]) -> int:
+    label = path.name
+    pos_id = speciali(campi, "ID")
+    if len(pos_id) != 1:
+        raise AssertionError(f"[{label}] serve esattamente un campo :ID, trovati {len(pos_id)}")
+    if not speciali(campi, "LABEL"):
+        raise AssertionError(f"[{label}] manca la colonna :LABEL")
+    i_id = pos_id[0]
+    gruppo = campi[i_id][2] or ""
+    ids = id_per_gruppo.setdefault(gruppo, set())
+    righe = leggi(path)
+    next(righe)
+    n = 0
+    for n, riga in enumerate(righe, start=1):
+        controlla_valori(campi, riga, label, n)
+        nid = riga[i_id]
+        if not nid:
+            raise AssertionError(f"[{label}] riga {n}: ID vuoto")
+        if nid in ids:
+            raise AssertionError(f"[{label}] riga {n}: ID duplicato nel gruppo '{gruppo}': {nid}")
+        ids.add(nid)
+    return n
+
+def verifica_relazioni(path: Path, campi: List[tuple], id_per_gruppo: Dict[str, Set[str]]) -> int:
+    label = path.name
+    pos_start, pos_end, pos_type = speciali(campi, "START_ID"), speciali(campi, "END_ID"), speciali(campi, "TYPE")
+    if len(pos_start) != 1 or len(pos_end) != 1:
+        raise AssertionError(f"[{label}] servono esattamente un :START_ID e un :END_ID")
+    if len(pos_type) != 1:
+        raise AssertionError(f"[{label}] manca la colonna :TYPE")
+    estremi = []
+    for i in (pos_start[0], pos_end[0]):
+        gruppo = campi[i][2] or ""
+        if gruppo not in id_per_gruppo:
+            raise AssertionError(f"[{label}] gruppo di ID '{gruppo}' non definito da nessun file nodi")
+        estremi.append((i, gruppo, id_per_gruppo[gruppo]))
+    righe = leggi(path)
+    next(righe)
+    n = 0
+    for n, riga in enumerate(righe, start=1):
+        controlla_valori(campi, riga, label, n)
+        if not riga[pos_type[0]]:
+            raise AssertionError(f"[{label}] riga {n}: :TYPE vuoto")
+        for i, gruppo, ids in estremi:
+            if riga[i] not in ids:
+                raise AssertionError(f"[{label}] riga {n}: {campi[i][1]} '{riga[i]}' non esiste nel gruppo '{gruppo}'")
+    return n
+
+
+def verify_import(import_dir: Path) -> None:
+    files = sorted(p for p in import_dir.glob("*.csv*") if compressione.compressione_di(p) or p.suffix == ".csv")
+    if not files:
+        raise FileNotFoundError(f"Nessun CSV nella cartella '{import_dir}'")
+
+    #prima tutti i nodi (per raccogliere gli ID), poi le relazioni
+    nodi, relazioni = [], []
+    for path in files:
+        campi = parse_header(next(leggi(path)), path.name)
+        if speciali(campi, "ID"):
+            nodi.append((path, campi))
+        elif speciali(campi, "START_ID") or speciali(campi, "END_ID"):
+            relazioni.append((path, campi))
+        else:
+            raise AssertionError(f"[{path.name}] né file nodi (:ID) né file relazioni (:START_ID/:END_ID)")
+
+    print(f"Cartella import: {import_dir}")
+    print("---- Nodi ----")
+    id_per_gruppo: Dict[str, Set[str]] = {}
+    for path, campi in nodi:
+        print(f"{path.name:<22} {verifica_nodi(path, campi, id_per_gruppo):>10}")
+    print("---- Relazioni ----")
+    for path, campi in relazioni:
+        print(f"{path.name:<22} {verifica_relazioni(path, campi, id_per_gruppo):>10}")
+    print("-------------------")
+    print("header e ID coerenti: pronti per neo4j-admin database import.")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Verifica offline che i CSV di una cartella siano pronti per neo4j-admin database import "
+                    "(header tipizzati, ID unici, relazioni che puntano a nodi esistenti)."
+    )
+    p.add_argument("import_dir", type=Path, help="Cartella con i file nodi/relazioni (es. quella di genera.py --bulk-import)")
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    try:
+        verify_import(args.import_dir)
+        return 0
+    except AssertionError as e:
+        print(f" Errore: {e}")
+        return 2
+    except FileNotFoundError as e:
+        print(f"File mancante: {e}")
+        return 3
+    except Exception as e:
+        print(f"Errore inatteso: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
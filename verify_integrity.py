@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+import colonnare
+import verify_subset as vs
+
+
+#controllo di integrità di un dataset (completo o subset): chiavi esterne, risultato atteso della
+#Query 4 e pattern sospetti iniettati da genera.py. Gli ID si caricano come interi (p123 -> 123)
+#e ogni join è un'operazione su array numpy; con i .parquet scritti da genera.py --parquet --int-ids
+#non c'è nemmeno da riparsare il testo.
+
+#colonne lette per tabella (proiezione)
+COLUMNS: Dict[str, List[str]] = {
+    "persone":     ["matricola:ID", "id_banca", "id_documento", "id_fonte"],
+    "documenti":   ["id_documento:ID", "matricola"],
+    "banche":      ["id_banca:ID", "max_deposito:INT"],
+    "fonti":       ["id_fonte:ID"],
+    "transazioni": ["id_transazione:ID", "matricola", "importo:INT", "destinatario", "data:DATE", "id_banca_deriva"],
+}
+
+#(tabella, colonna) -> (tabella riferita, chiave)
+FOREIGN_KEYS = [
+    ("persone", "id_banca", "banche", "id_banca:ID"),
+    ("persone", "id_fonte", "fonti", "id_fonte:ID"),
+    ("persone", "id_documento", "documenti", "id_documento:ID"),
+    ("documenti", "matricola", "persone", "matricola:ID"),
+    ("transazioni", "matricola", "persone", "matricola:ID"),
+    ("transazioni", "destinatario", "persone", "matricola:ID"),
+    ("transazioni", "id_banca_deriva", "banche", "id_banca:ID"),
+]
+
+#righe consecutive con mittente p1, p2, ... che riconoscono l'inizio delle transazioni normali
+RUN_NORMALI = 1000
+
+
+def load_dataset(dirpath: Path, fmt: str) -> Dict[str, pd.DataFrame]:
+    vs.require_files(dirpath)
+    dfs = {t: vs.load_table(dirpath, t, COLUMNS[t], fmt, int_ids=True) for t in vs.TABLES}
+    dfs["banche"]["max_deposito:INT"] = pd.to_numeric(dfs["banche"]["max_deposito:INT"]).astype(np.int64)
+    dfs["transazioni"]["importo:INT"] = pd.to_numeric(dfs["transazioni"]["importo:INT"]).astype(np.int64)
+    dfs["transazioni"]["data:DATE"] = pd.to_datetime(dfs["transazioni"]["data:DATE"])
+    return dfs
+
+def lookup(keys: np.ndarray, values: np.ndarray, wanted: np.ndarray):
+    #join su array ordinato: posizione di ogni wanted tra le keys (e maschera dei trovati)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    pos = np.minimum(np.searchsorted(sorted_keys, wanted), max(len(keys) - 1, 0))
+    found = (sorted_keys[pos] == wanted) if len(keys) else np.zeros(len(wanted), dtype=bool)
+    return values[order][pos], found
+
+
+#in un subset (modalità any) una transazione può puntare a una persona rimasta fuori
+#e un pattern può avere solo parte dei mittenti: con --subset non sono violazioni
+TOLLERATE_IN_SUBSET = {("transazioni", "matricola"), ("transazioni", "destinatario")}
+
+def check_foreign_keys(dfs: Dict[str, pd.DataFrame], subset: bool = False) -> int:
+    print("---- Chiavi esterne ----")
+    print(f"{'riferimento':<42} {'righe':>10} {'vuote':>8} {'orfane':>8} {'s':>6}")
+    violations = 0
+    for table, col, ref_table, ref_col in FOREIGN_KEYS:
+        start = time.perf_counter()
+        values = dfs[table][col].to_numpy()
+        keys = dfs[ref_table][ref_col].to_numpy()
+        empty = values < 0
+        orphans = ~empty & ~np.isin(values, keys)
+        n_empty, n_orphans = int(empty.sum()), int(orphans.sum())
+        label = f"{table}.{col} -> {ref_table}"
+        print(f"{label:<42} {len(values):>10} {n_empty:>8} {n_orphans:>8} {time.perf_counter() - start:6.2f}")
+        if n_orphans:
+            print(f"  esempio orfana: {colonnare.prefisso(col)}{dfs[table][col].iloc[int(np.argmax(orphans))]}")
+        if not (subset and (table, col) in TOLLERATE_IN_SUBSET):
+            violations += n_empty + n_orphans
+    return violations
+
+def query4_expected(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    #Query 4: somma giornaliera ricevuta da ogni destinatario oltre il max_deposito della sua banca
+    dft, dfp, dfb = dfs["transazioni"], dfs["persone"], dfs["banche"]
+    dest = dft["destinatario"].to_numpy()
+    day = dft["data:DATE"].to_numpy().astype("datetime64[D]").astype(np.int64) #giorni dal 1970
+    #chiave unica (destinatario, giorno) in un int64: il raggruppamento è un np.unique + bincount
+    span = int(day.max() - day.min() + 1) if len(day) else 1
+    key = dest * span + (day - (day.min() if len(day) else 0))
+    groups, inverse = np.unique(key, return_inverse=True)
+    total = np.bincount(inverse, weights=dft["importo:INT"].to_numpy()).astype(np.int64)
+    g_dest, g_day = groups // span, groups % span + (day.min() if len(day) else 0)
+    bank, has_person = lookup(dfp["matricola:ID"].to_numpy(), dfp["id_banca"].to_numpy(), g_dest)
+    limit, has_bank = lookup(dfb["id_banca:ID"].to_numpy(), dfb["max_deposito:INT"].to_numpy(), bank)
+    hit = has_person & has_bank & (total > limit)
+    out = pd.DataFrame({
+        "matricola": g_dest[hit], "giorno": g_day[hit].astype("datetime64[D]"),
+        "totale": total[hit], "max": limit[hit],
+    })
+    #stesso ordine della XQuery: totale decrescente, poi matricola e giorno
+    return out.sort_values(["totale", "matricola", "giorno"], ascending=[False, True, True], ignore_index=True)
+
+def injected_count(dft: pd.DataFrame) -> int:
+    #le sospette occupano t1..tS: le normali iniziano dove il mittente diventa p1, p2, p3, ...
+    tid = dft["id_transazione:ID"].to_numpy()
+    sender = dft["matricola"].to_numpy()[np.argsort(tid, kind="stable")]
+    for k in np.flatnonzero(sender == 1):
+        m = min(RUN_NORMALI, len(sender) - k)
+        if np.array_equal(sender[k:k + m], np.arange(1, m + 1)):
+            return int(np.sort(tid)[k]) - 1
+    return -1
+
+def check_patterns(dfs: Dict[str, pd.DataFrame], expected: pd.DataFrame, n_injected: int, subset: bool = False) -> int:
+    print("---- Pattern sospetti ----")
+    dft = dfs["transazioni"]
+    if n_injected < 0:
+        n_injected = injected_count(dft)
+        if n_injected < 0:
+            print("transazioni normali non riconosciute (subset?): usa --sospette N per indicare t1..tN")
+            return 0
+    injected = dft[dft["id_transazione:ID"].to_numpy() <= n_injected]
+    #un pattern = stesso destinatario e giorno, importi uguali da 2-4 mittenti
+    by_pattern = injected.groupby(["destinatario", "data:DATE"], sort=False).agg(
+        totale=("importo:INT", "sum"), mittenti=("matricola", "nunique")).reset_index()
+    bank, _ = lookup(dfs["persone"]["matricola:ID"].to_numpy(), dfs["persone"]["id_banca"].to_numpy(),
+                     by_pattern["destinatario"].to_numpy())
+    limit, has_bank = lookup(dfs["banche"]["id_banca:ID"].to_numpy(), dfs["banche"]["max_deposito:INT"].to_numpy(), bank)
+    exceed = has_bank & (by_pattern["totale"].to_numpy() > limit)
+    in_q4 = pd.MultiIndex.from_frame(by_pattern[["destinatario", "data:DATE"]]).isin(
+        pd.MultiIndex.from_arrays([expected["matricola"], expected["giorno"]]))
+    print(f"transazioni sospette (t1..t{n_injected}): {len(injected)}  pattern: {len(by_pattern)}")
+    print(f"oltre max_deposito: {int(exceed.sum())}/{len(by_pattern)}  nel risultato Query 4: {int(in_q4.sum())}/{len(by_pattern)}")
+    if len(by_pattern):
+        margin = by_pattern["totale"].to_numpy() - limit
+        print(f"margine sul massimale: min {int(margin.min())}  mediano {int(np.median(margin))}")
+    bad = by_pattern[~exceed]
+    if len(bad):
+        print(f"  esempio sotto soglia: p{bad.iloc[0]['destinatario']} {bad.iloc[0]['data:DATE']:%Y-%m-%d} totale {bad.iloc[0]['totale']}")
+    return 0 if subset else int((~exceed).sum())
+
+def audit(dirpath: Path, fmt: str = "auto", n_injected: int = -1, query4_out: Path = None, subset: bool = False) -> int:
+    start = time.perf_counter()
+    dfs = load_dataset(dirpath, fmt)
+    t_load = time.perf_counter() - start
+    print(f"Cartella: {dirpath}")
+    print("  ".join(f"{t}: {len(df)}" for t, df in dfs.items()) + f"  (lettura {t_load:.2f} s)")
+
+    violations = check_foreign_keys(dfs, subset)
+
+    print("---- Query 4 attesa ----")
+    start = time.perf_counter()
+    expected = query4_expected(dfs)
+    print(f"righe attese: {len(expected)}  ({time.perf_counter() - start:.2f} s)")
+    if query4_out:
+        out = expected.copy()
+        out["matricola"] = "p" + out["matricola"].astype(str)
+        out["giorno"] = out["giorno"].astype(str)
+        out.to_csv(query4_out, index=False)
+        print(f"salvata in {query4_out}")
+
+    start = time.perf_counter()
+    violations += check_patterns(dfs, expected, n_injected, subset)
+    print(f"({time.perf_counter() - start:.2f} s)")
+    print("-------------------------")
+    return violations
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Verifica chiavi esterne, risultato atteso della Query 4 e pattern sospetti di un dataset."
+    )
+    p.add_argument("data_dir", type=Path, nargs="?", default=Path("."), help="Cartella del dataset (default: corrente)")
+    p.add_argument("--format", dest="fmt", choices=["auto", "csv", "parquet"], default="auto",
+                   help="Formato della cartella: auto usa i .parquet se presenti per tutte le tabelle.")
+    p.add_argument("--sospette", type=int, default=-1, metavar="N",
+                   help="Transazioni sospette t1..tN (default: riconosciute dall'inizio delle transazioni normali).")
+    p.add_argument("--subset", action="store_true",
+                   help="La cartella è un subset: transazioni verso persone escluse e pattern incompleti sono attesi.")
+    p.add_argument("--query4-out", type=Path, metavar="CSV", help="Salva il risultato atteso della Query 4.")
+    return p.parse_args(argv)
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    try:
+        violations = audit(args.data_dir, args.fmt, args.sospette, args.query4_out, args.subset)
+        if violations:
+            print(f" Errore: {violations} violazioni")
+            return 2
+        print("integrità referenziale e pattern sospetti verificati.")
+        return 0
+    except FileNotFoundError as e:
+        print(f"File mancante: {e}")
+        return 3
+    except Exception as e:
+        print(f"Errore inatteso: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
+import os
 import sys
+import csv
+import time
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Tuple, List, Dict
+from typing import List, Dict
+import numpy as np
 import pandas as pd
 
+import colonnare
+import compressione
 
 TABLES = ["persone", "documenti", "banche", "fonti", "transazioni"]
 PK: Dict[str, List[str]] = {
@@ -16,14 +23,25 @@ PK: Dict[str, List[str]] = {
 }
 
 
-def read_csv_safe(path: Path) -> pd.DataFrame:
+#colonne lette quando si controllano solo le chiavi (proiezione)
+KEY_COLUMNS: Dict[str, List[str]] = {**PK, "transazioni": ["id_transazione:ID"]}
+
+#righe per blocco nel controllo righe a hash (--hash)
+CHUNK_ROWS = 200_000
+
+
+def read_csv_safe(path: Path, columns: List[str] = None) -> pd.DataFrame:
+    path = compressione.trova_file(path) #anche .csv.gz / .csv.zst
+    usecols = (lambda c: c in columns) if columns is not None else None
     try:
-        return pd.read_csv(path, encoding="utf-8", dtype=str, keep_default_na=False)
+        return pd.read_csv(path, encoding="utf-8", dtype=str, keep_default_na=False, usecols=usecols)
     except UnicodeDecodeError:
-        return pd.read_csv(path, encoding="cp1252", dtype=str, keep_default_na=False)
+        return pd.read_csv(path, encoding="cp1252", dtype=str, keep_default_na=False, usecols=usecols)
 
 def require_files(dirpath: Path):
-    missing = [t for t in TABLES if not (dirpath / f"{t}.csv").exists()]
+    if colonnare.tutte_presenti(dirpath):
+        return
+    missing = [t for t in TABLES if not compressione.esiste(dirpath / f"{t}.csv")]
     if missing:
         raise FileNotFoundError(f"Nella cartella '{dirpath}' mancano: {', '.join(missing)}")
 
@@ -31,32 +49,66 @@ def require_files(dirpath: Path):
 def norm_series(s: pd.Series) -> pd.Series:
     return s.astype(str).str.strip().str.lower()
 
+#colonne ID normalizzate per tabella
+NORM_COLUMNS: Dict[str, List[str]] = {
+    "persone":     ["matricola:ID", "id_banca", "id_documento", "id_fonte"],
+    "documenti":   ["id_documento:ID", "matricola"],
+    "banche":      ["id_banca:ID"],
+    "fonti":       ["id_fonte:ID"],
+    "transazioni": ["matricola", "destinatario", "id_banca_deriva"],
+}
+
+def normalize_table(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    for c in NORM_COLUMNS[table]:
+        if c in df:
+            df[c] = norm_series(df[c])
+    return df
+
 def normalize_all(dfp, dfd, dfb, dff, dft):
-    # Persone
-    if "matricola:ID" in dfp: dfp["matricola:ID"] = norm_series(dfp["matricola:ID"])
-    if "id_banca" in dfp:     dfp["id_banca"]     = norm_series(dfp["id_banca"])
-    if "id_documento" in dfp: dfp["id_documento"] = norm_series(dfp["id_documento"])
-    if "id_fonte" in dfp:     dfp["id_fonte"]     = norm_series(dfp["id_fonte"])
-    # Documenti
-    if "id_documento:ID" in dfd: dfd["id_documento:ID"] = norm_series(dfd["id_documento:ID"])
-    if "matricola" in dfd:       dfd["matricola"]       = norm_series(dfd["matricola"])
-    # Banche
-    if "id_banca:ID" in dfb:     dfb["id_banca:ID"]     = norm_series(dfb["id_banca:ID"])
-    # Fonti
-    if "id_fonte:ID" in dff:     dff["id_fonte:ID"]     = norm_series(dff["id_fonte:ID"])
-    # Transazioni
-    if "matricola" in dft:       dft["matricola"]       = norm_series(dft["matricola"])
-    if "destinatario" in dft:    dft["destinatario"]    = norm_series(dft["destinatario"])
-    if "id_banca_deriva" in dft: dft["id_banca_deriva"] = norm_series(dft["id_banca_deriva"])
-    return dfp, dfd, dfb, dff, dft
-
-def load_subset_dir(dirpath: Path):
-    dfp = read_csv_safe(dirpath / "persone.csv")
-    dfd = read_csv_safe(dirpath / "documenti.csv")
-    dfb = read_csv_safe(dirpath / "banche.csv")
-    dff = read_csv_safe(dirpath / "fonti.csv")
-    dft = read_csv_safe(dirpath / "transazioni.csv")
-    return normalize_all(dfp, dfd, dfb, dff, dft)
+    return tuple(normalize_table(t, df) for t, df in zip(TABLES, (dfp, dfd, dfb, dff, dft)))
+
+def load_subset_dir(dirpath: Path, keys_only: bool = False, fmt: str = "auto", int_ids: bool = False):
+    #int_ids: ID come interi (p123 -> 123), i confronti diventano operazioni su array numpy
+    dfs = read_subset_dir(dirpath, keys_only, fmt)
+    if int_ids:
+        return tuple(colonnare.id_interi(df) for df in dfs)
+    return tuple(colonnare.id_testo(df) if colonnare.ha_id_interi(df) else df for df in dfs)
+
+def read_subset_dir(dirpath: Path, keys_only: bool = False, fmt: str = "auto"):
+    #keys_only: legge solo le colonne chiave (proiezione), basta per --skip-rows
+    columns = {t: (KEY_COLUMNS[t] if keys_only else None) for t in TABLES}
+    if fmt == "parquet" or (fmt == "auto" and colonnare.tutte_presenti(dirpath)):
+        loaded = [colonnare.leggi_df(dirpath, t, columns[t]) for t in TABLES]
+        dfs = [df for df, _ in loaded]
+        if all(norm for _, norm in loaded): #ID già normalizzati da chi ha scritto il file
+            return tuple(dfs)
+        return normalize_all(*dfs)
+    dfs = [read_csv_safe(dirpath / f"{t}.csv", columns[t]) for t in TABLES]
+    return normalize_all(*dfs)
+
+def load_table(dirpath: Path, table: str, columns: List[str] = None, fmt: str = "auto", int_ids: bool = False) -> pd.DataFrame:
+    #una sola tabella di una cartella, con le stesse regole di load_subset_dir
+    if use_parquet(dirpath, fmt):
+        df, normalized = colonnare.leggi_df(dirpath, table, columns)
+        if not normalized:
+            df = normalize_table(table, df)
+    else:
+        df = normalize_table(table, read_csv_safe(dirpath / f"{table}.csv", columns))
+    if int_ids:
+        return colonnare.id_interi(df)
+    return colonnare.id_testo(df) if colonnare.ha_id_interi(df) else df
+
+def align_dtypes(a: pd.DataFrame, b: pd.DataFrame, cols: List[str]):
+    #CSV (tutto stringa) contro Parquet (tipizzato): le colonne con tipi diversi si confrontano come testo
+    for c in cols:
+        if pd.api.types.is_integer_dtype(a[c]) and pd.api.types.is_integer_dtype(b[c]):
+            if a[c].dtype != b[c].dtype: #int32 contro int64
+                a[c] = a[c].astype(np.int64)
+                b[c] = b[c].astype(np.int64)
+        elif a[c].dtype != b[c].dtype:
+            a[c] = a[c].astype(str)
+            b[c] = b[c].astype(str)
+    return a, b
 
 
 def assert_keys_subset(df_small: pd.DataFrame, df_big: pd.DataFrame, keycols: List[str], label: str):
@@ -64,6 +116,13 @@ def assert_keys_subset(df_small: pd.DataFrame, df_big: pd.DataFrame, keycols: Li
         if col not in df_small.columns or col not in df_big.columns:
             raise AssertionError(f"[{label}] colonna chiave mancante per il confronto: {col}")
 
+    if len(keycols) == 1 and all(pd.api.types.is_integer_dtype(df[keycols[0]]) for df in (df_small, df_big)):
+        #chiave intera: differenza tra array numpy ordinati invece che tra set di tuple
+        missing = np.setdiff1d(df_small[keycols[0]].to_numpy(), df_big[keycols[0]].to_numpy())
+        if len(missing):
+            raise AssertionError(f"[{label}] annidamento chiavi violato: {len(missing)} chiavi mancanti (esempio: {missing[0]})")
+        return
+
     small_keys = set(map(tuple, df_small[keycols].values.tolist()))
     big_keys   = set(map(tuple, df_big[keycols].values.tolist()))
     missing = small_keys - big_keys
@@ -77,6 +136,7 @@ def assert_rows_subset(df_small: pd.DataFrame, df_big: pd.DataFrame, label: str)
         raise AssertionError(f"[{label}] nessuna colonna in comune per il confronto righe.")
     a = df_small[common].drop_duplicates()
     b = df_big[common].drop_duplicates()
+    a, b = align_dtypes(a, b, common)
     merged = a.merge(b, how="left", on=common, indicator=True)
     missing_rows_mask = merged["_merge"] == "left_only"
     missing_count = int(missing_rows_mask.sum())
@@ -84,12 +144,176 @@ def assert_rows_subset(df_small: pd.DataFrame, df_big: pd.DataFrame, label: str)
         sample = a[missing_rows_mask].head(1).to_dict(orient="records")[0]
         raise AssertionError(f"[{label}] annidamento righe violato: {missing_count} righe non trovate. Esempio: {sample}")
 
-def verify_nested(small_dir: Path, big_dir: Path, skip_keys: bool=False, skip_rows: bool=False) -> None:
+#controllo righe in streaming (--hash): la tabella grande viene letta a blocchi e di ogni riga resta
+#solo un hash a 64 bit in un array numpy ordinato (8 byte per riga); le righe della piccola si cercano
+#con searchsorted. Un hash assente è una violazione certa; un hash presente è una corrispondenza
+#con probabilità di collisione <= n_small * n_big / 2^64, confermata riga per riga solo con --exact
+def use_parquet(dirpath: Path, fmt: str) -> bool:
+    return fmt == "parquet" or (fmt == "auto" and colonnare.tutte_presenti(dirpath))
+
+def table_columns(dirpath: Path, table: str, fmt: str) -> List[str]:
+    if use_parquet(dirpath, fmt):
+        colonnare.richiedi_pyarrow()
+        return colonnare.pq.read_schema(colonnare.percorso(dirpath, table)).names
+    with compressione.apri_csv(dirpath / f"{table}.csv") as f:
+        return next(csv.reader(f), [])
+
+def iter_table(dirpath: Path, table: str, columns: List[str], fmt: str, chunk: int):
+    if use_parquet(dirpath, fmt):
+        f = colonnare.pq.ParquetFile(colonnare.percorso(dirpath, table))
+        for batch in f.iter_batches(batch_size=chunk, columns=columns):
+            yield batch.to_pandas()
+        return
+    with compressione.apri_csv(dirpath / f"{table}.csv") as f:
+        with pd.read_csv(f, dtype=str, keep_default_na=False, usecols=lambda c: c in columns, chunksize=chunk) as reader:
+            for df in reader:
+                yield df[columns]
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    #stessa rappresentazione testuale da CSV e da Parquet (tipizzato o con ID interi): ID normalizzati come norm_series
+    df = colonnare.id_testo(df)
+    for c in df.columns:
+        df[c] = norm_series(df[c]) if colonnare.prefisso(c) else df[c].astype(str)
+    return df
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    #object + categorize=False: sulle colonne quasi tutte distinte è il percorso più rapido di pandas
+    return pd.util.hash_pandas_object(df.astype(object), index=False, categorize=False).to_numpy()
+
+def hash_table(dirpath: Path, table: str, columns: List[str], fmt: str, chunk: int) -> np.ndarray:
+    parts = [row_hashes(canonical(df)) for df in iter_table(dirpath, table, columns, fmt, chunk)]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint64)
+
+def found_in(sorted_hashes: np.ndarray, h: np.ndarray) -> np.ndarray:
+    if len(sorted_hashes) == 0:
+        return np.zeros(len(h), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_hashes, h), len(sorted_hashes) - 1)
+    return sorted_hashes[pos] == h
+
+def confirm_exact(rows: pd.DataFrame, hashes: np.ndarray, big_dir: Path, table: str, columns: List[str],
+                  fmt: str, chunk: int) -> pd.DataFrame:
+    #rilegge la grande tenendo solo le righe con uno degli hash trovati (memoria ~ un blocco)
+    #e le confronta esattamente: restituisce le righe di rows che erano collisioni
+    wanted = np.unique(hashes)
+    candidates = []
+    for df in iter_table(big_dir, table, columns, fmt, chunk):
+        df = canonical(df)
+        candidates.append(df[found_in(wanted, row_hashes(df))])
+    big = pd.concat(candidates, ignore_index=True).drop_duplicates()
+    merged = rows.merge(big, how="left", on=columns, indicator=True)
+    return merged[merged["_merge"] == "left_only"][columns]
+
+def assert_rows_subset_hash(small_dir: Path, big_dir: Path, table: str, fmt: str = "auto",
+                            chunk: int = CHUNK_ROWS, exact: bool = False,
+                            common: List[str] = None, big: np.ndarray = None):
+    #common/big: colonne e hash della grande già calcolati (--chain), così non si rilegge
+    if common is None:
+        big_cols = set(table_columns(big_dir, table, fmt))
+        common = [c for c in table_columns(small_dir, table, fmt) if c in big_cols]
+    if not common:
+        raise AssertionError(f"[{table}] nessuna colonna in comune per il confronto righe.")
+    if big is None:
+        big = hash_table(big_dir, table, common, fmt, chunk)
+    missing_count, sample = 0, None
+    for df in iter_table(small_dir, table, common, fmt, chunk):
+        df = canonical(df)
+        h = row_hashes(df)
+        found = found_in(big, h)
+        missing = df[~found]
+        if exact and found.any():
+            missing = pd.concat([missing, confirm_exact(df[found].drop_duplicates(), h[found], big_dir, table, common, fmt, chunk)])
+        missing_count += len(missing)
+        if sample is None and len(missing):
+            sample = missing.head(1).to_dict(orient="records")[0]
+    if missing_count:
+        raise AssertionError(f"[{table}] annidamento righe violato: {missing_count} righe non trovate. Esempio: {sample}")
+
+
+#modalità catena (--chain A B C ...): ogni tabella è controllata da un processo che legge ogni
+#livello una sola volta e confronta le coppie adiacenti tenendo in memoria solo due livelli
+def check_table_chain(table: str, dirs: List[Path], fmt: str, int_ids: bool, skip_keys: bool, skip_rows: bool,
+                      hash_rows: bool, exact: bool, chunk: int):
+    timings = {"lettura": 0.0, "chiavi": 0.0, "righe": 0.0}
+    counts = []
+    keys_only = skip_rows or hash_rows
+    if hash_rows and not skip_rows:
+        columns = [set(table_columns(d, table, fmt)) for d in dirs]
+        common = [c for c in table_columns(dirs[0], table, fmt) if all(c in cols for cols in columns)]
+        if not common:
+            raise AssertionError(f"[{table}] nessuna colonna in comune per il confronto righe.")
+    prev = prev_hashes = None
+    for i, d in enumerate(dirs):
+        start = time.perf_counter()
+        cur = load_table(d, table, KEY_COLUMNS[table] if keys_only else None, fmt, int_ids)
+        cur_hashes = hash_table(d, table, common, fmt, chunk) if hash_rows and not skip_rows else None
+        timings["lettura"] += time.perf_counter() - start
+        counts.append(len(cur))
+        if i == 0:
+            prev, prev_hashes = cur, cur_hashes
+            continue
+        label = f"{table} {dirs[i - 1].name} ⊂ {d.name}"
+        start = time.perf_counter()
+        if not skip_keys and table in PK:
+            assert_keys_subset(prev, cur, PK[table], label)
+        timings["chiavi"] += time.perf_counter() - start
+        start = time.perf_counter()
+        if not skip_rows and hash_rows:
+            missing = np.setdiff1d(prev_hashes, cur_hashes, assume_unique=True)
+            if len(missing):
+                raise AssertionError(f"[{label}] annidamento righe violato: {len(missing)} righe (hash) non trovate.")
+            if exact:
+                assert_rows_subset_hash(dirs[i - 1], d, table, fmt, chunk, exact=True, common=common, big=cur_hashes)
+        elif not skip_rows:
+            assert_rows_subset(prev, cur, label)
+        timings["righe"] += time.perf_counter() - start
+        prev, prev_hashes = cur, cur_hashes
+    return table, counts, timings
+
+def verify_chain(dirs: List[Path], skip_keys: bool=False, skip_rows: bool=False, fmt: str="auto", int_ids: bool=False,
+                 hash_rows: bool=False, exact: bool=False, chunk: int=CHUNK_ROWS, workers: int=None) -> None:
+    if len(dirs) < 2:
+        raise ValueError("--chain richiede almeno due cartelle")
+    for d in dirs:
+        require_files(d)
+    print("Catena: " + " ⊂ ".join(d.name or str(d) for d in dirs))
+    start = time.perf_counter()
+    results, errors = {}, []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(TABLES)))) as pool:
+        futures = {t: pool.submit(check_table_chain, t, dirs, fmt, int_ids, skip_keys, skip_rows, hash_rows, exact, chunk)
+                   for t in TABLES}
+        for t, f in futures.items():
+            try:
+                results[t] = f.result()
+            except AssertionError as e:
+                errors.append(str(e))
+
+    print("---- Riepilogo righe ----")
+    for t in TABLES:
+        if t in results:
+            print(f"{t:<13} " + " ⊂ ".join(f"{n:>8}" for n in results[t][1]))
+    print("---- Tempi per tabella (s) ----")
+    print(f"{'tabella':<13} {'lettura':>8} {'chiavi':>8} {'righe':>8}")
+    for t in TABLES:
+        if t in results:
+            tm = results[t][2]
+            print(f"{t:<13} {tm['lettura']:8.2f} {tm['chiavi']:8.2f} {tm['righe']:8.2f}")
+    print(f"totale (in parallelo): {time.perf_counter() - start:.2f} s")
+    print("-------------------------")
+    if errors:
+        raise AssertionError("; ".join(errors))
+    print("ogni livello della catena è contenuto nel successivo.")
+
+
+def verify_nested(small_dir: Path, big_dir: Path, skip_keys: bool=False, skip_rows: bool=False, fmt: str="auto",
+                  int_ids: bool=False, hash_rows: bool=False, exact: bool=False, chunk: int=CHUNK_ROWS) -> None:
     require_files(small_dir)
     require_files(big_dir)
 
-    s_p, s_d, s_b, s_f, s_t = load_subset_dir(small_dir)
-    b_p, b_d, b_b, b_f, b_t = load_subset_dir(big_dir)
+    #con --hash le righe non si caricano intere: in memoria restano solo le colonne chiave
+    keys_only = skip_rows or hash_rows
+    s_p, s_d, s_b, s_f, s_t = load_subset_dir(small_dir, keys_only=keys_only, fmt=fmt, int_ids=int_ids)
+    b_p, b_d, b_b, b_f, b_t = load_subset_dir(big_dir, keys_only=keys_only, fmt=fmt, int_ids=int_ids)
 
     print(f"Confronto: {small_dir.name} ⊂ {big_dir.name}")
     print("---- Riepilogo righe ----")
@@ -109,7 +333,11 @@ def verify_nested(small_dir: Path, big_dir: Path, skip_keys: bool=False, skip_ro
         print("OK chiavi: persone, documenti, banche, fonti")
 
     
-    if not skip_rows:
+    if not skip_rows and hash_rows:
+        for table in TABLES:
+            assert_rows_subset_hash(small_dir, big_dir, table, fmt, chunk, exact)
+        print(f"OK righe (hash 64 bit{', confermate' if exact else ''}): persone, documenti, banche, fonti, transazioni")
+    elif not skip_rows:
         assert_rows_subset(s_p, b_p, "persone")
         assert_rows_subset(s_d, b_d, "documenti")
         assert_rows_subset(s_b, b_b, "banche")
@@ -124,16 +352,37 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Verifica che una cartella subset (piccola) sia sottoinsieme di un'altra (grande)."
     )
-    p.add_argument("small_dir", type=Path, help="Directory del subset più piccolo (es. subset_25)")
-    p.add_argument("big_dir",   type=Path, help="Directory del subset più grande (es. subset_50)")
+    p.add_argument("small_dir", type=Path, nargs="?", help="Directory del subset più piccolo (es. subset_25)")
+    p.add_argument("big_dir",   type=Path, nargs="?", help="Directory del subset più grande (es. subset_50)")
+    p.add_argument("--chain", type=Path, nargs="+", metavar="DIR",
+                   help="Verifica un'intera catena (es. subset_25 subset_50 subset_75 .): ogni cartella letta una volta, "
+                        "coppie adiacenti controllate, tabelle in parallelo.")
+    p.add_argument("--workers", type=int, help="Processi per --chain (default: numero di CPU, al massimo uno per tabella).")
     p.add_argument("--skip-keys", action="store_true", help="Salta il controllo di sottoinsieme sulle chiavi PK.")
     p.add_argument("--skip-rows", action="store_true", help="Salta il controllo riga-per-riga (colonne comuni).")
-    return p.parse_args(argv)
+    p.add_argument("--format", dest="fmt", choices=["auto", "csv", "parquet"], default="auto",
+                   help="Formato delle cartelle: auto usa i .parquet se presenti per tutte le tabelle.")
+    p.add_argument("--int-ids", action="store_true",
+                   help="Confronta gli ID come interi (p123 -> 123) con operazioni su array numpy.")
+    p.add_argument("--hash", dest="hash_rows", action="store_true",
+                   help="Controllo righe in streaming con hash a 64 bit: memoria ~8 byte per riga invece dei DataFrame interi.")
+    p.add_argument("--exact", action="store_true",
+                   help="Con --hash: conferma riga per riga le corrispondenze trovate (rilegge la tabella grande).")
+    p.add_argument("--chunk", type=int, default=CHUNK_ROWS, help=f"Righe per blocco con --hash (default {CHUNK_ROWS}).")
+    args = p.parse_args(argv)
+    if not args.chain and (args.small_dir is None or args.big_dir is None):
+        p.error("servono small_dir e big_dir, oppure --chain DIR DIR ...")
+    return args
 
 def main(argv: List[str]) -> int:
     args = parse_args(argv)
     try:
-        verify_nested(args.small_dir, args.big_dir, skip_keys=args.skip_keys, skip_rows=args.skip_rows)
+        if args.chain:
+            verify_chain(args.chain, skip_keys=args.skip_keys, skip_rows=args.skip_rows, fmt=args.fmt, int_ids=args.int_ids,
+                         hash_rows=args.hash_rows, exact=args.exact, chunk=args.chunk, workers=args.workers)
+            return 0
+        verify_nested(args.small_dir, args.big_dir, skip_keys=args.skip_keys, skip_rows=args.skip_rows, fmt=args.fmt,
+                      int_ids=args.int_ids, hash_rows=args.hash_rows, exact=args.exact, chunk=args.chunk)
         return 0
     except AssertionError as e:
         print(f" Errore: {e}")
@@ -0,0 +1,42 @@
+#vocabolari precostruiti per la modalità veloce di genera.py (niente Faker)
+#vengono campionati con indici numpy, quindi ogni colonna si costruisce in un colpo solo
+import numpy as np
+
+NOMI = np.array([
+    "Alessandro", "Alessia", "Alberto", "Alice", "Andrea", "Angela", "Anna", "Antonio",
+    "Beatrice", "Bruno", "Camilla", "Carlo", "Caterina", "Chiara", "Claudio", "Cristina",
+    "Daniele", "Davide", "Elena", "Elisa", "Emanuele", "Enrico", "Federica", "Federico",
+    "Filippo", "Francesca", "Francesco", "Gabriele", "Giacomo", "Giada", "Giorgia", "Giorgio",
+    "Giovanni", "Giulia", "Giuseppe", "Ilaria", "Irene", "Laura", "Leonardo", "Lorenzo",
+    "Luca", "Lucia", "Marco", "Maria", "Marta", "Martina", "Matteo", "Mattia",
+    "Michele", "Monica", "Nicola", "Noemi", "Paola", "Paolo", "Pietro", "Riccardo",
+    "Roberta", "Roberto", "Sara", "Silvia", "Simone", "Sofia", "Stefano", "Valentina",
+    "Valerio", "Veronica", "Vincenzo", "Viola",
+])
+
+COGNOMI = np.array([
+    "Amato", "Barbieri", "Bernardi", "Bianchi", "Bruno", "Caruso", "Colombo", "Conti",
+    "Costa", "De Luca", "Esposito", "Fabbri", "Ferrara", "Ferrari", "Fontana", "Galli",
+    "Gallo", "Giordano", "Greco", "Leone", "Lombardi", "Longo", "Mancini", "Marchetti",
+    "Mariani", "Marini", "Martini", "Moretti", "Neri", "Orlando", "Palumbo", "Parisi",
+    "Pellegrini", "Piras", "Pizzi", "Pagano", "Ricci", "Rinaldi", "Rizzo", "Romano",
+    "Rossi", "Russo", "Santoro", "Serra", "Silvestri", "Testa", "Valentini", "Villa",
+    "Vitale", "Zanetti",
+])
+
+SUFFISSI_AZIENDA = np.array([
+    " s.r.l.", " S.p.A.", " SPA", " s.n.c.", " e figli", " Group", " Holding", " & C.",
+])
+
+NAZIONI = np.array([
+    "AR", "AT", "AU", "BE", "BG", "BR", "CA", "CH", "CL", "CN", "CY", "CZ", "DE", "DK",
+    "EE", "EG", "ES", "FI", "FR", "GB", "GE", "GR", "HR", "HU", "IE", "IL", "IN", "IS",
+    "IT", "JP", "KR", "LT", "LU", "LV", "MA", "MC", "MT", "MX", "NL", "NO", "NZ", "PL",
+    "PT", "RO", "RS", "RU", "SE", "SG", "SI", "SK", "SM", "TN", "TR", "UA", "US", "VA",
+    "ZA",
+])
+
+DOMINI_EMAIL = np.array([
+    "gmail.com", "libero.it", "virgilio.it", "alice.it", "hotmail.it", "yahoo.it",
+    "tiscali.it", "fastwebnet.it", "outlook.com", "email.it",
+])